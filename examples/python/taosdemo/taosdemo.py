@@ -21,87 +21,39 @@ import json
 import random
 import time
 import datetime
+import threading
+import ctypes
 import multiprocessing
-from multiprocessing import Manager, Pool, Lock
-from multipledispatch import dispatch
+from multiprocessing import Pool
 from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
 
 
-@dispatch(str, str)
-def v_print(msg, arg):
-    # type: (str, str) -> None
-    if verbose:
-        print(msg % arg)
-
-
-@dispatch(str, str, str)
-def v_print(msg, arg1, arg2):
-    # type: (str, str, str) -> None
-    if verbose:
-        print(msg % (arg1, arg2))
-
-
-@dispatch(str, str, str, str)
-def v_print(msg, arg1, arg2, arg3):
-    # type: (str, str, str, str) -> None
-    if verbose:
-        print(msg % (arg1, arg2, arg3))
-
+class VerbosePrint:
+    # printf style verbose output, formatted only when switched on; calls in
+    # per-row loops are guarded by `__debug__ and v_print.on` so running
+    # under python -O removes them
+    on = False
 
-@dispatch(str, str, str, str, str)
-def v_print(msg, arg1, arg2, arg3, arg4):
-    # type: (str, str, str, str, str) -> None
-    if verbose:
-        print(msg % (arg1, arg2, arg3, arg4))
-
-
-@dispatch(str, int)
-def v_print(msg, arg):
-    # type: (str, int) -> None
-    if verbose:
-        print(msg % int(arg))
+    def __call__(self, msg, *args):
+        if self.on:
+            print(msg % args if args else msg)
 
 
-@dispatch(str, int, str)
-def v_print(msg, arg1, arg2):
-    # type: (str, int, str) -> None
-    if verbose:
-        print(msg % (int(arg1), str(arg2)))
+v_print = VerbosePrint()
 
 
-@dispatch(str, str, int)
-def v_print(msg, arg1, arg2):
-    # type: (str, str, int) -> None
-    if verbose:
-        print(msg % (arg1, int(arg2)))
+rest_local = threading.local()
 
 
-@dispatch(str, int, int)
-def v_print(msg, arg1, arg2):
-    # type: (str, int, int) -> None
-    if verbose:
-        print(msg % (int(arg1), int(arg2)))
-
-
-@dispatch(str, int, int, str)
-def v_print(msg, arg1, arg2, arg3):
-    # type: (str, int, int, str) -> None
-    if verbose:
-        print(msg % (int(arg1), int(arg2), str(arg3)))
-
-
-@dispatch(str, int, int, int)
-def v_print(msg, arg1, arg2, arg3):
-    # type: (str, int, int, int) -> None
-    if verbose:
-        print(msg % (int(arg1), int(arg2), int(arg3)))
-
-
-@dispatch(str, int, int, int, int)
-def v_print(msg, arg1, arg2, arg3, arg4):
-    # type: (str, int, int, int, int) -> None
-    if verbose:
-        print(msg % (int(arg1), int(arg2), int(arg3), int(arg4)))
+def rest_session(user, password):
+    # type: (str, str) -> requests.Session
+    # one keep-alive session per thread, created after the process forks
+    session = getattr(rest_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.auth = (user, password)
+        rest_local.session = session
+    return session
 
 
 def restful_execute(host, port, user, password, cmd):
@@ -110,7 +62,7 @@ def restful_execute(host, port, user, password, cmd):
 
     v_print("restful_execute - cmd: %s", cmd)
 
-    resp = requests.post(url, cmd, auth=(user, password))
+    resp = rest_session(user, password).post(url, cmd)
 
     v_print("resp status: %d", resp.status_code)
 
@@ -125,6 +77,130 @@ def restful_execute(host, port, user, password, cmd):
         print("resp: %s" % json.dumps(resp.json()))
 
 
+native_local = threading.local()
+native_sessions = []
+native_sessions_lock = threading.Lock()
+
+
+def native_session():
+    # type: () -> list
+    # [connection, cursor, prepared statement] kept by the calling thread
+    # for its whole life, closed together by close_native_sessions()
+    session = getattr(native_local, "session", None)
+    if session is None:
+        v_print("host:%s, user:%s passwd:%s configDir:%s ", host, user, password, configDir)
+        try:
+            conn = taos.connect(
+                host=host,
+                user=user,
+                password=password,
+                config=configDir)
+            v_print("conn: %s", str(conn.__class__))
+        except Exception as e:
+            print("Error: %s" % e.args[0])
+            sys.exit(1)
+
+        try:
+            cursor = conn.cursor()
+            v_print("cursor:%d %s", id(cursor), str(cursor.__class__))
+        except Exception as e:
+            print("Error: %s" % e.args[0])
+            conn.close()
+            sys.exit(1)
+
+        session = [conn, cursor, None]
+        native_local.session = session
+        with native_sessions_lock:
+            native_sessions.append(session)
+    return session
+
+
+def close_native_sessions():
+    # type: () -> None
+    with native_sessions_lock:
+        sessions = native_sessions[:]
+        del native_sessions[:]
+    for conn, cursor, stmt in sessions:
+        if stmt is not None:
+            stmt.close()
+        cursor.close()
+        conn.close()
+
+
+def stmt_session(autoSub):
+    # type: (bool) -> object
+    # the prepared insert statement of the calling thread, reused for every
+    # table and batch the thread writes
+    session = native_session()
+    if session[2] is None:
+        if autoSub:
+            session[2] = session[0].statement(
+                "INSERT INTO ? USING %s.%s%d TAGS(?) VALUES(?, ?)" %
+                (current_db, stbName, numOfStb - 1))
+        else:
+            session[2] = session[0].statement("INSERT INTO ? VALUES(?, ?)")
+    return session[2]
+
+
+def bind_column(bind, fieldType, values):
+    # type: (object, int, numpy.ndarray) -> list
+    # point a multi bind straight at the buffer of a numpy column instead
+    # of copying it element by element; returns the arrays that have to
+    # stay alive until the batch is bound
+    nulls = numpy.zeros(len(values), dtype=numpy.int8)
+    bind.buffer_type = fieldType
+    bind.buffer = values.ctypes.data_as(ctypes.c_void_p)
+    bind.buffer_length = values.itemsize
+    bind.is_null = nulls.ctypes.data_as(ctypes.c_char_p)
+    bind.num = len(values)
+    return [values, nulls]
+
+
+def insert_stmt_func(process, thread):
+    # type: (int, int) -> int
+    # --stmt flavour of insert_func: each batch is bound as an int64 epoch
+    # and a float32 numpy column, no sql text is rendered
+    v_print("%d process %d thread, insert_stmt_func ", process, thread)
+    autoSub = numOfStb > 0 and autosubtable
+    stmt = stmt_session(autoSub)
+    tb = "%s.%s%d" % (current_db, tbName, thread)
+    if autoSub:
+        tags = taos.new_bind_params(1)
+        tags[0].binary("%d" % random.randint(0, numOfTb + 1))
+
+    epoch = int(time.mktime(datetime.datetime(2021, 1, 25).timetuple())) * 1000
+    row = 0
+    while row < numOfRec:
+        rows = min(batch, numOfRec - row)
+        ts = epoch + row * 1000 + numpy.arange(rows, dtype=numpy.int64)
+        values = numpy.random.random(rows).astype(numpy.float32)
+        binds = taos.new_multi_binds(2)
+        buffers = bind_column(binds[0], FieldType.C_TIMESTAMP, ts)
+        buffers += bind_column(binds[1], FieldType.C_FLOAT, values)
+
+        if measure:
+            exec_start_time = datetime.datetime.now()
+
+        if autoSub:
+            stmt.set_tbname_tags(tb, tags)
+        else:
+            stmt.set_tbname(tb)
+        stmt.bind_param_batch(binds)
+        stmt.execute()
+
+        if measure:
+            exec_end_time = datetime.datetime.now()
+            if __debug__ and v_print.on:
+                exec_delta = exec_end_time - exec_start_time
+                v_print(
+                    "consume %d microseconds",
+                     exec_delta.microseconds)
+
+        row = row + rows
+
+    return row
+
+
 def query_func(process, thread, cmd):
     # type: (int, int, str) -> None
     v_print("%d process %d thread cmd: %s", process, thread, cmd)
@@ -149,27 +225,9 @@ def query_func(process, thread, cmd):
 
 def query_data_process(cmd):
     # type: (str) -> None
-    # establish connection if native
+    # reuse the connection of the calling thread if native
     if native:
-        v_print("host:%s, user:%s passwd:%s configDir:%s ", host, user, password, configDir)
-        try:
-            conn = taos.connect(
-                host=host,
-                user=user,
-                password=password,
-                config=configDir)
-            v_print("conn: %s", str(conn.__class__))
-        except Exception as e:
-            print("Error: %s" % e.args[0])
-            sys.exit(1)
-
-        try:
-            cursor = conn.cursor()
-            v_print("cursor:%d %s", id(cursor), str(cursor.__class__))
-        except Exception as e:
-            print("Error: %s" % e.args[0])
-            conn.close()
-            sys.exit(1)
+        cursor = native_session()[1]
 
     if native:
         try:
@@ -180,7 +238,7 @@ def query_data_process(cmd):
             for col in data:
                 print(col)
         except Exception as e:
-            conn.close()
+            close_native_sessions()
             print("Error: %s" % e.args[0])
             sys.exit(1)
 
@@ -192,10 +250,6 @@ def query_data_process(cmd):
                 password,
                 cmd)
 
-    if native:
-        cursor.close()
-        conn.close()
-
 
 def create_stb():
     for i in range(0, numOfStb):
@@ -272,7 +326,7 @@ def drop_databases():
 
 
 def insert_func(process, thread):
-    # type: (int, int) -> None
+    # type: (int, int) -> int
     v_print("%d process %d thread, insert_func ", process, thread)
 
     # generate uuid
@@ -280,33 +334,16 @@ def insert_func(process, thread):
     uuid = "%s" % uuid_int
     v_print("uuid is: %s", uuid)
 
-    # establish connection if native
+    # the connection of this worker thread if native
     if native:
-        v_print("host:%s, user:%s passwd:%s configDir:%s ", host, user, password, configDir)
-        try:
-            conn = taos.connect(
-                host=host,
-                user=user,
-                password=password,
-                config=configDir)
-            v_print("conn: %s", str(conn.__class__))
-        except Exception as e:
-            print("Error: %s" % e.args[0])
-            sys.exit(1)
-
-        try:
-            cursor = conn.cursor()
-            v_print("cursor:%d %s", id(cursor), str(cursor.__class__))
-        except Exception as e:
-            print("Error: %s" % e.args[0])
-            conn.close()
-            sys.exit(1)
+        cursor = native_session()[1]
 
     v_print("numOfRec %d:", numOfRec)
 
     row = 0
     while row < numOfRec:
-        v_print("row: %d", row)
+        if __debug__ and v_print.on:
+            v_print("row: %d", row)
         sqlCmd = ['INSERT INTO ']
         try:
             sqlCmd.append(
@@ -329,7 +366,8 @@ def insert_func(process, thread):
                                   random.random()))
                 row = row + 1
                 if row >= numOfRec:
-                    v_print("BREAK, row: %d numOfRec:%d", row, numOfRec)
+                    if __debug__ and v_print.on:
+                        v_print("BREAK, row: %d numOfRec:%d", row, numOfRec)
                     break
 
         except Exception as e:
@@ -348,16 +386,16 @@ def insert_func(process, thread):
 
         if measure:
             exec_end_time = datetime.datetime.now()
-            exec_delta = exec_end_time - exec_start_time
-            v_print(
-                "consume %d microseconds",
-                 exec_delta.microseconds)
+            if __debug__ and v_print.on:
+                exec_delta = exec_end_time - exec_start_time
+                v_print(
+                    "consume %d microseconds",
+                     exec_delta.microseconds)
 
-        v_print("cmd: %s, length:%d", cmd, len(cmd))
+        if __debug__ and v_print.on:
+            v_print("cmd: %s, length:%d", cmd, len(cmd))
 
-    if native:
-        cursor.close()
-        conn.close()
+    return row
 
 
 def create_tb_using_stb():
@@ -390,36 +428,33 @@ def create_tb():
                     (tbName, j))
 
 
-def insert_data_process(lock, i, begin, end):
-    # type: (multiprocessing._LockType, int, int, int) -> None
-    lock.acquire()
+def insert_data_process(i, begin, end):
+    # type: (int, int, int) -> int
+    # tables [begin, end) of process i are the tasks of a single executor,
+    # each worker thread keeps its own connection; returns rows written
     tasks = end - begin
     v_print("insert_data_process:%d table from %d to %d, tasks %d", i, begin, end, tasks)
 
-    if (threads < (end - begin)):
-        for j in range(begin, end, threads):
-            with ThreadPoolExecutor(max_workers=threads) as executor:
-                k = end if ((j + threads) > end) else (j + threads)
-                workers = [
-                    executor.submit(
-                        insert_func,
-                        i,
-                        n) for n in range(
-                        j,
-                        k)]
-                wait(workers, return_when=ALL_COMPLETED)
-    else:
-        with ThreadPoolExecutor(max_workers=threads) as executor:
-            workers = [
-                executor.submit(
-                    insert_func,
-                    i,
-                    j) for j in range(
-                    begin,
-                    end)]
-            wait(workers, return_when=ALL_COMPLETED)
+    with ThreadPoolExecutor(max_workers=max(1, min(threads, tasks))) as executor:
+        workers = [
+            executor.submit(
+                insert_stmt_func if useStmt else insert_func,
+                i,
+                j) for j in range(
+                begin,
+                end)]
+        wait(workers, return_when=ALL_COMPLETED)
+
+    rows = 0
+    for worker in workers:
+        if worker.exception() is None:
+            rows += worker.result()
+        else:
+            print("Error: %s" % worker.exception())
 
-    lock.release()
+    if native:
+        close_native_sessions()
+    return rows
 
 
 def query_db(i):
@@ -471,6 +506,7 @@ def printConfig():
     print("# Delete method:                     %s" % deleteMethod)
     print("# Query command:                     %s" % queryCmd)
     print("# Insert Only:                       %s" % insertOnly)
+    print("# Use STMT bind:                     %s" % useStmt)
     print("# Verbose output                     %s" % verbose)
     print("# Test time:                         %s" %
           datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
@@ -512,16 +548,17 @@ if __name__ == "__main__":
     rateOOOO = 0
     deleteMethod = 0
     skipPrompt = False
+    useStmt = False
 
     try:
         opts, args = getopt.gnu_getopt(sys.argv[1:],
-                                       'Nh:p:u:P:d:a:m:Ms:Q:T:C:r:l:t:n:c:xOR:D:vgyH',
+                                       'Nh:p:u:P:d:a:m:Ms:Q:T:C:r:l:t:n:c:xOR:D:vgySH',
                                        [
             'native', 'host', 'port', 'user', 'password', 'dbname', 'replica', 'tbname',
             'stable', 'stbname', 'query', 'threads', 'processes',
             'recPerReq', 'colsPerRecord', 'numOfTb', 'numOfRec', 'config',
             'insertOnly', 'outOfOrder', 'rateOOOO', 'deleteMethod',
-            'verbose', 'debug', 'skipPrompt', 'help'
+            'verbose', 'debug', 'skipPrompt', 'stmt', 'help'
         ])
     except getopt.GetoptError as err:
         print('ERROR:', err)
@@ -577,6 +614,7 @@ if __name__ == "__main__":
             print('\t-g, --debug                       Print debug output')
             print(
                   '\t-y, --skipPrompt                  Skip read key for continous test, default is not skip')
+            print('\t-S, --stmt                        flag, Insert by binding numpy columns to a prepared statement, needs -N.')
             print('')
             sys.exit(0)
 
@@ -681,6 +719,7 @@ if __name__ == "__main__":
 
         if key in ['-v', '--verbose']:
             verbose = True
+            v_print.on = True
 
         if key in ['-g', '--debug']:
             debug = True
@@ -688,6 +727,20 @@ if __name__ == "__main__":
         if key in ['-y', '--skipPrompt']:
             skipPrompt = True
 
+        if key in ['-S', '--stmt']:
+            try:
+                import numpy
+            except Exception as e:
+                print("Error: %s" % e.args[0])
+                sys.exit(1)
+            useStmt = True
+
+    if useStmt:
+        if not native:
+            print("FATAL: --stmt needs the native interface (-N)")
+            sys.exit(1)
+        from taos.constants import FieldType
+
     if verbose:
         printConfig()
 
@@ -764,9 +817,8 @@ if __name__ == "__main__":
     if measure:
         start_time = time.time()
 
-    manager = Manager()
-    lock = manager.Lock()
     pool = Pool(processes)
+    results = []
 
     begin = 0
     end = 0
@@ -790,23 +842,29 @@ if __name__ == "__main__":
             end = begin + quotient + 1
         else:
             end = begin + quotient
-        pool.apply_async(insert_data_process, args=(lock, i, begin, end,))
+        results.append(
+            pool.apply_async(insert_data_process, args=(i, begin, end,)))
 
     pool.close()
     pool.join()
-    time.sleep(1)
+    rows = sum(r.get() for r in results if r.successful())
 
     if measure:
         end_time = time.time()
         print(
             "Total time consumed {} seconds for insert data.".format(
             (end_time - start_time)))
+        print(
+            "Total {} rows inserted, {:.2f} rows/sec.".format(
+            rows, rows / (end_time - start_time)))
 
 
     # query data
     if queryCmd != "NO":
         print("queryCmd: %s" % queryCmd)
         query_data_process(queryCmd)
+        if native:
+            close_native_sessions()
 
     if measure:
         end_time = time.time()
@@ -11,6 +11,7 @@
 
 # -*- coding: utf-8 -*-
 import threading
+import asyncio
 import taos
 import sys
 import json
@@ -21,6 +22,8 @@ import argparse
 import datetime
 import string
 from requests.auth import HTTPBasicAuth
+from util.stream import streamQuery
+from util.rest import TDAsyncRestClient
 func_list=['avg','count','twa','sum','stddev','leastsquares','min',
 'max','first','last','top','bottom','percentile','apercentile',
 'last_row','diff','spread','distinct']
@@ -34,13 +37,173 @@ condition_list=[
     
 ]
 where_list = ['_c0>now-10d',' <50','like',' is null','in']
+
+plan_classes = ['scan','aggregation','interval','window','nested','join']
+plan_funcs = tuple(f + '(' for f in func_list)
+
+def plan_class(sql):                                #按查询计划形态分类
+    s = str(sql)
+    if ' t1,' in s and ' t2 ' in s:
+        return 'join'
+    if ' from (' in s:
+        return 'nested'
+    if 'state_window(' in s or 'session_window(' in s:
+        return 'window'
+    if 'interval(' in s:
+        return 'interval'
+    if any(f in s.split(' from ')[0] for f in plan_funcs):
+        return 'aggregation'
+    return 'scan'
+
+class PlanStats:                                    #各类别的延迟统计，并据此选择下一条查询的类别
+    def __init__(self,mix):
+        self.lock = threading.Lock()
+        self.latencies = dict((c,[]) for c in plan_classes)
+        self.errors = dict((c,0) for c in plan_classes)
+        self.misses = dict((c,0) for c in plan_classes)  #没能生成该类别查询的次数
+        self.weights = None
+        self.tail = mix == 'tail'
+        if mix and not self.tail:
+            self.weights = dict((c,0.0) for c in plan_classes)
+            for item in mix.split(','):
+                name,weight = item.split('=')
+                if name not in self.weights:
+                    raise ValueError("unknown plan class %s, expect one of %s" % (name,','.join(plan_classes)))
+                self.weights[name] = float(weight)
+
+    def add(self,plan,latency,error=None):
+        with self.lock:
+            self.latencies[plan].append(latency)
+            if error is not None:
+                self.errors[plan] += 1
+
+    def miss(self,plan):
+        with self.lock:
+            self.misses[plan] += 1
+
+    def tail_weights(self):                         #p99越高权重越大，样本不足的类别优先探索
+        with self.lock:
+            p99 = dict((c,percentile(sorted(l),99)) for c,l in self.latencies.items() if len(l) >= 10)
+        top = max(p99.values()) if p99 else 1.0
+        return dict((c,max(p99.get(c,top),top*0.05)) for c in plan_classes)
+
+    def pick(self):
+        if self.tail:
+            weights = self.tail_weights()
+        elif self.weights:
+            weights = self.weights
+        else:
+            return None
+        return random.choices(plan_classes,[weights[c] for c in plan_classes])[0]
+
+    def report(self):
+        print('-'*78)
+        print('%-12s %8s %8s %8s %10s %10s %10s %10s' % ('plan','count','errors','misses','avg(ms)','p50(ms)','p99(ms)','max(ms)'))
+        for c in plan_classes:
+            with self.lock:
+                latencies = sorted(self.latencies[c])
+                errors = self.errors[c]
+                misses = self.misses[c]
+            if not latencies:
+                if misses:
+                    print('%-12s %8d %8d %8d' % (c,0,errors,misses))
+                continue
+            print('%-12s %8d %8d %8d %10.3f %10.3f %10.3f %10.3f' % (c,len(latencies),errors,misses,
+                sum(latencies)/len(latencies)*1000,percentile(latencies,50)*1000,
+                percentile(latencies,99)*1000,latencies[-1]*1000))
+
+class WorkloadRecorder:                             #以JSONL格式记录每条查询
+    def __init__(self,path):
+        self.fo = open(path,'w')
+        self.lock = threading.Lock()
+
+    def record(self,tid,start,sql,rows,latency,error=None,plan=None):
+        line = json.dumps({'ts':start,'tid':tid,'iface':'native' if tid[0] == 'n' else 'rest',
+                'sql':sql,'rows':rows,'latency':latency,'error':error,'plan':plan},ensure_ascii=False)
+        with self.lock:
+            self.fo.write(line+'\n')
+
+    def close(self):
+        with self.lock:
+            self.fo.close()
+
+def load_workload(path):                            #读取记录的负载，按开始时间排序
+    records = []
+    with open(path,'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r['ts'])
+    return records
+
+def percentile(latencies,p):
+    if not latencies:
+        return 0
+    return latencies[min(len(latencies)-1,int(len(latencies)*p/100))]
+
+def latency_summary(records):
+    latencies = sorted(r['latency'] for r in records)
+    errors = len([r for r in records if r['error'] is not None])
+    avg = sum(latencies)/len(latencies) if latencies else 0
+    return [len(latencies),errors,avg,percentile(latencies,50),percentile(latencies,90),
+            percentile(latencies,99),latencies[-1] if latencies else 0]
+
+def compare_latency(capture,replay):               #对比记录和重放的延迟分布(ms)
+    names = ['count','errors','avg','p50','p90','p99','max']
+    ifaces = ['all'] + sorted(set(r['iface'] for r in capture))
+    for iface in ifaces:
+        c = latency_summary([r for r in capture if iface in ('all',r['iface'])])
+        r = latency_summary([r for r in replay if iface in ('all',r['iface'])])
+        print('-'*60)
+        print('%-8s %14s %14s %10s' % (iface,'capture','replay','ratio'))
+        for i in range(len(names)):
+            if i < 2:
+                print('%-8s %14d %14d' % (names[i],c[i],r[i]))
+            else:
+                ratio = r[i]/c[i] if c[i] else 0
+                print('%-8s %14.3f %14.3f %10.2f' % (names[i],c[i]*1000,r[i]*1000,ratio))
+
+class LoadProgress:                                 #数据准备的进度和吞吐
+    def __init__(self,total_tables,total_rows):
+        self.lock = threading.Lock()
+        self.total_tables = total_tables
+        self.total_rows = total_rows
+        self.tables = 0
+        self.rows = 0
+        self.errors = []
+        self.start = time.time()
+        self.last_report = self.start
+
+    def add(self,tables,rows):
+        with self.lock:
+            self.tables += tables
+            self.rows += rows
+
+    def fail(self,e):
+        with self.lock:
+            self.errors.append(e)
+
+    def report(self,final=False):
+        now = time.time()
+        if not final and now - self.last_report < 1:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start,1e-6)
+        print("%s tables %d/%d, rows %d/%d, %.3fs, %.0f rows/s, %d errors" %
+            ('loaded' if final else 'loading',self.tables,self.total_tables,
+            self.rows,self.total_rows,elapsed,self.rows/elapsed,len(self.errors)))
+
 class ConcurrentInquiry:
     # def __init__(self,ts=1500000001000,host='127.0.0.1',user='root',password='taosdata',dbname='test',
     #             stb_prefix='st',subtb_prefix='t',n_Therads=10,r_Therads=10,probabilities=0.05,loop=5,
     #             stableNum = 2,subtableNum = 1000,insertRows = 100):  
     def __init__(self,ts,host,user,password,dbname,
                 stb_prefix,subtb_prefix,n_Therads,r_Therads,probabilities,loop,
-                stableNum ,subtableNum ,insertRows ,mix_table, replay):  
+                stableNum ,subtableNum ,insertRows ,mix_table, replay,
+                workload_file='', replay_speed=1.0, stream_fetch=0,
+                load_conns=4, max_sql_length=1048576, plan_mix='',
+                async_sessions=0, rest_conns=64):  
         self.n_numOfTherads = n_Therads
         self.r_numOfTherads = r_Therads
         self.ts=ts
@@ -66,6 +229,15 @@ class ConcurrentInquiry:
         self.max_ts = datetime.datetime.now()
         self.min_ts = datetime.datetime.now() - datetime.timedelta(days=5)
         self.replay = replay
+        self.workload_file = workload_file
+        self.replay_speed = replay_speed
+        self.recorder = None
+        self.stream_fetch = stream_fetch
+        self.load_conns = load_conns
+        self.max_sql_length = max_sql_length
+        self.plan_stats = PlanStats(plan_mix)
+        self.async_sessions = async_sessions
+        self.rest_conns = rest_conns
     def SetThreadsNum(self,num):
         self.numOfTherads=num
 
@@ -395,6 +567,33 @@ class ConcurrentInquiry:
             sql += 'where t1._c0 = t2._c0 and ' + 't1.' + str(join_section) + '=t2.' + str(join_section)
         return sql
 
+    def gen_one(self,target):                       #生成一条查询，子查询没选到列时返回0，重试
+        while True:
+            if target == 'join':
+                sql = self.gen_query_join()
+            elif target == 'nested':
+                sql = self.gen_subquery_sql()
+            else:
+                sql,temp = self.gen_query_sql()
+            if isinstance(sql,str):
+                return sql
+
+    def gen_sql(self):                              #按目标类别生成查询，返回(sql,计划类别)
+        target = self.plan_stats.pick()
+        if target is None:
+            if self.random_pick():
+                target = 'nested' if not self.random_pick() else None
+            else:
+                target = 'join'
+            sql = self.gen_one(target)
+            return sql,plan_class(sql)
+        for i in range(20):                         #普通查询的类别由随机子句决定，多试几次
+            sql = self.gen_one(target)
+            if plan_class(sql) == target:
+                return sql,target
+        self.plan_stats.miss(target)                #没生成目标类别，记为miss，不计入其他类别的统计
+        return sql,None
+
     def random_pick(self): 
         x = random.uniform(0,1) 
         cumulative_probability = 0.0 
@@ -403,65 +602,138 @@ class ConcurrentInquiry:
             if x < cumulative_probability:break 
         return item
         
-    def gen_data(self):
+    def connect(self):
+        return taos.connect(
+            host = '%s' % self.host,
+            user = '%s' % self.user,
+            password = '%s' % self.password,
+            )
+
+    def sub_table_tags(self,j):                     #子表的tag值，每100张表一个全NULL
+        if j % 100 == 0:
+            return "tags(NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL)"
+        return "tags(%d,%d,%d,%d,%d,%d,%d,'%s','%s',%d,%d,%d,%d)" % \
+                (j,j/2.0,j%41,j%51,j%53,j*1.0,j%2,'taos'+str(j),'涛思'+str(j), j%43, j%23 , j%17 , j%3167)
+
+    def row_values(self,i):                         #第i行的值，每100行一个全NULL
+        if i % 100 == 0:
+            return "(%d , NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL)" % (self.ts+i)
+        return "(%d , %d,%d,%d,%d,%d,%d,%d,'%s','%s',%d,%d,%d,%d)" % \
+                (self.ts+i, i%100, i/2.0, i%41, i%51, i%53, i*1.0, i%2,'taos'+str(i),'涛思'+str(i), i%43, i%23 , i%17 , i%3167)
+
+    def create_sqls(self,tables):                   #多表建表语句，每条不超过max_sql_length
+        parts = ['create table']
+        size = len(parts[0])
+        count = 0
+        for name,stb,j in tables:
+            clause = ' if not exists %s using %s %s' % (name,stb,self.sub_table_tags(j))
+            n = len(clause.encode('utf-8'))
+            if count and size + n > self.max_sql_length:
+                yield ''.join(parts),count
+                parts = ['create table']
+                size = len(parts[0])
+                count = 0
+            parts.append(clause)
+            size += n
+            count += 1
+        if count:
+            yield ''.join(parts),count
+
+    def insert_sqls(self,tables):                   #多表多行写入语句，每条不超过max_sql_length
+        parts = ['insert into']
+        size = len(parts[0])
+        count = 0
+        for name,stb,j in tables:
+            head = ' %s values ' % name
+            headSize = len(head.encode('utf-8'))
+            opened = False                          #本条语句里是否已写入该表的head
+            for i in range(self.insertRows):
+                values = self.row_values(i)
+                n = len(values.encode('utf-8'))
+                if not opened:
+                    n += headSize
+                if count and size + n > self.max_sql_length:
+                    yield ''.join(parts),count
+                    parts = ['insert into']
+                    size = len(parts[0])
+                    count = 0
+                    if opened:
+                        n += headSize
+                        opened = False
+                if not opened:
+                    parts.append(head)
+                    opened = True
+                parts.append(values)
+                size += n
+                count += 1
+        if count:
+            yield ''.join(parts),count
+
+    def load_thread(self,tables,progress):          #一个连接负责的子表: 建表并写入数据
+        try:
+            conn = self.connect()
+            cl = conn.cursor()
+            cl.execute("use %s" % self.dbname)
+            for sql,count in self.create_sqls(tables):
+                cl.execute(sql)
+                progress.add(count,0)
+            if self.insertRows:
+                for sql,count in self.insert_sqls(tables):
+                    cl.execute(sql)
+                    progress.add(0,count)
+            cl.close()
+            conn.close()
+        except Exception as e:
+            progress.fail(e)
+
+    def gen_data(self):                             #并行批量建表和写入测试数据
         stableNum = self.stableNum
         subtableNum = self.subtableNum
-        insertRows = self.insertRows
-        t0 = self.ts
-        host = self.host
-        user = self.user
-        password = self.password
-        conn = taos.connect(
-            host = '%s' % host,
-            user = '%s' % user,
-            password = '%s' % password,
-            )
+        conn = self.connect()
         cl = conn.cursor()
         cl.execute("drop database if  exists %s;" %self.dbname)
         cl.execute("create database if not exists %s;" %self.dbname)
         cl.execute("use %s" % self.dbname)
+        tables = []
         for k in range(stableNum):
             sql="create table %s (ts timestamp, c1 int, c2 float, c3 bigint, c4 smallint, c5 tinyint, c6 double, c7 bool,c8 binary(20),c9 nchar(20),c11 int unsigned,c12 smallint unsigned,c13 tinyint unsigned,c14 bigint unsigned) \
             tags(t1 int, t2 float, t3 bigint, t4 smallint, t5 tinyint, t6 double, t7 bool,t8 binary(20),t9 nchar(20), t11 int unsigned , t12 smallint unsigned , t13 tinyint unsigned , t14 bigint unsigned)" % (self.stb_prefix+str(k))
             cl.execute(sql)
             for j in range(subtableNum):
-                if j % 100 == 0:
-                    sql = "create table %s using %s tags(NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL)" % \
-                            (self.subtb_prefix+str(k)+'_'+str(j),self.stb_prefix+str(k))
-                else:
-                    sql = "create table %s using %s tags(%d,%d,%d,%d,%d,%d,%d,'%s','%s',%d,%d,%d,%d)" % \
-                            (self.subtb_prefix+str(k)+'_'+str(j),self.stb_prefix+str(k),j,j/2.0,j%41,j%51,j%53,j*1.0,j%2,'taos'+str(j),'涛思'+str(j), j%43, j%23 , j%17 , j%3167)
-                print(sql)
-                cl.execute(sql)
-                for i in range(insertRows):
-                    if i % 100 == 0 :
-                        ret = cl.execute(
-                        "insert into %s values (%d , NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL,NULL)" %
-                        (self.subtb_prefix+str(k)+'_'+str(j), t0+i))
-                    else:
-                        ret = cl.execute(
-                            "insert into %s values (%d , %d,%d,%d,%d,%d,%d,%d,'%s','%s',%d,%d,%d,%d)" %
-                            (self.subtb_prefix+str(k)+'_'+str(j), t0+i, i%100, i/2.0, i%41, i%51, i%53, i*1.0, i%2,'taos'+str(i),'涛思'+str(i), i%43, i%23 , i%17 , i%3167))
+                tables.append((self.subtb_prefix+str(k)+'_'+str(j),self.stb_prefix+str(k),j))
         cl.close()
         conn.close()
-        
+
+        progress = LoadProgress(len(tables),len(tables)*self.insertRows)
+        threads = []
+        for i in range(min(self.load_conns,len(tables))):
+            thread = threading.Thread(target=self.load_thread, args=(tables[i::self.load_conns],progress))
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+                progress.report()
+        progress.report(True)
+        if progress.errors:
+            raise progress.errors[0]
+
     def rest_query(self,sql):                                       #rest 接口
         host = self.host
         user = self.user
         password = self.password
         port =6041
-        url = "http://{}:{}/rest/sql".format(host, port )
+        url = "http://{}:{}/rest/sql/{}".format(host, port, self.dbname)
         try:
-            r = requests.post(url, 
-                data = 'use %s' % self.dbname,
-                auth = HTTPBasicAuth('root', 'taosdata'))  
             r = requests.post(url, 
                 data = sql,
                 auth = HTTPBasicAuth('root', 'taosdata'))         
         except:
             print("REST API Failure (TODO: more info here)")
             raise
-        rj = r.json()
+        return self.check_rest(r.json())
+
+    def check_rest(self,rj):                                        #检查rest返回，返回行数
         if ('status' not in rj):
             raise RuntimeError("No status in REST response")
 
@@ -497,23 +769,20 @@ class ConcurrentInquiry:
         print("Thread %d: starting" % threadID)
         loop = self.loop
         while loop:
-            
+                start = None
+                plan = None
+                sql = None
                 try:
-                    if self.random_pick():
-                        if self.random_pick():
-                            sql,temp=self.gen_query_sql()
-                        else:
-                            sql = self.gen_subquery_sql()
-                    else:
-                        sql = self.gen_query_join()
+                    sql,plan = self.gen_sql()
                     print("sql is ",sql)
                     fo.write(sql+'\n')
                     start = time.time()
-                    cl.execute(sql)
-                    cl.fetchall()
+                    rows = self.fetch_rows(cl,sql)
                     end = time.time()
                     print("time cost :",end-start)
+                    self.record('n%d' % threadID,start,sql,rows,end-start,plan=plan)
                 except Exception as e:
+                    self.record('n%d' % threadID,start,sql,0,time.time()-start if start else 0,str(e),plan)
                     print('-'*40)
                     print(
                 "Failure thread%d, sql: %s \nexception: %s" %
@@ -547,8 +816,7 @@ class ConcurrentInquiry:
             try:
                 print("sql is ",sql)
                 start = time.time()
-                cl.execute(sql)
-                cl.fetchall()
+                self.fetch_rows(cl,sql)
                 end = time.time()
                 print("time cost :",end-start)
             except Exception as e:
@@ -568,21 +836,20 @@ class ConcurrentInquiry:
         fo = open('bak_sql_r_%d'%threadID,'w+')
         loop = self.loop
         while loop:
+            start = None
+            plan = None
+            sql = None
             try:
-                if self.random_pick():
-                    if self.random_pick():
-                        sql,temp=self.gen_query_sql()
-                    else:
-                        sql = self.gen_subquery_sql()
-                else:
-                    sql = self.gen_query_join()
+                sql,plan = self.gen_sql()
                 print("sql is ",sql)
                 fo.write(sql+'\n')
                 start = time.time()
-                self.rest_query(sql)
+                rows = self.rest_query(sql)
                 end = time.time()
                 print("time cost :",end-start)
+                self.record('r%d' % threadID,start,sql,rows,end-start,plan=plan)
             except Exception as e:
+                self.record('r%d' % threadID,start,sql,0,time.time()-start if start else 0,str(e),plan)
                 print('-'*40)
                 print(
             "Failure thread%d, sql: %s \nexception: %s" %
@@ -595,6 +862,39 @@ class ConcurrentInquiry:
         fo.close()      
         print("Thread %d: finishing" % threadID)   
 
+    async def query_session_a(self,client,sessionID):         #一个异步rest会话，库名放在url里
+        loop = self.loop
+        while loop:
+            start = None
+            plan = None
+            sql = None
+            try:
+                sql,plan = self.gen_sql()
+                start = time.time()
+                rows = self.check_rest(await client.sql(sql,self.dbname))
+                self.record('a%d' % sessionID,start,sql,rows,time.time()-start,plan=plan)
+            except Exception as e:
+                self.record('a%d' % sessionID,start,sql,0,time.time()-start if start else 0,str(e),plan)
+                print('-'*40)
+                print(
+            "Failure session%d, sql: %s \nexception: %s" %
+            (sessionID, str(sql),str(e)))
+            loop -= 1
+
+    def query_thread_a(self):                                  #在一个线程的事件循环里运行全部异步rest会话
+        async def run_sessions():
+            client = TDAsyncRestClient(self.host,6041,self.user,self.password,self.rest_conns)
+            start = time.time()
+            await asyncio.gather(*(self.query_session_a(client,i) for i in range(self.async_sessions)))
+            await client.close()
+            summary = client.metrics.summary()
+            print("%d async sessions: %d requests in %.3fs over %d connections, %d errors, avg %.3fms p50 %.3fms p99 %.3fms" %
+                (self.async_sessions,summary['requests'],time.time()-start,client.opened,summary['errors'],
+                summary['avg_ms'],summary['p50_ms'],summary['p99_ms']))
+        print("Async thread: starting %d sessions" % self.async_sessions)
+        asyncio.run(run_sessions())
+        print("Async thread: finishing")
+
     def query_thread_rr(self,threadID):                      #使用rest接口重放
         print("Replay Thread %d: starting" % threadID)
         replay_sql = []
@@ -618,9 +918,96 @@ class ConcurrentInquiry:
                     exit(-1)  
         print("Replay Thread %d: finishing" % threadID)  
 
+    def fetch_rows(self,cl,sql):                    #执行并取回结果，返回行数
+        if not self.stream_fetch:
+            cl.execute(sql)
+            return len(cl.fetchall())
+        stats = streamQuery(cl,sql,self.stream_fetch == 2)
+        print("first row: %.6f last row: %.6f rows: %d checksum: %s" %
+            (stats.firstRowTime,stats.lastRowTime,stats.rows,stats.checksum))
+        return stats.rows
+
+    def record(self,tid,start,sql,rows,latency,error=None,plan=None):
+        if start is None:
+            return
+        if plan is not None:
+            self.plan_stats.add(plan,latency,error)
+        if self.recorder is not None:
+            self.recorder.record(tid,start,str(sql),rows,latency,error,plan)
+
+    def replay_thread(self,tid,records,base_ts,begin,results):     #按原始节奏重放一个线程的查询
+        conn = None
+        cl = None
+        if tid[0] == 'n':
+            conn = taos.connect(
+                host = '%s' % self.host,
+                user = '%s' % self.user,
+                password = '%s' % self.password,
+                )
+            cl = conn.cursor()
+            cl.execute("use %s;" % self.dbname)
+        print("Replay Thread %s: starting" % tid)
+        for r in records:
+            due = begin + (r['ts'] - base_ts) / self.replay_speed
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            error = None
+            rows = 0
+            start = time.time()
+            try:
+                if cl is None:
+                    rows = self.rest_query(r['sql'])
+                else:
+                    rows = self.fetch_rows(cl,r['sql'])
+            except Exception as e:
+                error = str(e)
+            end = time.time()
+            results.append({'ts':start,'tid':tid,'iface':r['iface'],'sql':r['sql'],'rows':rows,
+                    'latency':end-start,'error':error,'lag':start-due,
+                    'mismatch':error is None and r['error'] is None and rows != r['rows']})
+        if cl is not None:
+            cl.close()
+            conn.close()
+        print("Replay Thread %s: finishing" % tid)
+
+    def replay_workload(self):                      #以原有并发和节奏(或按倍速)重放记录的负载
+        capture = load_workload(self.workload_file)
+        if not capture:
+            print("no query recorded in %s" % self.workload_file)
+            return
+        per_thread = {}
+        for r in capture:
+            per_thread.setdefault(r['tid'],[]).append(r)
+        print("replay %d queries from %d threads at %.2fx speed" %
+            (len(capture),len(per_thread),self.replay_speed))
+        results = []
+        threads = []
+        begin = time.time() + 1         #给各线程建立连接留出时间
+        for tid in sorted(per_thread):
+            thread = threading.Thread(target=self.replay_thread,
+                args=(tid,per_thread[tid],capture[0]['ts'],begin,results))
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lags = sorted(r['lag'] for r in results)
+        print("capture span %.3fs, replay span %.3fs" %
+            (capture[-1]['ts'] - capture[0]['ts'],
+            max(r['ts'] for r in results) - min(r['ts'] for r in results)))
+        print("schedule lag p50 %.3fms p99 %.3fms, row count mismatches %d" %
+            (percentile(lags,50)*1000,percentile(lags,99)*1000,
+            len([r for r in results if r['mismatch']])))
+        compare_latency(capture,results)
+
     def run(self):
         print(self.n_numOfTherads,self.r_numOfTherads)  
         threads = []
+        if self.replay == 2:
+            self.replay_workload()
+            return
+        if self.workload_file and not self.replay:
+            self.recorder = WorkloadRecorder(self.workload_file)
         if self.replay:  #whether replay 
             for i in range(self.n_numOfTherads):
                 thread = threading.Thread(target=self.query_thread_nr, args=(i,))
@@ -639,6 +1026,18 @@ class ConcurrentInquiry:
                 thread = threading.Thread(target=self.query_thread_r, args=(i,))
                 threads.append(thread)
                 thread.start()
+            if self.async_sessions:
+                thread = threading.Thread(target=self.query_thread_a)
+                threads.append(thread)
+                thread.start()
+        if self.replay:
+            return
+        for thread in threads:
+            thread.join()
+        if self.recorder is not None:
+            self.recorder.close()
+            print("workload recorded to %s" % self.workload_file)
+        self.plan_stats.report()
  
 parser = argparse.ArgumentParser()
 parser.add_argument(
@@ -759,14 +1158,73 @@ parser.add_argument(
     action='store',
     default=0,
     type=int,
-    help='0:not replay ,1:replay  (default: 0)')
+    help='0:not replay ,1:replay ,2:replay --workload-file with original timing (default: 0)')
+parser.add_argument(
+    '-W',
+    '--workload-file',
+    action='store',
+    default='',
+    type=str,
+    help='JSONL file the queries are recorded to, or replayed from with -R 2 (default: none)')
+parser.add_argument(
+    '-x',
+    '--replay-speed',
+    action='store',
+    default=1.0,
+    type=float,
+    help='speed factor of the timed replay, 2 replays twice as fast (default: 1.0)')
+parser.add_argument(
+    '-s',
+    '--stream-fetch',
+    action='store',
+    default=0,
+    type=int,
+    help='0:fetchall ,1:count native results block by block ,2:also checksum them (default: 0)')
+parser.add_argument(
+    '-j',
+    '--load-connections',
+    action='store',
+    default=4,
+    type=int,
+    help='connections loading data in parallel with -c (default: 4)')
+parser.add_argument(
+    '-L',
+    '--max-sql-length',
+    action='store',
+    default=1048576,
+    type=int,
+    help='max length in bytes of one create or insert statement with -c (default: 1048576)')
+parser.add_argument(
+    '-g',
+    '--plan-mix',
+    action='store',
+    default='',
+    type=str,
+    help='steer queries to plan classes %s, e.g. join=1,window=2, or to the worst p99 with tail (default: random)' % ','.join(plan_classes))
+
+parser.add_argument(
+    '-A',
+    '--async-sessions',
+    action='store',
+    default=0,
+    type=int,
+    help='number of REST sessions run as coroutines in one thread, besides -T threads (default: 0)')
+parser.add_argument(
+    '-k',
+    '--rest-connections',
+    action='store',
+    default=64,
+    type=int,
+    help='keep-alive connections shared by the async REST sessions (default: 64)')
 
 args = parser.parse_args()
 q = ConcurrentInquiry(
     args.ts,args.host_name,args.user,args.password,args.db_name,
                 args.stb_name_prefix,args.subtb_name_prefix,args.number_of_native_threads,args.number_of_rest_threads,
                 args.probabilities,args.loop_per_thread,args.number_of_stables,args.number_of_tables ,args.number_of_records,
-                args.mix_stable_subtable, args.replay )
+                args.mix_stable_subtable, args.replay, args.workload_file, args.replay_speed,
+                args.stream_fetch, args.load_connections, args.max_sql_length,
+                args.plan_mix, args.async_sessions, args.rest_connections )
 
 if args.create_table: 
     q.gen_data()
@@ -21,6 +21,8 @@ from typing import List
 from typing import Optional # Type hinting, ref: https://stackoverflow.com/questions/19202633/python-3-type-hinting-for-none
 
 import textwrap
+import contextlib
+import collections
 import time
 import datetime
 import random
@@ -35,6 +37,8 @@ import traceback
 import requests
 # from guppy import hpy
 import gc
+import queue
+import multiprocessing
 import taos
 
 
@@ -84,6 +88,8 @@ class WorkerThread:
         # self._thread = threading.Thread(target=runThread, args=(self,))
         self._thread = threading.Thread(target=self.run)
         self._stepGate = threading.Event()
+        self._numTasks = 0
+        self._waitTime = 0.0 # seconds spent at the step barrier/gate, or waiting for a DB step
         # Let us have a DB connection of our own
         if (Config.getConfig().per_thread_db_connection):  # type: ignore
             # print("connector_type = {}".format(Config.getConfig().connector_type))
@@ -132,7 +138,11 @@ class WorkerThread:
             Logging.debug("Worker thread openning database connection")
             self._dbConn.open()
 
-        self._doTaskLoop()
+        if Config.getConfig().pipelined:
+            self._doPipelinedLoop()
+        else:
+            self._doTaskLoop()
+        self._tc.getExecStats().recordThreadStats(self._tid, self._numTasks, self._waitTime)
 
         # clean up
         if (Config.getConfig().per_thread_db_connection):  # type: ignore
@@ -146,6 +156,7 @@ class WorkerThread:
         # tc = ThreadCoordinator(None)
         while True:
             tc = self._tc  # Thread Coordinator, the overall master
+            waitStart = time.time()
             try:
                 tc.crossStepBarrier()  # shared barrier first, INCLUDING the last one
             except threading.BrokenBarrierError as err: # main thread timed out
@@ -156,6 +167,7 @@ class WorkerThread:
             Logging.debug("[TRD] Worker thread [{}] exited barrier...".format(self._tid))
             self.crossStepGate()   # then per-thread gate, after being tapped
             Logging.debug("[TRD] Worker thread [{}] exited step gate...".format(self._tid))
+            self._waitTime += time.time() - waitStart
             if not self._tc.isRunning():
                 print("_wts", end="")
                 Logging.debug("[TRD] Thread Coordinator not running any more, worker thread now stopping...")
@@ -163,19 +175,7 @@ class WorkerThread:
 
             
             # Before we fetch the task and run it, let's ensure we properly "use" the database (not needed any more)
-            try:
-                if (Config.getConfig().per_thread_db_connection):  # most likely TRUE
-                    if not self._dbConn.isOpen:  # might have been closed during server auto-restart
-                        self._dbConn.open()
-                # self.useDb() # might encounter exceptions. TODO: catch
-            except taos.error.ProgrammingError as err:
-                errno = Helper.convertErrno(err.errno)
-                if errno in [0x383, 0x386, 0x00B, 0x014]  : # invalid database, dropping, Unable to establish connection, Database not ready
-                    # ignore
-                    dummy = 0
-                else:
-                    print("\nCaught programming error. errno=0x{:X}, msg={} ".format(errno, err.msg))
-                    raise
+            self._ensureDbConnOpen()
 
             # Fetch a task from the Thread Coordinator
             Logging.debug( "[TRD] Worker thread [{}] about to fetch task".format(self._tid))
@@ -186,11 +186,55 @@ class WorkerThread:
                     self._tid, task.__class__.__name__))
             task.execute(self)
             tc.saveExecutedTask(task)
+            self._numTasks += 1
             Logging.debug("[TRD] Worker thread [{}] finished executing task".format(self._tid))
 
             # self._dbInUse = False  # there may be changes between steps
         # print("_wtd", end=None) # worker thread died
 
+    def _doPipelinedLoop(self):
+        '''
+            Pull tasks until the run ends, only waiting when the picked database
+            is between steps, i.e. busy with its own state transition
+        '''
+        tc = self._tc
+        while tc.isRunning():
+            self._ensureDbConnOpen()
+            if not tc.claimTask(): # all tasks of the run handed out
+                break
+
+            db = tc.pickDatabase()
+            stepper = tc.getDbStepper(db)
+            waitStart = time.time()
+            entered = stepper.enter(tc.isRunning)
+            self._waitTime += time.time() - waitStart
+            if not entered:
+                break
+
+            task = tc.fetchTaskForDb(db)
+            Logging.debug("[TRD] Worker thread [{}] about to execute task: {}".format(
+                    self._tid, task.__class__.__name__))
+            try:
+                task.execute(self)
+            finally:
+                tc.finishPipelinedTask(task, stepper, self.getDbConn())
+            self._numTasks += 1
+
+    def _ensureDbConnOpen(self):
+        try:
+            if (Config.getConfig().per_thread_db_connection):  # most likely TRUE
+                if not self._dbConn.isOpen:  # might have been closed during server auto-restart
+                    self._dbConn.open()
+            # self.useDb() # might encounter exceptions. TODO: catch
+        except taos.error.ProgrammingError as err:
+            errno = Helper.convertErrno(err.errno)
+            if errno in [0x383, 0x386, 0x00B, 0x014]  : # invalid database, dropping, Unable to establish connection, Database not ready
+                # ignore
+                dummy = 0
+            else:
+                print("\nCaught programming error. errno=0x{:X}, msg={} ".format(errno, err.msg))
+                raise
+
     def verifyThreadSelf(self):  # ensure we are called by this own thread
         if (threading.get_ident() != self._thread.ident):
             raise RuntimeError("Unexpectly called from other threads")
@@ -255,7 +299,7 @@ class WorkerThread:
 class ThreadCoordinator:
     WORKER_THREAD_TIMEOUT = 120  # Normal: 120
 
-    def __init__(self, pool: ThreadPool, dbManager: DbManager):
+    def __init__(self, pool: ThreadPool, dbManager: DbManager, dbNumBase = 0):
         self._curStep = -1  # first step is 0
         self._pool = pool
         # self._wd = wd
@@ -268,9 +312,20 @@ class ThreadCoordinator:
             self._pool.numThreads + 1)  # one barrier for all threads
         self._execStats = ExecutionStats()
         self._runStatus = Status.STATUS_RUNNING
+        self._dbNumBase = dbNumBase # first DB number of our shard, with worker processes
         self._initDbs()
         self._stepStartTime = None  # Track how long it takes to execute each step
 
+        # pipelined mode only
+        self._dbSteppers = {db.getDbNum(): DbStepper(db, self._pool.numThreads) for db in self._dbs}
+        self._tasksLeft = 0
+        self._lastTaskEndTime = 0.0
+        self._pipelineStopped = False # the TE stays, tasks still running may need it
+
+        # shared with other worker processes, if any
+        self._sharedStopFlag = None # type: Optional[Any]
+        self._sharedStepCounter = None # type: Optional[Any]
+
     def getTaskExecutor(self):
         if self._te is None:
             raise CrashGenError("Unexpected empty TE")
@@ -288,11 +343,26 @@ class ThreadCoordinator:
         self._runStatus = Status.STATUS_STOPPING
         self._execStats.registerFailure("User Interruption")
 
+    def setSharedState(self, stopFlag, stepCounter):
+        ''' Cross-process values (multiprocessing.Value) of a WorkerProcessPool '''
+        self._sharedStopFlag = stopFlag
+        self._sharedStepCounter = stepCounter
+
+    def _stopRequested(self):
+        if self._runStatus != Status.STATUS_RUNNING:
+            return True
+        return self._sharedStopFlag is not None and self._sharedStopFlag.value != 0
+
+    def _countStep(self):
+        if self._sharedStepCounter is not None:
+            with self._sharedStepCounter.get_lock():
+                self._sharedStepCounter.value += 1
+
     def _runShouldEnd(self, transitionFailed, hasAbortedTask, workerTimeout):
         maxSteps = Config.getConfig().max_steps  # type: ignore
         if self._curStep >= (maxSteps - 1): # maxStep==10, last curStep should be 9
             return True
-        if self._runStatus != Status.STATUS_RUNNING:
+        if self._stopRequested():
             return True
         if transitionFailed:
             return True
@@ -312,6 +382,7 @@ class ThreadCoordinator:
 
     def _releaseAllWorkerThreads(self, transitionFailed):
         self._curStep += 1  # we are about to get into next step. TODO: race condition here!
+        self._countStep()
         # Now not all threads had time to go to sleep
         Logging.debug(
             "--\r\n\n--> Step {} starts with main thread waking up".format(self._curStep))
@@ -384,6 +455,10 @@ class ThreadCoordinator:
         return transitionFailed
 
     def run(self):
+        if Config.getConfig().pipelined:
+            self._runPipelined()
+            return
+
         self._pool.createAndStartThreads(self)
 
         # Coordinate all threads step by step
@@ -473,6 +548,89 @@ class ThreadCoordinator:
         Logging.info(". . . All worker threads finished") # No CR/LF before
         self._execStats.endExec()
 
+    def _runPipelined(self):
+        '''
+            No global step: workers keep pulling tasks and each database moves
+            to its next state on its own, once the tasks of its step are done.
+            The main thread only watches for the end of the run.
+        '''
+        maxSteps = Config.getConfig().max_steps  # type: ignore
+        self._tasksLeft = maxSteps * self._pool.numThreads # as many tasks as the stepped run
+        self._curStep = 0
+        self._te = TaskExecutor(self._curStep)
+        self._lastTaskEndTime = time.time()
+        self._pool.createAndStartThreads(self)
+
+        self._execStats.startExec()  # start the stop watch
+        while self.isRunning() and self._pool.hasLiveThreads():
+            if self._stopRequested():
+                break
+            if time.time() - self._lastTaskEndTime > self.WORKER_THREAD_TIMEOUT:
+                self._execStats.registerFailure("Aborted due to worker thread timeout")
+                Logging.error("\n")
+                Logging.error("Main loop aborted, no task finished in {} seconds".format(
+                    ThreadCoordinator.WORKER_THREAD_TIMEOUT))
+                Logging.error("TAOS related threads blocked at (stack frames top-to-bottom):")
+                ts = ThreadStacks()
+                ts.print(filterInternal=True)
+                break
+            time.sleep(0.1)
+
+        self._pipelineStopped = True
+        for stepper in self._dbSteppers.values():
+            stepper.wakeAll()
+        Logging.debug("Main thread joining all threads")
+        self._pool.joinAll()  # Get all threads to finish
+        self._te = None  # No more executor, time to end
+        Logging.info(". . . All worker threads finished") # No CR/LF before
+        self._execStats.endExec()
+
+    def claimTask(self):
+        with self._lock:
+            if self._tasksLeft <= 0:
+                return False
+            self._tasksLeft -= 1
+            return True
+
+    def getDbStepper(self, db: Database) -> DbStepper:
+        return self._dbSteppers[db.getDbNum()]
+
+    def finishPipelinedTask(self, task: Task, stepper: DbStepper, dbc: DbConn):
+        '''
+            Called by a worker thread after executing a task, the last task of a
+            database step also carries out the state transition of that database
+        '''
+        self._lastTaskEndTime = time.time()
+        if task.isAborted():
+            Logging.info("Aborted task encountered, exiting test program")
+            self._execStats.registerFailure("Aborted Task Encountered")
+            self._pipelineStopped = True
+        tasks = stepper.leave(task)
+        if tasks is None: # the step of this database goes on
+            return
+
+        db = task.getDb()
+        try:
+            Logging.debug("[STT] starting transitions for DB: {}".format(db.getName()))
+            db.getStateMachine().transition(tasks, dbc)
+            Logging.debug("[STT] transition ended for DB: {}".format(db.getName()))
+        except taos.error.ProgrammingError as err:
+            errno2 = Helper.convertErrno(err.errno)  # correct error scheme
+            errMsg = "Transition failed: errno=0x{:X}, msg: {}".format(errno2, err)
+            Logging.info(errMsg)
+            traceback.print_exc()
+            self._execStats.registerFailure(errMsg)
+            self._pipelineStopped = True
+        finally:
+            stepper.transitionDone()
+
+        with self._lock:
+            self._curStep += 1
+            self._te = TaskExecutor(self._curStep) # a new TE for the new step
+        self._countStep()
+        if not Config.getConfig().debug:
+            Progress.emit(Progress.STEP_BOUNDARY)
+
     def cleanup(self): # free resources
         self._pool.cleanup()
 
@@ -512,17 +670,18 @@ class ThreadCoordinator:
             time.sleep(0)  # yield
 
     def isRunning(self):
-        return self._te is not None
+        return self._te is not None and not self._pipelineStopped
 
     def _initDbs(self):
         ''' Initialize multiple databases, invoked at __ini__() time '''
         self._dbs = [] # type: List[Database]
         dbc = self.getDbManager().getDbConn()
         if Config.getConfig().max_dbs == 0:
-            self._dbs.append(Database(0, dbc))
+            self._dbs.append(Database(self._dbNumBase, dbc))
         else:            
             baseDbNumber = int(datetime.datetime.now().timestamp( # Don't use Dice/random, as they are deterministic
                 )*333) % 888 if Config.getConfig().dynamic_db_table_names else 0
+            baseDbNumber += self._dbNumBase
             for i in range(Config.getConfig().max_dbs):
                 self._dbs.append(Database(baseDbNumber + i, dbc))
 
@@ -541,7 +700,9 @@ class ThreadCoordinator:
             raise RuntimeError("Cannot fetch task when not running")
 
         # pick a task type for current state
-        db = self.pickDatabase()
+        return self.fetchTaskForDb(self.pickDatabase())
+
+    def fetchTaskForDb(self, db: Database) -> Task:
         taskType = db.getStateMachine().pickTaskType() # dynamic name of class
         return taskType(self._execStats, db)  # create a task from it
 
@@ -572,88 +733,203 @@ class ThreadPool:
             Logging.debug("Joining thread...")
             workerThread._thread.join()
 
+    def hasLiveThreads(self):
+        return any(workerThread._thread.is_alive() for workerThread in self.threadList)
+
     def cleanup(self):
         self.threadList = [] # maybe clean up each?
 
+class DbStepper:
+    '''
+        One step of one database in pipelined mode: up to "window" tasks are
+        handed out for the database, and once all of them are done the last
+        one to finish transitions the database state, while tasks on other
+        databases keep running.
+    '''
+    def __init__(self, db: Database, window: int):
+        self._db = db
+        self._window = window
+        self._cond = threading.Condition()
+        self._numEntered = 0
+        self._numInFlight = 0
+        self._doneTasks = [] # type: List[Task]
+        self._inTransition = False
+
+    def enter(self, isRunning) -> bool:
+        '''
+            Wait until the current step of the database takes one more task,
+            returns False if the run ended meanwhile
+        '''
+        with self._cond:
+            while self._inTransition or self._numEntered >= self._window:
+                if not isRunning():
+                    return False
+                self._cond.wait(0.5)
+            self._numEntered += 1
+            self._numInFlight += 1
+            return True
+
+    def leave(self, task: Task) -> Optional[List[Task]]:
+        '''
+            Returns the tasks of the step if this was the last of them, the
+            caller must then transition the database and call transitionDone()
+        '''
+        with self._cond:
+            self._doneTasks.append(task)
+            self._numInFlight -= 1
+            if self._numEntered < self._window or self._numInFlight > 0:
+                return None
+            self._inTransition = True
+            tasks = self._doneTasks
+            self._doneTasks = []
+            return tasks
+
+    def transitionDone(self):
+        with self._cond:
+            self._numEntered = 0
+            self._inTransition = False
+            self._cond.notify_all()
+
+    def wakeAll(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
 # A queue of continguous POSITIVE integers, used by DbManager to generate continuous numbers
 # for new table names
 
 
 class LinearQueue():
+    '''
+        Allocator of integer slots: released slots go to a FIFO free list so
+        allocate/release are O(1) and every free slot gets reused in turn,
+        instead of probing random indexes until an unused one turns up.
+    '''
     def __init__(self):
         self.firstIndex = 1  # 1st ever element
         self.lastIndex = 0
         self._lock = threading.RLock()  # our functions may call each other
         self.inUse = set()  # the indexes that are in use right now
+        self._free = collections.deque() # released indexes, oldest first
+        self._queued = set() # indexes in self._free, so none is queued twice
+        # statistics, updated while holding the lock
+        self._numAllocs = 0
+        self._numCollisions = 0 # tryAllocate() found the slot taken
+        self._numExhausted = 0 # pickAndAllocate() found nothing free
+        self._numContended = 0 # the lock was held by another thread
 
     def toText(self):
         return "[{}..{}], in use: {}".format(
             self.firstIndex, self.lastIndex, self.inUse)
 
+    @contextlib.contextmanager
+    def _locked(self):
+        if not self._lock.acquire(blocking=False):
+            self._lock.acquire()
+            self._numContended += 1
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def _allocateLocked(self, i):
+        if (i in self.inUse):
+            raise RuntimeError(
+                "Cannot re-use same index in queue: {}".format(i))
+        self.inUse.add(i)
+        self._numAllocs += 1
+
+    def _freeLocked(self, i):
+        if i not in self._queued:
+            self._queued.add(i)
+            self._free.append(i)
+
     # Push (add new element, largest) to the tail, and mark it in use
     def push(self):
-        with self._lock:
-            # if ( self.isEmpty() ):
-            #     self.lastIndex = self.firstIndex
-            #     return self.firstIndex
-            # Otherwise we have something
+        with self._locked():
             self.lastIndex += 1
-            self.allocate(self.lastIndex)
-            # self.inUse.add(self.lastIndex) # mark it in use immediately
+            self._allocateLocked(self.lastIndex)
             return self.lastIndex
 
+    def extend(self, size):
+        '''
+            Grow to at least size elements, the new ones free for picking
+        '''
+        with self._locked():
+            while self.size() < size:
+                self.lastIndex += 1
+                self._freeLocked(self.lastIndex)
+
     def pop(self):
-        with self._lock:
+        with self._locked():
             if (self.isEmpty()):
-                # raise RuntimeError("Cannot pop an empty queue")
                 return False  # TODO: None?
 
             index = self.firstIndex
             if (index in self.inUse):
                 return False
 
-            self.firstIndex += 1
+            self.firstIndex += 1 # stays in self._free until picked, then skipped
             return index
 
     def isEmpty(self):
         return self.firstIndex > self.lastIndex
 
     def popIfNotEmpty(self):
-        with self._lock:
+        with self._locked():
             if (self.isEmpty()):
                 return 0
             return self.pop()
 
     def allocate(self, i):
-        with self._lock:
-            # Logging.debug("LQ allocating item {}".format(i))
-            if (i in self.inUse):
-                raise RuntimeError(
-                    "Cannot re-use same index in queue: {}".format(i))
-            self.inUse.add(i)
+        with self._locked():
+            self._allocateLocked(i)
+
+    def tryAllocate(self, i):
+        '''
+            Mark slot i in use, returns False (and counts a collision) if some
+            other thread holds it already
+        '''
+        with self._locked():
+            if i in self.inUse:
+                self._numCollisions += 1
+                return False
+            self._allocateLocked(i)
+            return True
 
     def release(self, i):
-        with self._lock:
-            # Logging.debug("LQ releasing item {}".format(i))
+        with self._locked():
             self.inUse.remove(i)  # KeyError possible, TODO: why?
+            self._freeLocked(i)
 
     def size(self):
         return self.lastIndex + 1 - self.firstIndex
 
     def pickAndAllocate(self):
-        if (self.isEmpty()):
-            return None
-        with self._lock:
-            cnt = 0  # counting the interations
-            while True:
-                cnt += 1
-                if (cnt > self.size() * 10):  # 10x iteration already
-                    # raise RuntimeError("Failed to allocate LinearQueue element")
-                    return None
-                ret = Dice.throwRange(self.firstIndex, self.lastIndex + 1)
-                if (ret not in self.inUse):
-                    self.allocate(ret)
+        '''
+            The free slot released longest ago, marked in use, or None if
+            every slot is taken
+        '''
+        with self._locked():
+            while self._free:
+                ret = self._free.popleft()
+                self._queued.discard(ret)
+                # may be popped or allocated directly since it was released
+                if self.firstIndex <= ret <= self.lastIndex and ret not in self.inUse:
+                    self._allocateLocked(ret)
                     return ret
+            self._numExhausted += 1
+            return None
+
+    def getStats(self):
+        with self._locked():
+            return {
+                'allocations': self._numAllocs,
+                'collisions': self._numCollisions,
+                'exhausted': self._numExhausted,
+                'contended': self._numContended,
+                'inUse': len(self.inUse),
+            }
 
 
 class AnyState:
@@ -1125,26 +1401,44 @@ class Database:
             Fetch a timestamp tick, with some random factor, may not be unique.
         ''' 
         with cls._clsLock:  # prevent duplicate tick
-            if cls._lastLaggingTick is None or cls._lastTick is None : # not initialized
-                # 10k at 1/20 chance, should be enough to avoid overlaps
-                tick = cls.setupLastTick()
-                cls._lastTick = tick
-                cls._lastLaggingTick = tick + datetime.timedelta(0, -60*60*25) # 25 hours, set DAYS=1 when creating DB, to get multiple data files
-                # if : # should be quite a bit into the future
-
-            if Config.isSet('mix_oos_data') and Dice.throw(5) == 0:  # if asked to, w/ 1/5 chance, return lagging tick
-                cls._lastLaggingTick += datetime.timedelta(0, 1) # pick the next sequence from the lagging tick sequence
-                return cls._lastLaggingTick 
-            else:  # regular
-                # add one second to it
-                cls._lastTick += datetime.timedelta(0, 1)
-                return cls._lastTick
+            return cls._nextTickLocked()
+
+    @classmethod
+    def getNextTicks(cls, n: int) -> List[datetime.datetime]:
+        '''
+            Fetch n ticks in one go, taking the class lock only once
+        '''
+        with cls._clsLock:
+            return [cls._nextTickLocked() for _ in range(n)]
+
+    @classmethod
+    def _nextTickLocked(cls):
+        if cls._lastLaggingTick is None or cls._lastTick is None : # not initialized
+            # 10k at 1/20 chance, should be enough to avoid overlaps
+            tick = cls.setupLastTick()
+            cls._lastTick = tick
+            cls._lastLaggingTick = tick + datetime.timedelta(0, -60*60*25) # 25 hours, set DAYS=1 when creating DB, to get multiple data files
+            # if : # should be quite a bit into the future
+
+        if Config.isSet('mix_oos_data') and Dice.throw(5) == 0:  # if asked to, w/ 1/5 chance, return lagging tick
+            cls._lastLaggingTick += datetime.timedelta(0, 1) # pick the next sequence from the lagging tick sequence
+            return cls._lastLaggingTick 
+        else:  # regular
+            # add one second to it
+            cls._lastTick += datetime.timedelta(0, 1)
+            return cls._lastTick
 
     def getNextInt(self):
         with self._lock:
             self._lastInt += 1
             return self._lastInt
 
+    def getNextInts(self, n: int) -> List[int]:
+        with self._lock:
+            first = self._lastInt + 1
+            self._lastInt += n
+            return list(range(first, first + n))
+
     def getNextBinary(self):
         return "Beijing_Shanghai_Los_Angeles_New_York_San_Francisco_Chicago_Beijing_Shanghai_Los_Angeles_New_York_San_Francisco_Chicago_{}".format(
             self.getNextInt())
@@ -1159,6 +1453,9 @@ class Database:
     def getNextColor(self):
         return random.choice(self.ALL_COLORS)
 
+    def getNextColors(self, n: int) -> List[str]:
+        return random.choices(self.ALL_COLORS, k=n)
+
 
 class TaskExecutor():
     class BoundedList:
@@ -1486,6 +1783,12 @@ class ExecutionStats:
 
         self._failed = False
         self._failureReason = None
+        self._threadStats = {} # type: Dict[Any, Tuple[int, float]] # tid -> (tasks executed, wait time)
+
+        # set when the stats are merged from worker processes, instead of our own class-wide ones
+        self._mergedSlotStats = None # type: Optional[Dict[str, int]]
+        self._mergedLongestQuery = None # type: Optional[Tuple[float, float, str]]
+        self._numSteps = None # type: Optional[int]
 
     def __str__(self):
         return "[ExecStats: _failed={}, _failureReason={}".format(
@@ -1530,6 +1833,50 @@ class ExecutionStats:
         self._failed = True
         self._failureReason = reason
 
+    def recordThreadStats(self, tid, numTasks, waitTime):
+        with self._lock:
+            self._threadStats[tid] = (numTasks, waitTime)
+
+    def exportStats(self):
+        ''' Plain data, to be sent from a worker process and merged by the parent '''
+        with self._lock:
+            return {
+                'execTimes': self._execTimes,
+                'errors': self._errors,
+                'accRunTime': self._accRunTime,
+                'failureReason': self._failureReason if self._failed else None,
+                'threadStats': self._threadStats,
+                'slotStats': TaskAddData.getSlotStats(),
+                'longestQuery': (MyTDSql.longestQueryTime, MyTDSql.lqStartTime, MyTDSql.longestQuery),
+            }
+
+    def mergeStats(self, procNum, stats):
+        with self._lock:
+            for k, n in stats['execTimes'].items():
+                t = self._execTimes.setdefault(k, [0, 0])
+                t[0] += n[0]
+                t[1] += n[1]
+            for k, errors in stats['errors'].items():
+                ourErrors = self._errors.setdefault(k, {})
+                for eno, n in errors.items():
+                    ourErrors[eno] = ourErrors.get(eno, 0) + n
+            self._accRunTime += stats['accRunTime']
+            if stats['failureReason'] is not None and not self._failed:
+                self._failed = True
+                self._failureReason = "process {}: {}".format(procNum, stats['failureReason'])
+            for tid, threadStats in stats['threadStats'].items():
+                self._threadStats["{}.{}".format(procNum, tid)] = threadStats
+            if self._mergedSlotStats is None:
+                self._mergedSlotStats = dict(stats['slotStats'])
+            else:
+                for k, n in stats['slotStats'].items():
+                    self._mergedSlotStats[k] += n
+            if self._mergedLongestQuery is None or stats['longestQuery'][0] > self._mergedLongestQuery[0]:
+                self._mergedLongestQuery = stats['longestQuery']
+
+    def setNumSteps(self, numSteps):
+        self._numSteps = numSteps
+
     def printStats(self):
         Logging.info(
             "----------------------------------------------------------------------")
@@ -1563,12 +1910,23 @@ class ExecutionStats:
         Logging.info(
             "| Total Elapsed Time (from wall clock): {:.3f} seconds".format(
                 self._elapsedTime))
+        if self._elapsedTime > 0:
+            Logging.info("| Tasks Per Second (from wall clock): {:.1f}".format(execTimesAny / self._elapsedTime))
+        for tid, (numTasks, waitTime) in sorted(self._threadStats.items()):
+            Logging.info("|    Thread {:<3}: {} tasks, {:.3f} seconds waiting for steps".format(tid, numTasks, waitTime))
         Logging.info("| Top numbers written: {}".format(TaskExecutor.getBoundedList()))
+        slotStats = self._mergedSlotStats or TaskAddData.getSlotStats()
+        Logging.info("| Table slots: {allocations} allocations, {collisions} collisions, "
+            "{exhausted} exhausted, {contended} lock contentions".format(**slotStats))
         Logging.info("| Active DB Native Connections (now): {}".format(DbConnNative.totalConnections))
+        lqTime, lqStartTime, lQuery = self._mergedLongestQuery or (
+            MyTDSql.longestQueryTime, MyTDSql.lqStartTime, MyTDSql.longestQuery)
         Logging.info("| Longest native query time: {:.3f} seconds, started: {}".
-            format(MyTDSql.longestQueryTime, 
-                time.strftime("%x %X", time.localtime(MyTDSql.lqStartTime))) )
-        Logging.info("| Longest native query: {}".format(MyTDSql.longestQuery))
+            format(lqTime, 
+                time.strftime("%x %X", time.localtime(lqStartTime))) )
+        Logging.info("| Longest native query: {}".format(lQuery))
+        if self._numSteps is not None:
+            Logging.info("| Steps Completed (all worker processes): {}".format(self._numSteps))
         Logging.info(
             "----------------------------------------------------------------------")
 
@@ -2052,14 +2410,70 @@ class TaskRestartService(StateTransitionTask):
 
         self._isRunning = False
 
+class InsertBatchBuilder:
+    '''
+        Renders column arrays (ticks, ints, colors) of many regular tables into
+        multi-table "INSERT INTO t1 VALUES ... t2 VALUES ..." statements, each
+        carrying at most rowsPerRequest rows
+    '''
+    def __init__(self, rowsPerRequest: int):
+        self._rowsPerRequest = max(1, rowsPerRequest)
+        self._statements = [] # type: List[str]
+        self._parts = [] # type: List[str]
+        self._numRows = 0
+
+    def add(self, fullTableName: str, ticks: List, ints: List[int], colors: List[str]):
+        pos = 0
+        while pos < len(ticks):
+            n = min(len(ticks) - pos, self._rowsPerRequest - self._numRows)
+            values = " ".join(["('{}',{},'{}')".format(t, i, c) for t, i, c in
+                zip(ticks[pos:pos+n], ints[pos:pos+n], colors[pos:pos+n])])
+            self._parts.append("{} VALUES {}".format(fullTableName, values))
+            self._numRows += n
+            pos += n
+            if self._numRows >= self._rowsPerRequest:
+                self._flush()
+
+    def _flush(self):
+        if self._parts:
+            self._statements.append("INSERT INTO " + " ".join(self._parts))
+        self._parts = []
+        self._numRows = 0
+
+    def getStatements(self) -> List[str]:
+        self._flush()
+        return self._statements
+
+
 class TaskAddData(StateTransitionTask):
-    # Track which table is being actively worked on
-    activeTable: Set[int] = set()
+    # Track which table is being actively worked on: slot i+1 in the queue of
+    # a database is its regular table i
+    tableSlots = {} # type: Dict[str, LinearQueue]
+    tableSlotsLock = threading.Lock()
 
     # We use these two files to record operations to DB, useful for power-off tests
     fAddLogReady = None # type: Optional[io.TextIOWrapper]
     fAddLogDone  = None # type: Optional[io.TextIOWrapper]
 
+    @classmethod
+    def getTableSlots(cls, dbName, numTables) -> LinearQueue:
+        with cls.tableSlotsLock:
+            slots = cls.tableSlots.get(dbName)
+            if slots is None:
+                slots = cls.tableSlots[dbName] = LinearQueue()
+        slots.extend(numTables)
+        return slots
+
+    @classmethod
+    def getSlotStats(cls):
+        stats = {'allocations': 0, 'collisions': 0, 'exhausted': 0, 'contended': 0, 'inUse': 0}
+        with cls.tableSlotsLock:
+            queues = list(cls.tableSlots.values())
+        for slots in queues:
+            for k, n in slots.getStats().items():
+                stats[k] += n
+        return stats
+
     @classmethod
     def prepToRecordOps(cls):
         if Config.getConfig().record_ops:
@@ -2104,16 +2518,13 @@ class TaskAddData(StateTransitionTask):
         fullTableName = db.getName() + '.' + regTableName
         self._lockTableIfNeeded(fullTableName, 'batch')
 
-        sql = "INSERT INTO {} VALUES ".format(fullTableName)
-        for j in range(numRecords):  # number of records per table
-            nextInt = db.getNextInt()
-            nextTick = db.getNextTick()
-            nextColor = db.getNextColor()
-            sql += "('{}', {}, '{}');".format(nextTick, nextInt, nextColor)
+        builder = InsertBatchBuilder(numRecords)
+        builder.add(fullTableName, db.getNextTicks(numRecords), db.getNextInts(numRecords), db.getNextColors(numRecords))
 
         # Logging.info("Adding data in batch: {}".format(sql))
         try:
-            dbc.execute(sql)
+            for sql in builder.getStatements():
+                dbc.execute(sql)
         finally:
             # Logging.info("Data added in batch: {}".format(sql))
             self._unlockTableIfNeeded(fullTableName)
@@ -2211,35 +2622,112 @@ class TaskAddData(StateTransitionTask):
                 self.fAddLogDone.flush()
                 os.fsync(self.fAddLogDone.fileno())
 
+    def _addDataMultiTable(self, db: Database, dbc, regTableNames: List[str], te: TaskExecutor):
+        '''
+            Write numRecords rows to each table with multi-table INSERTs of
+            at most rows_per_request rows, then verify them table by table
+            with one range SELECT each
+        '''
+        numRecords = self.LARGE_NUMBER_OF_RECORDS if Config.getConfig().larger_data else self.SMALL_NUMBER_OF_RECORDS
+        fullTableNames = sorted([db.getName() + '.' + name for name in regTableNames]) # fixed order, no deadlock
+        builder = InsertBatchBuilder(Config.getConfig().rows_per_request)
+        written = {} # type: Dict[str, Dict[datetime.datetime, int]]
+        for fullTableName in fullTableNames:
+            ticks = db.getNextTicks(numRecords)
+            ints = db.getNextInts(numRecords)
+            builder.add(fullTableName, ticks, ints, db.getNextColors(numRecords))
+            written[fullTableName] = dict(zip(ticks, ints))
+
+        for fullTableName in fullTableNames:
+            self._lockTableIfNeeded(fullTableName, 'multi-table batch')
+        try:
+            for sql in builder.getStatements():
+                dbc.execute(sql)
+            if Config.getConfig().verify_data:
+                for fullTableName in fullTableNames:
+                    self._verifyReadBack(dbc, fullTableName, written[fullTableName])
+        finally:
+            for fullTableName in fullTableNames:
+                self._unlockTableIfNeeded(fullTableName)
+
+        for values in written.values():
+            for intWrote in values.values():
+                te.recordDataMark(intWrote)
+
+    def _verifyReadBack(self, dbc, fullTableName, written: Dict[datetime.datetime, int]):
+        try:
+            dbc.query("SELECT ts, speed FROM {} WHERE ts >= '{}' AND ts <= '{}'".format(
+                fullTableName, min(written), max(written)))
+        except taos.error.ProgrammingError as err:
+            if Helper.convertErrno(err.errno) in [0x218, 0x362]: # table doesn't exist
+                return
+            raise
+        readBack = {}
+        for ts, speed in dbc.getQueryResult():
+            if not isinstance(ts, datetime.datetime): # REST returns text
+                ts = datetime.datetime.fromisoformat(str(ts))
+            readBack[ts] = speed
+        for tick, intWrote in written.items():
+            if tick not in readBack:
+                raise taos.error.ProgrammingError(
+                    "Failed to read back same data for tick: {}, wrote: {}, read: EMPTY"
+                    .format(tick, intWrote), CrashGenError.INVALID_EMPTY_RESULT)
+            if readBack[tick] != intWrote:
+                raise taos.error.ProgrammingError(
+                    "Failed to read back same data, wrote: {}, read: {}"
+                    .format(intWrote, readBack[tick]), 0x999)
+
     def _executeInternal(self, te: TaskExecutor, wt: WorkerThread):
         # ds = self._dbManager # Quite DANGEROUS here, may result in multi-thread client access
         db = self._db
         dbc = wt.getDbConn()
         numTables  = self.LARGE_NUMBER_OF_TABLES  if Config.getConfig().larger_data else self.SMALL_NUMBER_OF_TABLES
         numRecords = self.LARGE_NUMBER_OF_RECORDS if Config.getConfig().larger_data else self.SMALL_NUMBER_OF_RECORDS
-        tblSeq = list(range(numTables ))
-        random.shuffle(tblSeq) # now we have random sequence
-        for i in tblSeq:
-            if (i in self.activeTable):  # wow already active
+        slots = self.getTableSlots(db.getName(), numTables)
+
+        if Config.getConfig().rows_per_request > 0 and not Config.getConfig().record_ops:
+            tblSeq = list(range(numTables))
+            random.shuffle(tblSeq) # now we have random sequence
+            sTable = db.getFixedSuperTable()
+            regTableNames = [self.getRegTableName(i) for i in tblSeq]
+            for regTableName in regTableNames:
+                sTable.ensureRegTable(self, dbc, regTableName) # Ensure the table exists
+            owned = [i + 1 for i in tblSeq if slots.tryAllocate(i + 1)]
+            if len(owned) < len(tblSeq):
+                Progress.emit(Progress.CONCURRENT_INSERTION)
+            try:
+                self._addDataMultiTable(db, dbc, regTableNames, te)
+            finally:
+                for slot in owned:
+                    slots.release(slot)
+            return
+        for n in range(numTables):
+            # the free table written least recently, any table when all are busy
+            slot = slots.pickAndAllocate()
+            owned = slot is not None
+            if owned:
+                i = slot - 1
+            else:  # wow all active
                 # print("x", end="", flush=True) # concurrent insertion
                 Progress.emit(Progress.CONCURRENT_INSERTION)
-            else:
-                self.activeTable.add(i)  # marking it active
+                i = Dice.throw(numTables)
             
-            dbName = db.getName()
-            sTable = db.getFixedSuperTable()
-            regTableName = self.getRegTableName(i)  # "db.reg_table_{}".format(i)            
-            fullTableName = dbName + '.' + regTableName
-            # self._lockTable(fullTableName) # "create table" below. Stop it if the table is "locked"
-            sTable.ensureRegTable(self, wt.getDbConn(), regTableName)  # Ensure the table exists           
-            # self._unlockTable(fullTableName)
+            try:
+                dbName = db.getName()
+                sTable = db.getFixedSuperTable()
+                regTableName = self.getRegTableName(i)  # "db.reg_table_{}".format(i)            
+                fullTableName = dbName + '.' + regTableName
+                # self._lockTable(fullTableName) # "create table" below. Stop it if the table is "locked"
+                sTable.ensureRegTable(self, wt.getDbConn(), regTableName)  # Ensure the table exists           
+                # self._unlockTable(fullTableName)
            
-            if Dice.throw(1) == 0: # 1 in 2 chance
-                self._addData(db, dbc, regTableName, te)
-            else:
-                self._addDataInBatch(db, dbc, regTableName, te)
-
-            self.activeTable.discard(i)  # not raising an error, unlike remove
+                if Dice.throw(1) == 0: # 1 in 2 chance
+                    self._addData(db, dbc, regTableName, te)
+                else:
+                    self._addDataInBatch(db, dbc, regTableName, te)
+            finally:
+                if owned:
+                    slots.release(slot)
 
 
 class ThreadStacks: # stack info for all threads
@@ -2262,7 +2750,7 @@ class ThreadStacks: # stack info for all threads
             if filterInternal:
                 if lastFrame.name in ['wait', 'invoke_excepthook', 
                     '_wait', # The Barrier exception
-                    'svcOutputReader', # the svcMgr thread
+                    'svcOutputReader', 'select', # the svcMgr thread, idle or waiting on its pipes
                     '__init__']: # the thread that extracted the stack
                     continue # ignore
             # Now print
@@ -2276,6 +2764,82 @@ class ThreadStacks: # stack info for all threads
                 stackFrame += 1
             print("-----> End of Thread Info ----->\n")
 
+class WorkerProcessPool:
+    '''
+        Runs the client in several processes, so SQL generation and checking
+        is not bound by a single GIL. Every process has its own
+        ThreadCoordinator, threads and databases: the databases are sharded
+        by number, so table locks and state machines stay process local. Only
+        the stop flag and step counter are shared, and each process sends its
+        ExecutionStats back for merging when it is done. max_steps applies to
+        each process, so the run takes up to numProcs * max_steps steps.
+    '''
+    def __init__(self, numProcs):
+        self._numProcs = numProcs
+        self._ctx = multiprocessing.get_context('fork') # children inherit Config and gContainer
+        self._stopFlag = self._ctx.Value('b', 0)
+        self._stepCounter = self._ctx.Value('l', 0)
+        self._resultQueue = self._ctx.Queue()
+        self._procs = [] # type: List[Any]
+        self._execStats = ExecutionStats()
+
+    def requestToStop(self):
+        self._stopFlag.value = 1
+        self._execStats.registerFailure("User Interruption")
+
+    def run(self):
+        cfg = Config.getConfig()
+        numThreads = max(1, -(-cfg.num_threads // self._numProcs)) # threads are spread over the processes
+        dbsPerProc = max(1, cfg.max_dbs)
+        Logging.info("Starting {} worker processes with {} threads each".format(self._numProcs, numThreads))
+
+        self._execStats.startExec()
+        for procNum in range(self._numProcs):
+            proc = self._ctx.Process(target=self._procMain, args=(procNum, numThreads, procNum * dbsPerProc))
+            proc.start()
+            self._procs.append(proc)
+
+        numResults = 0
+        while numResults < self._numProcs:
+            try:
+                procNum, stats = self._resultQueue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(proc.is_alive() for proc in self._procs) and self._resultQueue.empty():
+                    break # some process died without reporting back
+                continue
+            self._execStats.mergeStats(procNum, stats)
+            numResults += 1
+
+        for proc in self._procs:
+            proc.join()
+        if numResults < self._numProcs:
+            self._execStats.registerFailure("{} worker process(es) ended without stats".format(
+                self._numProcs - numResults))
+        self._execStats.setNumSteps(self._stepCounter.value)
+        self._execStats.endExec()
+
+    def _procMain(self, procNum, numThreads, dbNumBase):
+        # the parent handles signals and tells us to stop through the shared flag
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        random.seed("{}-{}".format(Dice.seedValue, procNum)) # its own sequence, reproducible from the Dice seed
+
+        cfg = Config.getConfig()
+        dbManager = DbManager(cfg.connector_type, gContainer.defTdeInstance.getDbTarget())
+        tc = ThreadCoordinator(ThreadPool(numThreads, cfg.max_steps), dbManager, dbNumBase)
+        tc.setSharedState(self._stopFlag, self._stepCounter)
+        tc.run()
+        dbManager.cleanUp()
+        self._resultQueue.put((procNum, tc.getExecStats().exportStats()))
+
+    def printStats(self):
+        self._execStats.printStats()
+
+    def isFailed(self):
+        return self._execStats.isFailed()
+
+
 class ClientManager:
     def __init__(self):
         Logging.info("Starting service manager")
@@ -2284,6 +2848,7 @@ class ClientManager:
 
         self._status = Status.STATUS_RUNNING
         self.tc = None
+        self._procPool = None # type: Optional[WorkerProcessPool]
 
         self.inSigHandler = False
 
@@ -2295,7 +2860,10 @@ class ClientManager:
         self._status = Status.STATUS_STOPPING  # immediately set our status
 
         print("ClientManager: Terminating program...")
-        self.tc.requestToStop()
+        if self._procPool:
+            self._procPool.requestToStop()
+        else:
+            self.tc.requestToStop()
 
     def _doMenu(self):
         choice = ""
@@ -2377,6 +2945,9 @@ class ClientManager:
         tInst = gContainer.defTdeInstance = TdeInstance() # "subdir to hold the instance"
 
         cfg = Config.getConfig()
+        if cfg.worker_processes > 0:
+            return self._runProcesses(svcMgr, tInst)
+
         dbManager = DbManager(cfg.connector_type, tInst.getDbTarget())  # Regular function
         thPool = ThreadPool(cfg.num_threads, cfg.max_steps)
         self.tc = ThreadCoordinator(thPool, dbManager)
@@ -2416,6 +2987,21 @@ class ClientManager:
 
         return ret
 
+    def _runProcesses(self, svcMgr, tInst):
+        self._procPool = WorkerProcessPool(Config.getConfig().worker_processes)
+        Logging.info("Starting client instance: {}".format(tInst))
+        self._procPool.run()
+        if svcMgr:
+            svcMgr.stopTaosServices()
+            svcMgr = None
+
+        Config.clearConfig()
+        self._procPool.printStats()
+        ret = 1 if self._procPool.isFailed() else 0
+        self._procPool = None
+        gc.collect()
+        return ret
+
     def conclude(self):
         # self.tc.getDbManager().cleanUp() # clean up first, so we can show ZERO db connections
         self.tc.printStats()
@@ -2506,6 +3092,13 @@ class MainExec:
             '--run-tdengine',
             action='store_true',
             help='Run TDengine service in foreground (default: false)')
+        parser.add_argument(
+            '-f',
+            '--worker-processes',
+            action='store',
+            default=0,
+            type=int,
+            help='Spread the threads over this many forked client processes, each with its own DBs and running up to --max-steps steps, 0 to run all threads in this process (default: 0)')
         parser.add_argument(
             '-g',
             '--ignore-errors',
@@ -2520,6 +3113,11 @@ class MainExec:
             default=1,
             type=int,
             help='Number (fixed) of replicas to use, when testing against clusters. (default: 1)')
+        parser.add_argument(
+            '-j',
+            '--pipelined',
+            action='store_true',
+            help='Let worker threads pull tasks continuously, transitioning each database on its own instead of stepping all threads together (default: false)')
         parser.add_argument(
             '-k',
             '--track-memory-leaks',
@@ -2563,7 +3161,7 @@ class MainExec:
             action='store',
             default=1000,
             type=int,
-            help='Maximum number of steps to run (default: 100)')
+            help='Maximum number of steps to run, per process with --worker-processes (default: 100)')
         parser.add_argument(
             '-t',
             '--num-threads',
@@ -2571,6 +3169,13 @@ class MainExec:
             default=5,
             type=int,
             help='Number of threads to run (default: 10)')
+        parser.add_argument(
+            '-u',
+            '--rows-per-request',
+            action='store',
+            default=0,
+            type=int,
+            help='Write data of all tables with multi-table INSERTs of at most this many rows, 0 to write table by table (default: 0)')
         parser.add_argument(
             '-v',
             '--verify-data',
@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import os
 import io
+import re
 import sys
+import collections
+import selectors
 from enum import Enum
 import threading
 import signal
 import logging
 import time
 from subprocess import PIPE, Popen, TimeoutExpired
-from typing import BinaryIO, Generator, IO, List, NewType, Optional
+from typing import BinaryIO, Callable, Dict, Generator, IO, List, NewType, Optional, Pattern, Tuple
 import typing
 
 try:
@@ -17,7 +20,6 @@ try:
 except:
     print("Psutil module needed, please install: sudo pip3 install psutil")
     sys.exit(-1)
-from queue import Queue, Empty
 
 from .shared.config import Config
 from .shared.db import DbTarget, DbConn
@@ -713,6 +715,8 @@ class ServiceManagerThread:
     It takes a TdeInstance parameter at creation time, or create a default    
     """
     MAX_QUEUE_SIZE = 10000
+    READ_SIZE = 65536 # bytes read from a pipe at a time
+    PROGRESS_INTERVAL = 0.1 # seconds between progress bar updates
 
     def __init__(self, subProc: TdeSubProcess, logDir: str):
         # Set the sub process
@@ -726,6 +730,13 @@ class ServiceManagerThread:
         # self._thread2 = None # type: Optional[threading.Thread] Thread  # watching stderr
         self._status = Status(Status.STATUS_STOPPED) # The status of the underlying service, actually.
 
+        self._ipcRing = collections.deque(maxlen=self.MAX_QUEUE_SIZE) # oldest lines drop off when full
+        self._subscriptions = {} # type: Dict[int, Tuple[Pattern, Callable[[str], None]]]
+        self._subLock = threading.Lock()
+        self._lastSubId = 0
+        self._lastProgressTime = 0.0
+        self.subscribe(re.escape(self.TD_READY_MSG), self._onReadyLine)
+
         self._start(subProc, logDir)
 
     def __repr__(self):
@@ -762,12 +773,12 @@ class ServiceManagerThread:
         self._status.set(Status.STATUS_STARTING)
         # self._tdeSubProcess = TdeSubProcess.start(cmdLine) # TODO: verify process is running
 
-        self._ipcQueue = Queue() # type: Queue
-        self._thread = threading.Thread( # First thread captures server OUTPUT
+        self._thread = threading.Thread( # One thread captures both server OUTPUT and ERRORs
             target=self.svcOutputReader,
-            args=(subProc.getIpcStdOut(), self._ipcQueue, logDir))
+            args=(subProc.getIpcStdOut(), subProc.getIpcStdErr(), logDir))
         self._thread.daemon = True  # thread dies with the program
         self._thread.start()
+        self._thread2 = None # STDERR used to have its own thread
         time.sleep(0.01)
         if not self._thread.is_alive(): # What happened?
             Logging.info("Failed to start process to monitor STDOUT")
@@ -775,16 +786,6 @@ class ServiceManagerThread:
             raise CrashGenError("Failed to start thread to monitor STDOUT")
         Logging.info("Successfully started process to monitor STDOUT")
 
-        self._thread2 = threading.Thread( # 2nd thread captures server ERRORs
-            target=self.svcErrorReader,
-            args=(subProc.getIpcStdErr(), self._ipcQueue, logDir))
-        self._thread2.daemon = True  # thread dies with the program
-        self._thread2.start()
-        time.sleep(0.01)
-        if not self._thread2.is_alive():
-            self.stop()
-            raise CrashGenError("Failed to start thread to monitor STDERR")
-
         # wait for service to start
         for i in range(0, 100):
             time.sleep(1.0)
@@ -861,16 +862,15 @@ class ServiceManagerThread:
     def _trimQueue(self, targetSize):
         if targetSize <= 0:
             return  # do nothing
-        q = self._ipcQueue
-        if (q.qsize() <= targetSize):  # no need to trim
+        ring = self._ipcRing
+        if (len(ring) <= targetSize):  # no need to trim
             return
 
         Logging.debug("Triming IPC queue to target size: {}".format(targetSize))
-        itemsToTrim = q.qsize() - targetSize
-        for i in range(0, itemsToTrim):
+        for i in range(len(ring) - targetSize):
             try:
-                q.get_nowait()
-            except Empty:
+                ring.popleft()
+            except IndexError:
                 break  # break out of for loop, no more trimming
 
     TD_READY_MSG = "TDengine is initialized successfully"
@@ -884,29 +884,63 @@ class ServiceManagerThread:
         # Process all the output generated by the underlying sub process,
         # managed by IO thread
         print("<", end="", flush=True)
+        numLines = 0
         while True:
             try:
-                line = self._ipcQueue.get_nowait()  # getting output at fast speed
-                self._printProgress("_o")
-            except Empty:
-                # time.sleep(2.3) # wait only if there's no output
-                # no more output
-                print(".>", end="", flush=True)
-                return  # we are done with THIS BATCH
-            else:  # got line, printing out
-                if forceOutput:
-                    Logging.info('[TAOSD] ' + line)
-                else:
-                    Logging.debug('[TAOSD] ' + line)
-        print(">", end="", flush=True)
+                line = self._ipcRing.popleft()  # getting output at fast speed
+            except IndexError:
+                break # no more output, we are done with THIS BATCH
+            numLines += 1
+            if forceOutput:
+                Logging.info('[TAOSD] ' + line)
+            else:
+                Logging.debug('[TAOSD] ' + line)
+        if numLines > 0:
+            self._printProgress("_o")
+        print(".>", end="", flush=True)
 
     _ProgressBars = ["--", "//", "||", "\\\\"]
 
     def _printProgress(self, msg):  # TODO: assuming 2 chars
-        print(msg, end="", flush=True)
+        now = time.time()
+        if now - self._lastProgressTime < self.PROGRESS_INTERVAL: # rate limited
+            return
+        self._lastProgressTime = now
         pBar = self._ProgressBars[Dice.throw(4)]
-        print(pBar, end="", flush=True)
-        print('\b\b\b\b', end="", flush=True)
+        print(msg + pBar + '\b\b\b\b', end="", flush=True)
+
+    def subscribe(self, pattern: str, callback: Callable[[str], None]) -> int:
+        '''
+        Have callback(line) called, in the reader thread, for every line of server
+        output (STDOUT or STDERR) that matches the regular expression.
+
+        :return: the subscription id, to be passed to unsubscribe()
+        '''
+        with self._subLock:
+            self._lastSubId += 1
+            self._subscriptions[self._lastSubId] = (re.compile(pattern), callback)
+            return self._lastSubId
+
+    def unsubscribe(self, subId: int):
+        with self._subLock:
+            self._subscriptions.pop(subId, None)
+
+    def _notifySubscribers(self, tChunk: str):
+        with self._subLock:
+            subscriptions = list(self._subscriptions.values())
+        for pattern, callback in subscriptions:
+            if pattern.search(tChunk) is None: # one scan of the whole chunk, usually all we need
+                continue
+            for line in tChunk.splitlines():
+                if pattern.search(line) is not None:
+                    callback(line)
+
+    def _onReadyLine(self, line: str):
+        if self._status.isStarting():  # we are starting, let's see if we have started
+            Logging.info("Waiting for the service to become FULLY READY")
+            time.sleep(1.0) # wait for the server to truly start. TODO: remove this
+            Logging.info("Service is now FULLY READY") # TODO: more ID info here?
+            self._status.set(Status.STATUS_RUNNING)
 
     BinaryChunk = NewType('BinaryChunk', bytes) # line with binary data, directly from STDOUT, etc.
     TextChunk   = NewType('TextChunk', str) # properly decoded, suitable for printing, etc.
@@ -920,71 +954,68 @@ class ServiceManagerThread:
             print("\nNon-UTF8 server output: {}\n".format(bChunk.decode('cp437')))
             return None
 
-    def _textChunkGenerator(self, streamIn: IpcStream, logDir: str, logFile: str
-            ) -> Generator[TextChunk, None, None]:
+    def _decodeLines(self, bChunk: bytes) -> List[str]:
         '''
-        Take an input stream with binary data (likely from Popen), produced a generator of decoded
-        "text chunks".
-        
-        Side effect: it also save the original binary data in a log file.
+        Decode a chunk of complete lines in one go, only falling back to line by
+        line decoding (dropping the bad ones) if the chunk is not valid UTF-8
         '''
-        os.makedirs(logDir, exist_ok=True)
-        logF = open(os.path.join(logDir, logFile), 'wb')
-        if logF is None:
-            Logging.error("Failed to open log file (binary write): {}/{}".format(logDir, logFile))
-            return
-        for bChunk in iter(streamIn.readline, b''):
-            logF.write(bChunk) # Write to log file immediately
-            tChunk = self._decodeBinaryChunk(bChunk) # decode
-            if tChunk is not None:
-                yield tChunk # TODO: split into actual text lines
-
-        # At the end...
-        streamIn.close() # Close the incoming stream
-        logF.close() # Close the log file
-
-    def svcOutputReader(self, ipcStdOut: IpcStream, queue, logDir: str):
+        try:
+            return bChunk.decode("utf-8").splitlines()
+        except UnicodeError:
+            lines = [self._decodeBinaryChunk(bLine) for bLine in bChunk.splitlines()]
+            return [line for line in lines if line is not None]
+
+    def _processChunk(self, bChunk: bytes, isStdErr: bool):
+        lines = self._decodeLines(bChunk)
+        self._ipcRing.extend(lines) # a full ring drops its oldest lines
+        if isStdErr:
+            for line in lines:
+                Logging.info("TDengine STDERR: {}".format(line))
+        self._notifySubscribers("\n".join(lines))
+        self._printProgress("_i")
+
+        if self._status.isStopping():  # TODO: use thread status instead
+            # WAITING for stopping sub process to finish its outptu
+            print("_w", end="", flush=True)
+
+    def svcOutputReader(self, ipcStdOut: IpcStream, ipcStdErr: IpcStream, logDir: str):
         '''
-        The infinite routine that processes the STDOUT stream for the sub process being managed.
+        The routine that processes both the STDOUT and STDERR streams of the sub process
+        being managed, until both reach EOF. It waits on the pipes with a selector, reads
+        whatever is there in large chunks and hands over the complete lines a chunk at a time.
 
-        :param ipcStdOut: the IO stream object used to fetch the data from
-        :param queue: the queue where we dump the roughly parsed chunk-by-chunk text data
-        :param logDir: where we should dump a verbatim output file
+        :param ipcStdOut: the IO stream object used to fetch STDOUT data from
+        :param ipcStdErr: the IO stream object used to fetch STDERR data from
+        :param logDir: where we should dump verbatim stdout.log/stderr.log files
         '''
-        
-        # Important Reference: https://stackoverflow.com/questions/375427/non-blocking-read-on-a-subprocess-pipe-in-python
-        # print("This is the svcOutput Reader...")
-        # stdOut.readline() # Skip the first output? TODO: remove?
-        for tChunk in self._textChunkGenerator(ipcStdOut, logDir, 'stdout.log') :
-            queue.put(tChunk) # tChunk garanteed not to be None
-            self._printProgress("_i")
-
-            if self._status.isStarting():  # we are starting, let's see if we have started
-                if tChunk.find(self.TD_READY_MSG) != -1:  # found
-                    Logging.info("Waiting for the service to become FULLY READY")
-                    time.sleep(1.0) # wait for the server to truly start. TODO: remove this
-                    Logging.info("Service is now FULLY READY") # TODO: more ID info here?
-                    self._status.set(Status.STATUS_RUNNING)
-
-            # Trim the queue if necessary: TODO: try this 1 out of 10 times
-            self._trimQueue(self.MAX_QUEUE_SIZE * 9 // 10)  # trim to 90% size
-
-            if self._status.isStopping():  # TODO: use thread status instead
-                # WAITING for stopping sub process to finish its outptu
-                print("_w", end="", flush=True)
-
-            # queue.put(line)
-        # stdOut has no more data, meaning sub process must have died
-        Logging.info("EOF found TDengine STDOUT, marking the process as terminated")
+        os.makedirs(logDir, exist_ok=True)
+        sel = selectors.DefaultSelector()
+        for streamIn, logFile, isStdErr in [(ipcStdOut, 'stdout.log', False), (ipcStdErr, 'stderr.log', True)]:
+            logF = open(os.path.join(logDir, logFile), 'wb')
+            # data: stream, log file, STDERR or not, trailing bytes of an incomplete line
+            sel.register(streamIn.fileno(), selectors.EVENT_READ, [streamIn, logF, isStdErr, b''])
+        try:
+            while sel.get_map():
+                for key, events in sel.select():
+                    streamIn, logF, isStdErr, partial = key.data
+                    bChunk = os.read(key.fd, self.READ_SIZE)
+                    if not bChunk: # EOF
+                        sel.unregister(key.fd)
+                        if partial:
+                            self._processChunk(partial, isStdErr)
+                        streamIn.close() # Close the incoming stream
+                        logF.close() # Close the log file
+                        continue
+                    logF.write(bChunk) # Write to log file immediately
+                    lastEol = bChunk.rfind(b'\n')
+                    if lastEol == -1: # no complete line yet
+                        key.data[3] = partial + bChunk
+                        continue
+                    key.data[3] = bChunk[lastEol + 1:]
+                    self._processChunk(partial + bChunk[:lastEol + 1], isStdErr)
+        finally:
+            sel.close()
+
+        # pipes have no more data, meaning sub process must have died
+        Logging.info("EOF found TDengine STDOUT/STDERR, marking the process as terminated")
         self.setStatus(Status.STATUS_STOPPED)
-
-    def svcErrorReader(self, ipcStdErr: IpcStream, queue, logDir: str):
-        # os.makedirs(logDir, exist_ok=True)
-        # logFile = os.path.join(logDir,'stderr.log')
-        # fErr = open(logFile, 'wb')
-        # for line in iter(err.readline, b''):
-        for tChunk in self._textChunkGenerator(ipcStdErr, logDir, 'stderr.log') :
-            queue.put(tChunk) # tChunk garanteed not to be None
-            # fErr.write(line)
-            Logging.info("TDengine STDERR: {}".format(tChunk))
-        Logging.info("EOF for TDengine STDERR")
@@ -14,6 +14,7 @@ from util.sql import *
 from util.cases import *
 from util.dnodes import *
 from util.log import *
+from util.rest import TDRestClient
 
 import traceback
 # from .service_manager import TdeInstance
@@ -149,6 +150,10 @@ class DbConnRest(DbConn):
         restPort = dbTarget.port + 11
         self._url = "http://{}:{}/rest/sql".format(
             dbTarget.hostAddr, dbTarget.port + self.REST_PORT_INCREMENT)
+        # keep-alive session reused by every statement of this connection
+        self._client = TDRestClient(
+            dbTarget.hostAddr, dbTarget.port + self.REST_PORT_INCREMENT,
+            'root', 'taosdata', poolSize=1)
         self._result = None
 
     def openByType(self):  # Open connection        
@@ -157,16 +162,14 @@ class DbConnRest(DbConn):
     def close(self):
         if (not self.isOpen):
             raise RuntimeError("Cannot clean up database until connection is open")
-        # Do nothing for REST
+        self._client.close()
         Logging.debug("[DB] REST Database connection closed")
         self.isOpen = False
 
     def _doSql(self, sql):
         self._lastSql = sql # remember this, last SQL attempted
         try:
-            r = requests.post(self._url, 
-                data = sql,
-                auth = HTTPBasicAuth('root', 'taosdata'))         
+            r = self._client.post(self._url, sql)
         except:
             print("REST API Failure (TODO: more info here)")
             raise
@@ -126,6 +126,7 @@ class Status:
 # Deterministic random number generator
 class Dice():
     seeded = False  # static, uninitialized
+    seedValue = None
 
     @classmethod
     def seed(cls, s):  # static
@@ -134,6 +135,7 @@ class Dice():
                 "Cannot seed the random generator more than once")
         cls.verifyRNG()
         random.seed(s)
+        cls.seedValue = s
         cls.seeded = True  # TODO: protect against multi-threading
 
     @classmethod
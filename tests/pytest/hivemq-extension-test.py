@@ -19,37 +19,7 @@ import glob
 import getopt
 import subprocess
 from shutil import which
-from multipledispatch import dispatch
-
-
-@dispatch(str, str)
-def v_print(msg: str, arg: str):
-    if verbose:
-        print(msg % arg)
-
-
-@dispatch(str, int)
-def v_print(msg: str, arg: int):
-    if verbose:
-        print(msg % int(arg))
-
-
-@dispatch(str, int, int)
-def v_print(msg: str, arg1: int, arg2: int):
-    if verbose:
-        print(msg % (int(arg1), int(arg2)))
-
-
-@dispatch(str, int, int, int)
-def v_print(msg: str, arg1: int, arg2: int, arg3: int):
-    if verbose:
-        print(msg % (int(arg1), int(arg2), int(arg3)))
-
-
-@dispatch(str, int, int, int, int)
-def v_print(msg: str, arg1: int, arg2: int, arg3: int, arg4: int):
-    if verbose:
-        print(msg % (int(arg1), int(arg2), int(arg3), int(arg4)))
+from util.verbose import tdVerbose as v_print
 
 
 def isHiveMQInstalled():
@@ -219,7 +189,7 @@ def checkTDengineData(topic: str, payload: str):
 
 
 if __name__ == "__main__":
-    verbose = True
+    v_print.setLevel(v_print.VERBOSE)
     testTopic = 'test'
     testPayload = 'hello world'
 
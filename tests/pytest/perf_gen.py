@@ -12,6 +12,9 @@ import argparse
 import textwrap
 import subprocess
 import sys
+import os
+import threading
+import multiprocessing
 
 import taos
 
@@ -22,6 +25,7 @@ from crash_gen.shared.config import Config
 from crash_gen.shared.db import DbConn
 from crash_gen.shared.misc import Dice, Logging, Helper
 from crash_gen.shared.types import TdDataType
+from util.rest import TDRestClient
 
 
 # NUM_PROCESSES   = 10
@@ -42,9 +46,9 @@ BATCH_SIZE = 2000 # Number of data points per request
 # DevOrg_RW:
 # INFLUX_TOKEN='o1P8sEhBmXKhxBmNuiCyOUKv8d7qm5wUjMff9AbskBu2LcmNPQzU77NrAn5hDil8hZ0-y1AGWpzpL-4wqjFdkA=='
 # DevOrg_All_Access
-INFLUX_TOKEN='T2QTr4sloJhINH_oSrwSS-WIIZYjDfD123NK4ou3b7ajRs0c0IphCh3bNc0OsDZQRW1HyCby7opdEndVYFGTWQ=='
-INFLUX_ORG="DevOrg"
-INFLUX_BUCKET="Bucket01"
+INFLUX_TOKEN=os.environ.get('INFLUX_TOKEN', 'T2QTr4sloJhINH_oSrwSS-WIIZYjDfD123NK4ou3b7ajRs0c0IphCh3bNc0OsDZQRW1HyCby7opdEndVYFGTWQ==')
+INFLUX_ORG=os.environ.get('INFLUX_ORG', "DevOrg")
+INFLUX_BUCKET=os.environ.get('INFLUX_BUCKET', "Bucket01")
 
 def writeTaosBatch(dbc, tblName):
     # Database.setupLastTick()
@@ -61,6 +65,336 @@ def writeTaosBatch(dbc, tblName):
 class PerfGenError(taos.error.ProgrammingError):
     pass
 
+class PerfBackend():
+    '''
+    What a benchmark writes to. One object per connection: connect() is
+    called in the thread that uses it, then writeBatch()/query(), then
+    close(). prepare() and teardown() run once around the whole load, on an
+    object of their own.
+    '''
+    SCHEMA_SQLS = [
+        "CREATE DATABASE IF NOT EXISTS {}".format(DB_NAME),
+        "DROP STABLE IF EXISTS {}.{}_s".format(DB_NAME, TIME_SERIES_NAME),
+        "CREATE STABLE {}.{}_s (ts TIMESTAMP, temperature INT, pressure INT, notes BINARY(200)) "
+            "TAGS (rack INT, shelf INT, barcode BINARY(16))".format(DB_NAME, TIME_SERIES_NAME),
+    ]
+
+    def __init__(self, dbTarget):
+        self._dbTarget = dbTarget
+
+    def prepare(self):
+        '''
+        Create the database and super table every workload writes to
+        '''
+        self.connect()
+        try:
+            for sql in self.SCHEMA_SQLS:
+                self.writeBatch(sql)
+        finally:
+            self.close()
+
+    @abstractmethod
+    def connect(self):
+        pass
+
+    @abstractmethod
+    def writeBatch(self, sql):
+        '''
+        Send one write request, raising taos.error.ProgrammingError on failure
+        '''
+        pass
+
+    @abstractmethod
+    def query(self, sql):
+        '''
+        Run a query, returning the number of rows
+        '''
+        pass
+
+    def close(self):
+        pass
+
+    def teardown(self):
+        pass
+
+_backends = {} # name -> PerfBackend sub class
+
+def registerBackend(name):
+    def register(cls):
+        _backends[name] = cls
+        return cls
+    return register
+
+def createBackend(name, dbTarget) -> PerfBackend:
+    if name not in _backends:
+        raise PerfGenError("No such backend: {}, choose from: {}".format(name, ', '.join(sorted(_backends))))
+    return _backends[name](dbTarget)
+
+@registerBackend('native')
+class NativeBackend(PerfBackend):
+    def connect(self):
+        self._conn = taos.connect(host=self._dbTarget.hostAddr, config=self._dbTarget.cfgPath)
+        self._cursor = self._conn.cursor()
+
+    def writeBatch(self, sql):
+        self._cursor.execute(sql)
+
+    def query(self, sql):
+        self._cursor.execute(sql)
+        return len(self._cursor.fetchall())
+
+    def close(self):
+        self._cursor.close()
+        self._conn.close()
+
+@registerBackend('rest')
+class RestBackend(PerfBackend):
+    REST_PORT_INCREMENT = 11
+
+    def connect(self):
+        self._client = TDRestClient(self._dbTarget.hostAddr, self._dbTarget.port + self.REST_PORT_INCREMENT,
+            'root', 'taosdata', poolSize=1)
+
+    def _doSql(self, sql):
+        rj = self._client.sql(sql)
+        if rj.get('status') != 'succ':
+            raise PerfGenError(rj.get('desc', 'REST request failed'), rj.get('code', -1))
+        return rj
+
+    def writeBatch(self, sql):
+        self._doSql(sql)
+
+    def query(self, sql):
+        return len(self._doSql(sql).get('data', []))
+
+    def close(self):
+        self._client.close()
+
+@registerBackend('mock')
+class MockBackend(PerfBackend):
+    '''
+    An in-process sink that accepts everything: a load against it measures
+    what the benchmark itself costs on the client side
+    '''
+    def connect(self):
+        self.numRequests = 0
+        self.numBytes = 0
+
+    def writeBatch(self, sql):
+        self.numRequests += 1
+        self.numBytes += len(sql)
+
+    def query(self, sql):
+        self.numRequests += 1
+        return 0
+
+class LatencyHistogram():
+    '''
+    HDR style latency histogram, in microseconds: each power of two is split
+    into SUB_BUCKETS linear buckets, so any value is kept to within ~3%,
+    recording is O(1) and histograms of several threads or processes merge
+    by adding up their counts.
+    '''
+    SUB_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BITS
+    NUM_BUCKETS = 40 * SUB_BUCKETS # values up to 2^40 us
+
+    def __init__(self):
+        self.counts = [0] * self.NUM_BUCKETS
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @classmethod
+    def _index(cls, us):
+        if us < cls.SUB_BUCKETS:
+            return us
+        shift = us.bit_length() - cls.SUB_BITS - 1
+        return min((shift + 1) * cls.SUB_BUCKETS + (us >> shift) - cls.SUB_BUCKETS, cls.NUM_BUCKETS - 1)
+
+    @classmethod
+    def _upperBound(cls, index):
+        if index < cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        sub = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds):
+        us = int(seconds * 1000000)
+        self.counts[self._index(us)] += 1
+        self.total += 1
+        self.sum += us
+        if us > self.max:
+            self.max = us
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        ''' The value (us) at or below which p percent of the requests are '''
+        if self.total == 0:
+            return 0
+        target = max(1, int(self.total * p / 100 + 0.5))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self._upperBound(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def toText(self):
+        return "mean {:.3f}, p50 {:.3f}, p90 {:.3f}, p99 {:.3f}, p99.9 {:.3f}, max {:.3f}".format(
+            self.mean() / 1000, *[self.percentile(p) / 1000 for p in (50, 90, 99, 99.9)], self.max / 1000)
+
+class WriteLoadResult():
+    def __init__(self):
+        self.rows = 0
+        self.requests = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.hist = LatencyHistogram()
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.requests += other.requests
+        self.errors += other.errors
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.hist.merge(other.hist)
+
+def _runWriteLoadProcess(engine, procNum, resultQueue):
+    Logging.clsInit(False) # we are a freshly spawned process
+    resultQueue.put(engine.runProcess(procNum))
+
+class WriteLoadEngine():
+    '''
+    Write load of N processes x M connections. Every connection owns a range
+    of tables and sends multi-table INSERTs put together from pre-generated
+    table prefixes and value fragments, optionally throttled to a target
+    rate, timing each request into a latency histogram.
+    '''
+    def __init__(self, backendName, dbTarget, stName, numRows, numProcs = 1, numConns = 1, numTables = 1000,
+            rowsPerRequest = BATCH_SIZE, tablesPerRequest = 10, targetRate = 0):
+        self._backendName = backendName
+        self._dbTarget = dbTarget
+        self._stName = stName
+        self._numRows = numRows
+        self._numProcs = max(1, numProcs)
+        self._numConns = max(1, numConns)
+        self._numTables = max(numTables, self._numProcs * self._numConns) # each connection needs a table
+        self._rowsPerRequest = rowsPerRequest
+        self._tablesPerRequest = max(1, tablesPerRequest)
+        self._targetRate = targetRate # rows per second for the whole load, 0 for unlimited
+
+    def _split(self, total, parts, i):
+        ''' The range of the i-th of parts (nearly) equal shares of range(total) '''
+        return range(total * i // parts, total * (i + 1) // parts)
+
+    def createBackend(self) -> PerfBackend:
+        return createBackend(self._backendName, self._dbTarget)
+
+    def run(self, inProcess = False):
+        # elapsed is the longest connection's own time, so spawning and
+        # importing the worker processes is not counted against the rate
+        result = WriteLoadResult()
+        if inProcess and self._numProcs == 1:
+            result.merge(self.runProcess(0))
+        else:
+            ctx = multiprocessing.get_context('spawn') # no forking of a live taos client
+            resultQueue = ctx.Queue()
+            procs = [ctx.Process(target=_runWriteLoadProcess, args=(self, i, resultQueue))
+                for i in range(self._numProcs)]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                result.merge(resultQueue.get())
+            for proc in procs:
+                proc.join()
+        self.report(result)
+        return result
+
+    def runProcess(self, procNum):
+        tables = self._split(self._numTables, self._numProcs, procNum)
+        rows = self._split(self._numRows, self._numProcs, procNum)
+        results = [WriteLoadResult() for i in range(self._numConns)]
+        threads = []
+        for i in range(self._numConns):
+            connTables = [tables[j] for j in self._split(len(tables), self._numConns, i)]
+            numRows = len(self._split(len(rows), self._numConns, i))
+            threads.append(threading.Thread(target=self._runConnection, args=(connTables, numRows, results[i])))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result = WriteLoadResult()
+        for r in results:
+            result.merge(r)
+        return result
+
+    def _runConnection(self, tables, numRows, result: WriteLoadResult):
+        backend = self.createBackend()
+        backend.connect()
+        # everything but the timestamps is formatted once, up front
+        prefixes = ["{}.reg_{}_{} USING {}.{} TAGS({},{},'barcode_{}') VALUES ".format(
+            DB_NAME, t // MAX_SHELF, t % MAX_SHELF, DB_NAME, self._stName,
+            t // MAX_SHELF, t % MAX_SHELF, t // MAX_SHELF + t % MAX_SHELF) for t in tables]
+        fragments = [",{},{},'xxx')".format(20 + k, 70 + k) for k in range(10)]
+        # every table gets its own millisecond sequence, ending before now
+        nextTicks = [int(time.time() * 1000) - numRows - 1000] * len(tables)
+        tablesPerRequest = min(self._tablesPerRequest, len(tables))
+        rowsPerTable = max(1, self._rowsPerRequest // tablesPerRequest)
+        connRate = self._targetRate / (self._numProcs * self._numConns)
+
+        startTime = time.perf_counter()
+        nextTable = 0
+        while result.rows < numRows:
+            parts = []
+            numReqRows = 0
+            for i in range(tablesPerRequest):
+                n = min(rowsPerTable, numRows - result.rows - numReqRows)
+                if n <= 0:
+                    break
+                idx = nextTable
+                nextTable = (nextTable + 1) % len(tables)
+                tick = nextTicks[idx]
+                nextTicks[idx] += n
+                parts.append(prefixes[idx] + "".join(["(" + str(ts) + fragments[ts % 10] for ts in range(tick, tick + n)]))
+                numReqRows += n
+            sql = "INSERT INTO " + " ".join(parts)
+
+            if connRate > 0: # throttle: do not get ahead of the rate
+                delay = startTime + result.rows / connRate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            reqStart = time.perf_counter()
+            try:
+                backend.writeBatch(sql)
+            except taos.error.ProgrammingError as err:
+                result.errors += 1
+                Logging.warning("Write failed: 0x{:X}, {}".format(Helper.convertErrno(err.errno), err.msg))
+            result.hist.record(time.perf_counter() - reqStart)
+            result.requests += 1
+            result.rows += numReqRows
+        result.elapsed = time.perf_counter() - startTime
+        backend.close()
+
+    def report(self, result: WriteLoadResult):
+        Logging.info("Write load on {} backend: {} processes x {} connections, {} tables, {} rows/request over {} tables, target rate: {}".format(
+            self._backendName, self._numProcs, self._numConns, self._numTables, self._rowsPerRequest, self._tablesPerRequest,
+            "{} rows/s".format(self._targetRate) if self._targetRate else "unlimited"))
+        elapsed = result.elapsed or 1e-9
+        Logging.info("  {} rows in {:.3f} seconds: {:.1f} rows/s, {} requests: {:.1f} requests/s, {} errors".format(
+            result.rows, result.elapsed, result.rows / elapsed,
+            result.requests, result.requests / elapsed, result.errors))
+        Logging.info("  request latency (ms): {}".format(result.hist.toText()))
+
 class Benchmark():
 
     # @classmethod
@@ -163,13 +497,15 @@ class TaosBenchmark(Benchmark):
         super().__init__('taos', loopCount)
         # self._dbType = 'taos'
         tInst = TdeInstance()
-        self._dbc = DbConn.createNative(tInst.getDbTarget())
-        self._dbc.open()
+        self._dbTarget = tInst.getDbTarget()
+        self._backend = createBackend(Config.getConfig().backend, self._dbTarget)
         self._sTable = TdSuperTable(TIME_SERIES_NAME + '_s', DB_NAME)    
 
     def doIterate(self):    
         tblName = Config.getConfig().target_table_name
         print("Benchmarking TAOS database (1 pass) for: {}".format(tblName))
+        self._dbc = DbConn.createNative(self._dbTarget)
+        self._dbc.open()
         self._dbc.execute("USE {}".format(DB_NAME))
 
         self._sTable.ensureRegTable(None, self._dbc, tblName)
@@ -182,63 +518,21 @@ class TaosBenchmark(Benchmark):
             Logging.error("Failed to write batch")
 
     def prepare(self):        
-        self._dbc.execute("CREATE DATABASE IF NOT EXISTS {}".format(DB_NAME))
-        self._dbc.execute("USE {}".format(DB_NAME))
-        # Create the super table
-        self._sTable.drop(self._dbc, True)
-        self._sTable.create(self._dbc,
-                            {'ts': TdDataType.TIMESTAMP, 
-                             'temperature': TdDataType.INT,
-                             'pressure': TdDataType.INT,
-                             'notes': TdDataType.BINARY200
-                            },
-                            {'rack': TdDataType.INT, 
-                             'shelf': TdDataType.INT, 
-                             'barcode': TdDataType.BINARY16
-                            })
-
-    def execSql(self, sql):
-        try:
-            self._dbc.execute(sql)
-        except taos.error.ProgrammingError as err:
-            Logging.warning("SQL Error: 0x{:X}, {}, SQL: {}".format(
-                Helper.convertErrno(err.errno), err.msg, sql))
-            raise
+        # the database and the super table, through whichever backend we benchmark
+        self._backend.prepare()
 
     def executeWrite(self):
         # Sample: INSERT INTO t1 USING st TAGS(1) VALUES(now, 1) t2 USING st TAGS(2) VALUES(now, 2)
-        sqlPrefix  = "INSERT INTO "
-        dataTemplate = "{} USING {} TAGS({},{},'barcode_{}') VALUES('{}',{},{},'{}') "
-
-        stName = self._sTable.getName()            
-        BATCH_SIZE = 2000 # number of items per request batch
-        ITEMS_PER_SHELF = 5
-
-        # rackSize = 10 # shelves per rack
-        # shelfSize = 100  # items per shelf
-        batchCount = self._loopCount // BATCH_SIZE
-        lastRack = 0
-        for i in range(batchCount):
-            sql = sqlPrefix
-            for j in range(BATCH_SIZE):
-                n = i*BATCH_SIZE + j # serial number
-                # values first
-                # rtName = 'rt_' + str(n) # table name contains serial number, has info
-                temperature = 20 + (n % 10)
-                pressure = 70 + (n % 10)
-                # tags
-                shelf = (n // ITEMS_PER_SHELF) % MAX_SHELF # shelf number
-                rack  = n // (ITEMS_PER_SHELF * MAX_SHELF) # rack number
-                barcode = rack + shelf
-                # table name
-                tableName = "reg_" + str(rack) + '_' + str(shelf)
-                # now the SQL
-                sql += dataTemplate.format(tableName, stName,# table name
-                    rack, shelf, barcode,  # tags
-                    Database.getNextTick(), temperature, pressure, 'xxx') # values
-                lastRack = rack
-            self.execSql(sql)
-        Logging.info("Last Rack: {}".format(lastRack))
+        cfg = Config.getConfig()
+        engine = WriteLoadEngine(cfg.backend, self._dbTarget, self._sTable.getName(), self._loopCount,
+            numProcs = cfg.subprocess_count,
+            numConns = cfg.connections,
+            numTables = cfg.table_count,
+            rowsPerRequest = cfg.rows_per_request,
+            tablesPerRequest = cfg.tables_per_request,
+            targetRate = cfg.target_rate)
+        engine.run(inProcess = cfg.iterate_directly)
+        self._backend.teardown()
 
 class TaosWriteBenchmark(TaosBenchmark):
     def execute(self):
@@ -260,7 +554,47 @@ class Taos5mWriteBenchmark(TaosWriteBenchmark):
     def __init__(self):
         super().__init__(5*1000*1000)
 
-class Taos1kQueryBenchmark(TaosBenchmark):
+class TaosQueryBenchmark(TaosBenchmark):
+    QUERY_SQLS = [
+        "SELECT COUNT(*) FROM {}.{}",
+        "SELECT AVG(temperature), MAX(pressure) FROM {}.{}",
+        "SELECT LAST_ROW(*) FROM {}.{}",
+        "SELECT AVG(temperature) FROM {}.{} INTERVAL(1s)",
+        "SELECT AVG(temperature) FROM {}.{} GROUP BY rack",
+    ]
+
+    def execute(self):
+        self.executeWrite() # loop count rows to query
+        self.executeQuery()
+
+    def executeQuery(self):
+        # every query loop count times through the configured backend
+        backend = createBackend(Config.getConfig().backend, self._dbTarget)
+        backend.connect()
+        try:
+            for sqlTemplate in self.QUERY_SQLS:
+                sql = sqlTemplate.format(DB_NAME, self._sTable.getName())
+                hist = LatencyHistogram()
+                rows = 0
+                errors = 0
+                startTime = time.perf_counter()
+                for i in range(self._loopCount):
+                    reqStart = time.perf_counter()
+                    try:
+                        rows = backend.query(sql)
+                    except taos.error.ProgrammingError as err:
+                        errors += 1
+                        Logging.warning("Query failed: 0x{:X}, {}".format(Helper.convertErrno(err.errno), err.msg))
+                    hist.record(time.perf_counter() - reqStart)
+                elapsed = (time.perf_counter() - startTime) or 1e-9
+                Logging.info("Query on {} backend: {}".format(Config.getConfig().backend, sql))
+                Logging.info("  {} queries in {:.3f} seconds: {:.1f} queries/s, {} rows each, {} errors".format(
+                    self._loopCount, elapsed, self._loopCount / elapsed, rows, errors))
+                Logging.info("  query latency (ms): {}".format(hist.toText()))
+        finally:
+            backend.close()
+
+class Taos1kQueryBenchmark(TaosQueryBenchmark):
     def __init__(self):
         super().__init__(1000)
 
@@ -397,6 +731,19 @@ class Influx5mWriteBenchmark(InfluxWriteBenchmark):
     def __init__(self):
         super().__init__(5*1000*1000)
 
+def _findBenchmarks(baseClass):
+    '''
+    Runnable benchmarks by name, i.e. the sub classes with a fixed loop count,
+    e.g. "Taos10kWrite" for Taos10kWriteBenchmark
+    '''
+    ret = {}
+    for cls in baseClass.__subclasses__():
+        ret.update(_findBenchmarks(cls))
+        if cls.__name__.endswith('Benchmark') and '__init__' in cls.__dict__ \
+                and cls.__init__.__code__.co_argcount == 1: # takes no loop count
+            ret[cls.__name__[:-len('Benchmark')]] = cls
+    return ret
+
 def _buildCmdLineParser():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -406,6 +753,14 @@ def _buildCmdLineParser():
             
             '''))
     
+    parser.add_argument(
+        '-a',
+        '--backend',
+        action='store',
+        default='native',
+        type=str,
+        help='Where Taos* benchmarks write to: {} (default: native)'.format(', '.join(sorted(_backends))))
+
     parser.add_argument(
         '-b',
         '--benchmark-name',
@@ -414,6 +769,14 @@ def _buildCmdLineParser():
         type=str,
         help='Benchmark to use (default: Taos1kQuery)')
 
+    parser.add_argument(
+        '-c',
+        '--connections',
+        action='store',
+        default=1,
+        type=int,
+        help='Number of connections (threads) per process for write loads. (default: 1)')
+
     parser.add_argument(
         '-d',
         '--debug',
@@ -426,6 +789,14 @@ def _buildCmdLineParser():
         action='store_true',
         help='Execution operations directly without sub-process (default: false)')
 
+    parser.add_argument(
+        '-k',
+        '--tables-per-request',
+        action='store',
+        default=10,
+        type=int,
+        help='Number of tables written by each write request. (default: 10)')
+
     parser.add_argument(
         '-l',
         '--loop-count',
@@ -434,6 +805,14 @@ def _buildCmdLineParser():
         type=int,
         help='Number of loops to perform, 100 operations per loop. (default: 1000)')        
 
+    parser.add_argument(
+        '-m',
+        '--table-count',
+        action='store',
+        default=1000,
+        type=int,
+        help='Number of tables written by write loads, split among processes and connections. (default: 1000)')
+
     parser.add_argument(
         '-n',
         '--target-table-name',
@@ -442,6 +821,22 @@ def _buildCmdLineParser():
         type=str,
         help='Regular table name in target DB (default: None)')
 
+    parser.add_argument(
+        '-p',
+        '--rows-per-request',
+        action='store',
+        default=BATCH_SIZE,
+        type=int,
+        help='Number of rows in each write request. (default: {})'.format(BATCH_SIZE))
+
+    parser.add_argument(
+        '-r',
+        '--target-rate',
+        action='store',
+        default=0,
+        type=int,
+        help='Rows per second to write in total, 0 for as fast as possible. (default: 0)')
+
     parser.add_argument(
         '-s',
         '--subprocess-count',
@@ -467,11 +862,9 @@ def main():
     Dice.seed(0)  # initial seeding of dice
     
     bName = Config.getConfig().benchmark_name
-    bClassName = bName + 'Benchmark'
-    x = globals()
-    if bClassName in globals():
-        bClass = globals()[bClassName]
-        bm = bClass() # Benchmark object
+    benchmarks = _findBenchmarks(Benchmark)
+    if bName in benchmarks:
+        bm = benchmarks[bName]() # Benchmark object
         bm.run()
     else:
         raise PerfGenError("No such benchmark: {}".format(bName))
@@ -21,8 +21,11 @@ import pandas as pd
 import argparse
 import os.path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.perfstore import TDPerfStore, DEFAULT_STORE
+
 class insertFromCSVPerformace:
-    def __init__(self, commitID, dbName, tbName, branchName, buildType):
+    def __init__(self, commitID, dbName, tbName, branchName, buildType, storePath=None, remoteHost=""):
         self.commitID = commitID
         self.dbName = dbName
         self.tbName = tbName
@@ -38,12 +41,15 @@ class insertFromCSVPerformace:
             self.user,
             self.password,            
             self.config)
-        self.host2 = "192.168.1.179"    
-        self.conn2 = taos.connect(
-            host = self.host2,
-            user = self.user,
-            password = self.password,
-            config = self.config)
+        self.store = TDPerfStore(storePath)
+        self.host2 = remoteHost
+        self.conn2 = None
+        if self.host2:
+            self.conn2 = taos.connect(
+                host = self.host2,
+                user = self.user,
+                password = self.password,
+                config = self.config)
 
     def writeCSV(self):
         tsset = set()
@@ -99,13 +105,18 @@ class insertFromCSVPerformace:
         cursor.close()
 
 
-        cursor2 = self.conn2.cursor()
-        cursor2.execute("create database if not exists %s" % self.dbName)
-        cursor2.execute("use %s" % self.dbName)
-        cursor2.execute("create table if not exists %s(ts timestamp, in_order_time float, out_of_order_time float, commit_id binary(50), branch binary(50), type binary(20))" % self.tbName)     
-        cursor2.execute("insert into %s values(now, %f, %f, '%s', '%s', '%s')" % (self.tbName, in_order_time, out_of_order_time, self.commitID, self.branchName, self.type))
+        self.store.record("csv_insert", {"table": self.tbName}, {
+            "in_order_time": in_order_time,
+            "out_of_order_time": out_of_order_time},
+            self.commitID if self.commitID != 'null' else None, self.branchName, self.type)
 
-        cursor2.close()
+        if self.conn2 is not None:
+            cursor2 = self.conn2.cursor()
+            cursor2.execute("create database if not exists %s" % self.dbName)
+            cursor2.execute("use %s" % self.dbName)
+            cursor2.execute("create table if not exists %s(ts timestamp, in_order_time float, out_of_order_time float, commit_id binary(50), branch binary(50), type binary(20))" % self.tbName)     
+            cursor2.execute("insert into %s values(now, %f, %f, '%s', '%s', '%s')" % (self.tbName, in_order_time, out_of_order_time, self.commitID, self.branchName, self.type))
+            cursor2.close()
         
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()    
@@ -144,7 +155,21 @@ if __name__ == '__main__':
         default='glibc',
         type=str,
         help='build type (default: glibc)')
+    parser.add_argument(
+        '-P',
+        '--perf-store',
+        action='store',
+        default=DEFAULT_STORE,
+        type=str,
+        help='local sqlite results store, compare runs with perfCompare.py (default: %s)' % DEFAULT_STORE)
+    parser.add_argument(
+        '-R',
+        '--remote-host',
+        action='store',
+        default='',
+        type=str,
+        help='also store results in the TDengine at this host, e.g. 192.168.1.179 (default: none)')
     
     args = parser.parse_args()
-    perftest = insertFromCSVPerformace(args.commit_id, args.database_name, args.table_name, args.branch_name, args.build_type)
+    perftest = insertFromCSVPerformace(args.commit_id, args.database_name, args.table_name, args.branch_name, args.build_type, args.perf_store, args.remote_host)
     perftest.run()
\ No newline at end of file
@@ -0,0 +1,137 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+# compare the latest runs recorded by queryPerformance.py,
+# insertFromCSVPerformance.py and taosdemoPerformance.py with the runs before
+# them, exits 1 when any metric regressed:
+#   python3 perfbenchmark/perfCompare.py -n taosdemo -w 10 -e 0.05 -k 3
+#   python3 perfbenchmark/perfCompare.py -l
+
+import sys
+import os
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.perfstore import TDPerfStore, DEFAULT_STORE, printComparison
+
+
+class perfCompare:
+    def __init__(self, storePath, window, threshold, sigmas, minRuns):
+        self.store = TDPerfStore(storePath)
+        self.window = window
+        self.threshold = threshold
+        self.sigmas = sigmas
+        self.minRuns = minRuns
+
+    def listRuns(self, benchmark, limit):
+        for runID, name, params, ts, commitID, branch, buildType in self.store.runs(benchmark, limit):
+            print("%6d %s %-14s %-10s %-8s %-10s %s" % (
+                runID, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                name, commitID or "-", branch or "-", buildType or "-", params))
+
+    def latestRuns(self, benchmark, runID):
+        # the newest run of every parameter set, or just the one asked for
+        if runID:
+            return [runID]
+        sql = "select max(id) from runs"
+        args = ()
+        if benchmark:
+            sql += " where benchmark = ?"
+            args = (benchmark,)
+        sql += " group by benchmark, params, build_type order by 1"
+        return [row[0] for row in self.store.db.execute(sql, args)]
+
+    def run(self, benchmark, runID):
+        regressions = 0
+        for rid in self.latestRuns(benchmark, runID):
+            name, params, commitID, buildType = self.store.db.execute(
+                "select benchmark, params, commit_id, build_type from runs where id = ?",
+                (rid,)).fetchone()
+            print("run %d: %s %s, commit %s, build %s" % (
+                rid, name, params if json.loads(params) else "", commitID or "-", buildType or "-"))
+            results = self.store.compare(rid, self.window, self.threshold, self.sigmas, self.minRuns)
+            printComparison(results)
+            print()
+            regressions += sum(1 for r in results if r.regressed)
+        if regressions:
+            print("%d metric(s) regressed" % regressions)
+            return 1
+        return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-P',
+        '--perf-store',
+        action='store',
+        default=DEFAULT_STORE,
+        type=str,
+        help='local sqlite results store (default: %s)' % DEFAULT_STORE)
+    parser.add_argument(
+        '-n',
+        '--benchmark',
+        action='store',
+        default='',
+        type=str,
+        help='benchmark name: query, query-stream, csv_insert or taosdemo (default: all)')
+    parser.add_argument(
+        '-i',
+        '--run-id',
+        action='store',
+        default=0,
+        type=int,
+        help='run to check instead of the latest of each parameter set (default: 0)')
+    parser.add_argument(
+        '-w',
+        '--window',
+        action='store',
+        default=10,
+        type=int,
+        help='number of earlier runs in the baseline (default: 10)')
+    parser.add_argument(
+        '-e',
+        '--threshold',
+        action='store',
+        default=0.05,
+        type=float,
+        help='relative change below which nothing is a regression (default: 0.05)')
+    parser.add_argument(
+        '-k',
+        '--sigmas',
+        action='store',
+        default=3.0,
+        type=float,
+        help='robust standard deviations of the baseline a regression must exceed (default: 3.0)')
+    parser.add_argument(
+        '-m',
+        '--min-runs',
+        action='store',
+        default=3,
+        type=int,
+        help='baseline runs needed before failing (default: 3)')
+    parser.add_argument(
+        '-l',
+        '--list',
+        action='store_true',
+        default=False,
+        help='list the recorded runs instead of comparing (default: False)')
+    args = parser.parse_args()
+
+    compare = perfCompare(args.perf_store, args.window, args.threshold, args.sigmas, args.min_runs)
+    if args.list:
+        compare.listRuns(args.benchmark, 50)
+        sys.exit(0)
+    sys.exit(compare.run(args.benchmark, args.run_id))
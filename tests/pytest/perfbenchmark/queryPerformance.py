@@ -19,9 +19,25 @@ import time
 import argparse
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.stream import streamQuery
+from util.perfstore import TDPerfStore, DEFAULT_STORE
+
 
 class taosdemoQueryPerformace:
-    def __init__(self, clearCache, commitID, dbName, stbName, tbPerfix, branch, type):
+    queries = [
+        "select count(*) from test.meters",
+        "select avg(current), max(voltage), min(phase) from test.meters",
+        "select count(*) from test.meters where location='beijing'",
+        "select avg(current), max(voltage), min(phase) from test.meters where groupid=10",
+        "select avg(current), max(voltage), min(phase) from test.d10 interval(10s)",
+        "select last_row(*) from test.meters",
+        "select * from test.meters limit 10000",
+        "select avg(current), max(voltage), min(phase) from test.meters where ts <= '2017-07-15 10:40:01.000' and ts <= '2017-07-15 14:00:40.000'",
+        "select last(*) from test.meters",
+    ]
+
+    def __init__(self, clearCache, commitID, dbName, stbName, tbPerfix, branch, type, storePath=None, remoteHost=""):
         self.clearCache = clearCache
         self.commitID = commitID
         self.dbName = dbName
@@ -38,71 +54,50 @@ class taosdemoQueryPerformace:
             self.user,
             self.password,
             self.config)
-        self.host2 = "192.168.1.179"    
-        self.conn2 = taos.connect(
-            host = self.host2,
-            user = self.user,
-            password = self.password,
-            config = self.config)
+        self.store = TDPerfStore(storePath)
+        self.host2 = remoteHost
+        self.conn2 = None
+        if self.host2:
+            self.conn2 = taos.connect(
+                host = self.host2,
+                user = self.user,
+                password = self.password,
+                config = self.config)
 
     def createPerfTables(self):
+        if self.conn2 is None:
+            return
         cursor2 = self.conn2.cursor()
         cursor2.execute("create database if not exists %s" % self.dbName)
         cursor2.execute("use %s" % self.dbName)
         cursor2.execute("create table if not exists %s(ts timestamp, query_time_avg float, query_time_max float, query_time_min float, commit_id binary(50), branch binary(50), type binary(20)) tags(query_id int, query_sql binary(300))" % self.stbName)
 
-        sql = "select count(*) from test.meters"
-        tableid = 1
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select avg(current), max(voltage), min(phase) from test.meters"
-        tableid = 2
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select count(*) from test.meters where location='beijing'"
-        tableid = 3
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, \"%s\")" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select avg(current), max(voltage), min(phase) from test.meters where groupid=10"
-        tableid = 4
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select avg(current), max(voltage), min(phase) from test.d10 interval(10s)"
-        tableid = 5
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select last_row(*) from test.meters"
-        tableid = 6
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select * from test.meters limit 10000"
-        tableid = 7
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-        
-        sql = "select avg(current), max(voltage), min(phase) from meters where ts <= '2017-07-15 10:40:01.000' and ts <= '2017-07-15 14:00:40.000'"
-        tableid = 8
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, \"%s\")" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
-
-        sql = "select last(*) from test.meters"
-        tableid = 9
-        cursor2.execute("create table if not exists %s%d using %s tags(%d, '%s')" % (self.tbPerfix, tableid, self.stbName, tableid, sql))
+        for tableid, sql in enumerate(self.queries, 1):
+            quote = '"' if "'" in sql else "'"
+            cursor2.execute("create table if not exists %s%d using %s tags(%d, %s%s%s)" % (self.tbPerfix, tableid, self.stbName, tableid, quote, sql, quote))
 
         cursor2.close()
+
+    def storeResult(self, benchmark, sql, tableid, avgDelay, maxDelay, minDelay, type):
+        self.store.record(benchmark, {"sql": sql}, {
+            "query_time_avg": avgDelay,
+            "query_time_max": maxDelay,
+            "query_time_min": minDelay},
+            self.commitID if self.commitID != 'null' else None, self.branch, type)
+        if self.conn2 is not None:
+            c = self.conn2.cursor()
+            c.execute("insert into %s.%s%d values(now, %f, %f, %f, '%s', '%s', '%s')" % (self.dbName, self.tbPerfix, tableid, avgDelay, maxDelay, minDelay, self.commitID, self.branch, type))
+            c.close()
     
     def generateQueryJson(self):
         
         sqls = []
-        cursor2 = self.conn2.cursor()
-        cursor2.execute("select query_id, query_sql from %s.%s" % (self.dbName, self.stbName))
-        i = 0
-        for data in cursor2:
-            sql = {
-                "sql": data[1],
+        for i, sql in enumerate(self.queries):
+            sqls.append({
+                "sql": sql,
                 "result_mode": "onlyformat",
                 "result_file": "./query_sql_res%d.txt" % i
-            }
-            sqls.append(sql)
-            i += 1
+            })
 
         query_data = {
             "filetype": "query",
@@ -159,27 +154,29 @@ class taosdemoQueryPerformace:
             "%sperfMonitor -f %s > query_res.txt" %
             (binPath, self.generateQueryJson()))
 
-        cursor = self.conn2.cursor() 
         print("==================== query performance ====================")
-        cursor.execute("use %s" % self.dbName)
-        cursor.execute("select tbname, query_sql from %s" % self.stbName)      
-
-        i = 0
-        for data in cursor:
-            table_name = data[0]
-            sql = data[1]
-
+        for i, sql in enumerate(self.queries):
             self.avgDelay = self.getCMDOutput("grep 'avgDelay' query_res.txt | awk 'NR==%d{print $2}'" % (i + 1))
             self.maxDelay = self.getCMDOutput("grep 'avgDelay' query_res.txt | awk 'NR==%d{print $5}'" % (i + 1))
             self.minDelay = self.getCMDOutput("grep 'avgDelay' query_res.txt | awk 'NR==%d{print $8}'" % (i + 1))
-            i += 1
-            
+
             print("query time for: %s %f seconds" % (sql, float(self.avgDelay)))
-            c = self.conn2.cursor()
-            c.execute("insert into %s.%s values(now, %f, %f, %f, '%s', '%s', '%s')" % (self.dbName, table_name, float(self.avgDelay), float(self.maxDelay), float(self.minDelay), self.commitID, self.branch, self.type))            
-            
-        c.close()    
-        cursor.close()
+            self.storeResult("query", sql, i + 1, float(self.avgDelay), float(self.maxDelay), float(self.minDelay), self.type)
+
+    def queryStream(self, times=10):
+        # run every query from the python client, consuming the result block
+        # by block so large scans measure the server and not client memory;
+        # stored as benchmark query-stream and build type <type>-stream
+        print("================= streamed query performance =================")
+        for i, sql in enumerate(self.queries):
+            firstRow = []
+            lastRow = []
+            for j in range(times):
+                stats = streamQuery(self.conn, sql)
+                firstRow.append(stats.firstRowTime)
+                lastRow.append(stats.lastRowTime)
+            print("query time for: %s %f seconds, first row %f seconds, %d rows" % (sql, sum(lastRow) / times, sum(firstRow) / times, stats.rows))
+            self.storeResult("query-stream", sql, i + 1, sum(lastRow) / times, max(lastRow), min(lastRow), "%s-stream" % self.type)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()  
@@ -231,8 +228,30 @@ if __name__ == '__main__':
         default='glibc',
         type=str,
         help='build type (default: glibc)')
+    parser.add_argument(
+        '-s',
+        '--stream-fetch',
+        action='store_true',
+        default=False,
+        help='also time the queries from python with streamed fetching (default: False)')
+    parser.add_argument(
+        '-P',
+        '--perf-store',
+        action='store',
+        default=DEFAULT_STORE,
+        type=str,
+        help='local sqlite results store, compare runs with perfCompare.py (default: %s)' % DEFAULT_STORE)
+    parser.add_argument(
+        '-R',
+        '--remote-host',
+        action='store',
+        default='',
+        type=str,
+        help='also store results in the TDengine at this host, e.g. 192.168.1.179 (default: none)')
     
     args = parser.parse_args()
-    perftest = taosdemoQueryPerformace(args.remove_cache, args.commit_id, args.database_name, args.stable_name, args.table_perfix, args.git_branch, args.build_type)
+    perftest = taosdemoQueryPerformace(args.remove_cache, args.commit_id, args.database_name, args.stable_name, args.table_perfix, args.git_branch, args.build_type, args.perf_store, args.remote_host)
     perftest.createPerfTables()
-    perftest.query()
\ No newline at end of file
+    perftest.query()
+    if args.stream_fetch:
+        perftest.queryStream()
\ No newline at end of file
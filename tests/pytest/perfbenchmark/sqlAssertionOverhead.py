@@ -0,0 +1,98 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+# measure the client side cost of a passing TDSql assertion, no taosd needed:
+#   python3 perfbenchmark/sqlAssertionOverhead.py -n 20000 -d 12
+
+import sys
+import os
+import time
+import inspect
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.sql import TDSql
+
+
+class FakeCursor:
+    description = [("ts", 9), ("c1", 4)]
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql):
+        return len(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def istype(self, col, dataType):
+        return False
+
+
+class sqlAssertionOverhead:
+    def __init__(self, times, depth):
+        self.times = times
+        self.depth = depth
+        self.tdSql = TDSql()
+        self.tdSql.init(FakeCursor([(i, i) for i in range(100)]))
+        self.tdSql.query("select * from t")
+
+    def oldCheckRowCol(self, row, col):
+        # what checkRowCol did on every call before the lazy caller lookup
+        caller = inspect.getframeinfo(inspect.stack()[2][0])
+        return self.tdSql.checkRowCol(row, col)
+
+    def oldCheckData(self, row, col, data):
+        self.oldCheckRowCol(row, col)
+        return self.tdSql.checkData(row, col, data)
+
+    def atDepth(self, depth, func):
+        # cases call the assertions a few frames deep, inspect.stack() cost
+        # grows with that depth
+        if depth > 0:
+            return self.atDepth(depth - 1, func)
+        start = time.perf_counter()
+        for i in range(self.times):
+            func(i % 100, 1, i % 100)
+        return time.perf_counter() - start
+
+    def run(self):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            old = self.atDepth(self.depth, self.oldCheckData)
+            new = self.atDepth(self.depth, self.tdSql.checkData)
+        print("checkData x %d at stack depth %d" % (self.times, self.depth))
+        print("  with inspect.stack(): %8.2f us/assertion" % (old * 1e6 / self.times))
+        print("  lazy caller lookup:   %8.2f us/assertion" % (new * 1e6 / self.times))
+        print("  speedup:              %8.2fx" % (old / new))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n',
+        '--times',
+        action='store',
+        type=int,
+        default=20000,
+        help='number of assertions (default: 20000)')
+    parser.add_argument(
+        '-d',
+        '--depth',
+        action='store',
+        type=int,
+        default=12,
+        help='extra stack frames above the assertion (default: 12)')
+    args = parser.parse_args()
+    sqlAssertionOverhead(args.times, args.depth).run()
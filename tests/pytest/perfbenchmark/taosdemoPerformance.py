@@ -18,8 +18,11 @@ import os.path
 import json
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.perfstore import TDPerfStore, DEFAULT_STORE
+
 class taosdemoPerformace:
-    def __init__(self, commitID, dbName, branch, type, numOfTables, numOfRows, numOfInt, numOfDouble, numOfBinary):
+    def __init__(self, commitID, dbName, branch, type, numOfTables, numOfRows, numOfInt, numOfDouble, numOfBinary, storePath=None, remoteHost=""):
         self.commitID = commitID
         self.dbName = dbName
         self.branch = branch
@@ -39,12 +42,15 @@ class taosdemoPerformace:
             self.password,
             self.config)
         self.insertDB = "insertDB"
-        self.host2 = "192.168.1.179"    
-        self.conn2 = taos.connect(
-            host = self.host2,
-            user = self.user,
-            password = self.password,
-            config = self.config)
+        self.store = TDPerfStore(storePath)
+        self.host2 = remoteHost
+        self.conn2 = None
+        if self.host2:
+            self.conn2 = taos.connect(
+                host = self.host2,
+                user = self.user,
+                password = self.password,
+                config = self.config)
 
     def generateJson(self):
         db = {
@@ -159,22 +165,37 @@ class taosdemoPerformace:
         os.system("[ -f insert_res.txt ] && rm insert_res.txt")
 
     def createTablesAndStoreData(self):
-        cursor = self.conn2.cursor()
-
-        cursor.execute("create database if not exists %s" % self.dbName)
-        cursor.execute("use %s" % self.dbName)
-        cursor.execute("create table if not exists taosdemo_perf (ts timestamp, create_table_time float, insert_records_time float, records_per_second float, commit_id binary(50), avg_delay float, max_delay float, min_delay float, branch binary(50), type binary(20), numoftables int, numofrows int, numofint int, numofdouble int, numofbinary int)")
         print("create tables time: %f" % float(self.createTableTime))
         print("insert records time: %f" % float(self.insertRecordsTime))
         print("records per second: %f" % float(self.recordsPerSecond))
         print("avg delay: %f" % float(self.avgDelay))
         print("max delay: %f" % float(self.maxDelay))
         print("min delay: %f" % float(self.minDelay))
-        cursor.execute("insert into taosdemo_perf values(now, %f, %f, %f, '%s', %f, %f, %f, '%s', '%s', %d, %d, %d, %d, %d)" %
-            (float(self.createTableTime), float(self.insertRecordsTime), float(self.recordsPerSecond), 
-            self.commitID, float(self.avgDelay), float(self.maxDelay), float(self.minDelay), self.branch, 
-            self.type, self.numOfTables, self.numOfRows, self.numOfInt, self.numOfDouble, self.numOfBinary))
-        cursor.close()
+        self.store.record("taosdemo", {
+            "numOfTables": self.numOfTables,
+            "numOfRows": self.numOfRows,
+            "numOfInt": self.numOfInt,
+            "numOfDouble": self.numOfDouble,
+            "numOfBinary": self.numOfBinary}, {
+            "create_table_time": float(self.createTableTime),
+            "insert_records_time": float(self.insertRecordsTime),
+            "records_per_second": float(self.recordsPerSecond),
+            "avg_delay": float(self.avgDelay),
+            "max_delay": float(self.maxDelay),
+            "min_delay": float(self.minDelay)},
+            self.commitID, self.branch, self.type,
+            higherIsBetter=("records_per_second",))
+
+        if self.conn2 is not None:
+            cursor = self.conn2.cursor()
+            cursor.execute("create database if not exists %s" % self.dbName)
+            cursor.execute("use %s" % self.dbName)
+            cursor.execute("create table if not exists taosdemo_perf (ts timestamp, create_table_time float, insert_records_time float, records_per_second float, commit_id binary(50), avg_delay float, max_delay float, min_delay float, branch binary(50), type binary(20), numoftables int, numofrows int, numofint int, numofdouble int, numofbinary int)")
+            cursor.execute("insert into taosdemo_perf values(now, %f, %f, %f, '%s', %f, %f, %f, '%s', '%s', %d, %d, %d, %d, %d)" %
+                (float(self.createTableTime), float(self.insertRecordsTime), float(self.recordsPerSecond), 
+                self.commitID, float(self.avgDelay), float(self.maxDelay), float(self.minDelay), self.branch, 
+                self.type, self.numOfTables, self.numOfRows, self.numOfInt, self.numOfDouble, self.numOfBinary))
+            cursor.close()
 
         cursor1 = self.conn.cursor()
         cursor1.execute("drop database if exists %s" % self.insertDB)
@@ -244,8 +265,22 @@ if __name__ == '__main__':
         default=100000,
         type=int,
         help='num of rows (default: 100000)')
+    parser.add_argument(
+        '-P',
+        '--perf-store',
+        action='store',
+        default=DEFAULT_STORE,
+        type=str,
+        help='local sqlite results store, compare runs with perfCompare.py (default: %s)' % DEFAULT_STORE)
+    parser.add_argument(
+        '-R',
+        '--remote-host',
+        action='store',
+        default='',
+        type=str,
+        help='also store results in the TDengine at this host, e.g. 192.168.1.179 (default: none)')
     args = parser.parse_args()
 
-    perftest = taosdemoPerformace(args.commit_id, args.database_name, args.git_branch, args.build_type, args.num_of_tables, args.num_of_rows, args.num_of_int, args.num_of_double, args.num_of_binary)
+    perftest = taosdemoPerformace(args.commit_id, args.database_name, args.git_branch, args.build_type, args.num_of_tables, args.num_of_rows, args.num_of_int, args.num_of_double, args.num_of_binary, args.perf_store, args.remote_host)
     perftest.insertData()
     perftest.createTablesAndStoreData()
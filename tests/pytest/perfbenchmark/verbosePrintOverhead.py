@@ -0,0 +1,132 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+# throughput of a taosdemo style insert loop with the verbose output off and
+# on, no taosd needed:
+#   python3 perfbenchmark/verbosePrintOverhead.py -n 200000 -r 100
+#   python3 -O perfbenchmark/verbosePrintOverhead.py    # guarded calls compiled out
+
+import sys
+import os
+import time
+import random
+import argparse
+import datetime
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from util.verbose import TDVerbose
+
+
+def dispatchPrint():
+    # the multipledispatch overloads taosdemo used to have, when installed
+    try:
+        from multipledispatch import Dispatcher
+    except ImportError:
+        return None
+    state = {"verbose": False}
+    v_print = Dispatcher("v_print")
+
+    @v_print.register(str, int)
+    def printInt(msg, arg):
+        if state["verbose"]:
+            print(msg % int(arg))
+
+    @v_print.register(str, int, int)
+    def printIntInt(msg, arg1, arg2):
+        if state["verbose"]:
+            print(msg % (int(arg1), int(arg2)))
+
+    @v_print.register(str, str, int)
+    def printStrInt(msg, arg1, arg2):
+        if state["verbose"]:
+            print(msg % (arg1, int(arg2)))
+
+    return v_print, state
+
+
+class verbosePrintOverhead:
+    def __init__(self, rows, batch):
+        self.rows = rows
+        self.batch = batch
+
+    def insertLoop(self, v_print, guarded):
+        # the row loop of taosdemo insert_func minus the execute
+        start = time.perf_counter()
+        row = 0
+        while row < self.rows:
+            if not guarded:
+                v_print("row: %d", row)
+            elif __debug__ and v_print.on:
+                v_print("row: %d", row)
+            start_time = datetime.datetime(2021, 1, 25) + datetime.timedelta(seconds=row)
+            sqlCmd = ['INSERT INTO test.tb0 VALUES ']
+            for batchIter in range(0, self.batch):
+                sqlCmd.append("('%s', %f) " % (
+                    start_time + datetime.timedelta(milliseconds=batchIter),
+                    random.random()))
+                row = row + 1
+                if row >= self.rows:
+                    if not guarded:
+                        v_print("BREAK, row: %d numOfRec:%d", row, self.rows)
+                    elif __debug__ and v_print.on:
+                        v_print("BREAK, row: %d numOfRec:%d", row, self.rows)
+                    break
+            cmd = ' '.join(sqlCmd)
+            if not guarded:
+                v_print("cmd: %s, length:%d", cmd, len(cmd))
+            elif __debug__ and v_print.on:
+                v_print("cmd: %s, length:%d", cmd, len(cmd))
+        return self.rows / (time.perf_counter() - start)
+
+    def run(self):
+        results = []
+        dispatch = dispatchPrint()
+        verbose = TDVerbose()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if dispatch is not None:
+                v_print, state = dispatch
+                results.append(("multipledispatch, off", self.insertLoop(v_print, False)))
+                state["verbose"] = True
+                results.append(("multipledispatch, on", self.insertLoop(v_print, False)))
+            verbose.setLevel(TDVerbose.QUIET)
+            results.append(("facade, off", self.insertLoop(verbose, False)))
+            results.append(("facade, off, guarded", self.insertLoop(verbose, True)))
+            verbose.setLevel(TDVerbose.VERBOSE)
+            results.append(("facade, on", self.insertLoop(verbose, True)))
+        if dispatch is None:
+            print("multipledispatch not installed, only the facade is measured")
+        print("insert loop x %d rows, %d rows per request%s" % (
+            self.rows, self.batch, "" if __debug__ else ", python -O"))
+        for name, rate in results:
+            print("  %-24s %12.0f rows/s" % (name + ":", rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n',
+        '--rows',
+        action='store',
+        type=int,
+        default=200000,
+        help='number of rows rendered (default: 200000)')
+    parser.add_argument(
+        '-r',
+        '--batch',
+        action='store',
+        type=int,
+        default=1,
+        help='rows per request, taosdemo default is 1 (default: 1)')
+    args = parser.parse_args()
+    verbosePrintOverhead(args.rows, args.batch).run()
@@ -0,0 +1,65 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import sys
+import taos
+from util.log import *
+from util.cases import *
+from util.sql import *
+from util.expectations import TDExpectation
+
+
+class TDTestCase:
+    def init(self, conn, logSql):
+        tdLog.debug("start to execute %s" % __file__)
+        tdSql.init(conn.cursor(), logSql)
+
+    def checkMismatch(self, sql, rows):
+        # the comparator must catch a wrong expectation, not just pass it
+        tdSql.query(sql)
+        diffs = TDExpectation(sql, rows).compare(
+            tdSql.queryResult, tdSql.queryDescription, 0.000001)
+        if not diffs:
+            tdLog.exit("sql:%s expect:%s should mismatch %s" % (sql, rows, tdSql.queryResult))
+        tdLog.info("sql:%s expect:%s mismatched as it should" % (sql, rows))
+
+    def run(self):
+        tdSql.prepare()
+        tdSql.execute("create table t1 (ts timestamp, b bigint, i int, u bigint unsigned, d double, bl bool)")
+        tdSql.execute("insert into t1 values(1600000000000, 9223372036854775806, 1, 18446744073709551614, 1.5, false)")
+        tdSql.execute("insert into t1 values(1600000000001, -9223372036854775807, NULL, 0, NULL, true)")
+
+        tdSql.runExpectations([
+            ("select b, i, u, d, bl from t1 order by ts", [
+                [9223372036854775806, 1, 18446744073709551614, 1.5, False],
+                [-9223372036854775807, None, 0, None, True]]),
+            ("select count(*) from t1", [[2]]),
+            ("select * from t1", 2),
+        ])
+
+        # bigint off by one at both ends of the range
+        self.checkMismatch("select b from t1 order by ts", [[9223372036854775807], [-9223372036854775807]])
+        self.checkMismatch("select b from t1 order by ts", [[9223372036854775806], [-9223372036854775806]])
+        self.checkMismatch("select u from t1 order by ts", [[18446744073709551615], [0]])
+        # a fractional expectation is not truncated to the int column
+        self.checkMismatch("select i from t1 order by ts", [[1.5], [None]])
+        # and a value that does not convert is an error, not a silent match
+        self.checkMismatch("select bl from t1 order by ts", [["false"], [True]])
+
+    def stop(self):
+        tdSql.close()
+        tdLog.success("%s successfully executed" % __file__)
+
+
+tdCases.addWindows(__file__, TDTestCase())
+tdCases.addLinux(__file__, TDTestCase())
@@ -24,6 +24,8 @@ from util.log import *
 from util.dnodes import *
 from util.cases import *
 from util.dockerNodes import *
+from util.parallel import *
+from util.pool import *
 
 import taos
 
@@ -40,8 +42,12 @@ if __name__ == "__main__":
     docker = False
     dataDir = "/data"
     windows = 0
+    parallel = 0
+    caseList = ""
+    serverPort = 0
     opts, args = getopt.gnu_getopt(sys.argv[1:], 'f:d:p:m:l:scghrw', [
-        'file=', 'docker=', 'path=', 'master', 'logSql', 'stop', 'cluster', 'valgrind', 'help', 'windows'])
+        'file=', 'docker=', 'path=', 'master', 'logSql', 'stop', 'cluster', 'valgrind', 'help', 'windows',
+        'parallel=', 'caselist=', 'port=', 'logLevel=', 'logFile=', 'logJson=', 'quiet'])
     for key, value in opts:
         if key in ['-h', '--help']:
             tdLog.printNoPrefix(
@@ -56,6 +62,13 @@ if __name__ == "__main__":
             tdLog.printNoPrefix('-g valgrind Test Flag')
             tdLog.printNoPrefix('-r taosd restart test')
             tdLog.printNoPrefix('-w taos on windows')            
+            tdLog.printNoPrefix('--parallel <N> run the cases of --caselist with N isolated workers')
+            tdLog.printNoPrefix('--caselist <file> case list, plain or fulltest.sh style')
+            tdLog.printNoPrefix('--port <port> serverPort of an isolated dnode deployment')
+            tdLog.printNoPrefix('--logLevel <trace|debug|info|success|notice|error> lowest level on the console and --logFile')
+            tdLog.printNoPrefix('--logFile <file> also log to file, written in background')
+            tdLog.printNoPrefix('--logJson <file> also log json lines with case, sql and duration, from trace level up')
+            tdLog.printNoPrefix('--quiet only print the log when a case fails')
             sys.exit(0)
 
         if key in ['-r', '--restart']:
@@ -96,6 +109,39 @@ if __name__ == "__main__":
         if key in ['-w', '--windows']:
             windows = 1
 
+        if key in ['--parallel']:
+            parallel = int(value)
+
+        if key in ['--caselist']:
+            caseList = value
+
+        if key in ['--port']:
+            serverPort = int(value)
+
+        if key in ['--logLevel']:
+            tdLog.setLevel(value)
+
+        if key in ['--logFile']:
+            tdLog.addSink(TDFileSink(value))
+
+        if key in ['--logJson']:
+            tdLog.addSink(TDFileSink(value, jsonLines=True))
+
+        if key in ['--quiet']:
+            tdLog.setQuiet(True)
+
+    if parallel > 0:
+        if caseList == "":
+            tdLog.printNoPrefix("--parallel requires --caselist")
+            sys.exit(1)
+        if deployPath == "":
+            deployPath = os.path.realpath(
+                os.path.dirname(os.path.realpath(__file__)) + "/../../")
+        runner = TDParallelRunner(
+            parallel, os.path.join(deployPath, "sim", "parallel"))
+        failed = runner.run(runner.loadCaseList(caseList))
+        sys.exit(1 if failed else 0)
+
     if (stop != 0):
         if (valgrind == 0):
             toBeKilled = "taosd"
@@ -212,6 +258,8 @@ if __name__ == "__main__":
         tdCases.logSql(logSql)
 
     else:
+        if serverPort:
+            tdDnodes.setServerPort(serverPort)
         tdDnodes.init(deployPath)
         tdDnodes.setTestCluster(testCluster)
         tdDnodes.setValgrind(valgrind)
@@ -249,6 +297,7 @@ if __name__ == "__main__":
             conn = taos.connect(
                 host,
                 config=tdDnodes.getSimCfgPath())
+            tdPool.init(host, tdDnodes.getSimCfgPath())
             if fileName == "all":
                 tdCases.runAllLinux(conn)
             else:
@@ -69,6 +69,7 @@ class TDCases:
         runNum = 0
         for tmp in self.linuxCases:
             if tmp.name.find(os.path.normcase(fileName)) != -1:
+                tdLog.setCase(fileName)
                 case = testModule.TDTestCase()
                 case.init(conn, self._logSql)
                 try:
@@ -100,6 +101,7 @@ class TDCases:
         runNum = 0
         for tmp in self.windowsCases:
             if tmp.name.find(fileName) != -1:
+                tdLog.setCase(fileName)
                 case = testModule.TDTestCase()
                 case.init(conn, self._logSql)
                 try:
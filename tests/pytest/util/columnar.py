@@ -0,0 +1,121 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+# taos field type code -> numpy dtype, types not listed are kept as objects
+_DTYPES = {
+    1: np.bool_,        # bool
+    2: np.int8,         # tinyint
+    3: np.int16,        # smallint
+    4: np.int32,        # int
+    5: np.int64,        # bigint
+    6: np.float32,      # float
+    7: np.float64,      # double
+    9: "datetime64[ns]",  # timestamp
+    11: np.uint8,       # tinyint unsigned
+    12: np.uint16,      # smallint unsigned
+    13: np.uint32,      # int unsigned
+    14: np.uint64,      # bigint unsigned
+}
+
+
+class TDColumnarResult:
+    """
+    column major copy of a result set, each column is a typed numpy array
+    plus a boolean null mask
+    """
+
+    def __init__(self, rows, description):
+        self.rows = len(rows)
+        self.names = [d[0] for d in description]
+        self.values = []
+        self.nulls = []
+        columns = list(zip(*rows)) if rows else [()] * len(description)
+        for i, d in enumerate(description):
+            values, nulls = self.toArray(columns[i], _DTYPES.get(d[1], object))
+            self.values.append(values)
+            self.nulls.append(nulls)
+
+    @staticmethod
+    def toArray(column, dtype):
+        nulls = np.fromiter((v is None for v in column), dtype=np.bool_,
+                            count=len(column))
+        if dtype is object or not nulls.any():
+            filled = column
+        else:
+            fill = np.datetime64(0, "ns") if dtype == "datetime64[ns]" else 0
+            filled = [fill if v is None else v for v in column]
+        try:
+            values = np.array(filled, dtype=dtype)
+        except (TypeError, ValueError, OverflowError):
+            values = np.array(filled, dtype=object)
+        return values, nulls
+
+    @staticmethod
+    def fromExpected(expected, like):
+        """
+        convert the expectation of a test case to the dtype of column like,
+        None stands for NULL; numbers that do not fit an integer or bool
+        column (1.5) are kept as float64, other values that would change on
+        conversion ('false' in a bool column) raise ValueError
+        """
+        column = list(expected)
+        kind = like.dtype.kind
+        if kind == "O":
+            return TDColumnarResult.toArray(column, object)
+        dtype = np.float64 if kind == "f" else like.dtype
+        values, nulls = TDColumnarResult.toArray(column, dtype)
+        if kind == "M":
+            return values, nulls
+        converted = values.tolist()
+        lossy = [v for i, v in enumerate(column)
+                 if v is not None and (values.dtype == object or
+                                       type(v) is str or converted[i] != v)]
+        if not lossy:
+            return values, nulls
+        if all(isinstance(v, (int, float, np.integer, np.floating))
+               for v in lossy):
+            return TDColumnarResult.toArray(column, np.float64)
+        raise ValueError("expected %r does not convert to %s without loss" %
+                         (lossy[0], like.dtype))
+
+    @staticmethod
+    def mismatches(values, nulls, expectValues, expectNulls, rtol=0, atol=0):
+        """
+        returns the indexes of rows that differ
+        """
+        if len(values) != len(expectValues):
+            raise ValueError("length %d != expect length %d" %
+                             (len(values), len(expectValues)))
+        kinds = values.dtype.kind + expectValues.dtype.kind
+        if "f" in kinds and all(k in "fiub" for k in kinds):
+            same = np.isclose(values.astype(np.float64),
+                              expectValues.astype(np.float64),
+                              rtol=rtol, atol=atol, equal_nan=True)
+        elif all(k in "iub" for k in kinds):
+            # exact, int64 against uint64 would otherwise compare as float64
+            if values.dtype.kind != expectValues.dtype.kind:
+                same = values.astype(object) == expectValues.astype(object)
+            else:
+                same = values == expectValues
+            same = np.asarray(same, dtype=np.bool_)
+        elif values.dtype.kind == "M" and expectValues.dtype.kind == "M":
+            same = values == expectValues
+        else:
+            same = np.fromiter(
+                (str(a) == str(b) for a, b in zip(values, expectValues)),
+                dtype=np.bool_, count=len(values))
+        # NULL only matches NULL, whatever the filler value is
+        same = np.where(nulls | expectNulls, nulls == expectNulls, same)
+        return np.flatnonzero(~same)
@@ -13,8 +13,11 @@
 
 import random
 import string
+from util.log import tdLog
 from util.sql import tdSql
 from util.dnodes import tdDnodes
+from util.pool import tdPool
+from util.rest import tdRest
 import requests
 import time
 import socket
@@ -47,7 +50,7 @@ class TDCom:
         sock.close()
 
     def restApiPost(self, sql):
-        requests.post(self.preDefine()[1], sql.encode("utf-8"), headers = self.preDefine()[0])
+        tdRest.post(self.preDefine()[1], sql)
 
     def createDb(self, dbname="test", db_update_tag=0, api_type="taosc"):
         if api_type == "taosc":
@@ -83,7 +86,7 @@ class TDCom:
             url = self.genUrl(url_type, dbname, precision)
         elif url_type == "telnet":
             url = self.genUrl(url_type, dbname, precision)
-        res = requests.post(url, sql.encode("utf-8"), headers = self.preDefine()[0])
+        res = tdRest.post(url, sql)
         return res
 
     def cleanTb(self, type="taosc"):
@@ -120,6 +123,9 @@ class TDCom:
     def restartTaosd(self, index=1, db_name="db"):
         tdDnodes.stop(index)
         tdDnodes.startWithoutSleep(index)
+        if not tdDnodes.waitReady(index):
+            tdLog.exit("dnode:%d not ready after restart" % index)
+        tdPool.reconnect()
         tdSql.execute(f"use {db_name}")
 
     def typeof(self, variate):
@@ -17,9 +17,20 @@ import os.path
 import platform
 import pathlib
 import shutil
+import socket
 import subprocess
 from time import sleep
 from util.log import *
+from util.readiness import *
+
+
+def _psCmd(toBeKilled, scope=""):
+    # when scope is given only processes whose command line contains it are
+    # matched, so parallel workers never kill each other's taosd
+    psCmd = "ps -ef|grep -w %s| grep -v grep| grep -v defunct" % toBeKilled
+    if scope:
+        psCmd += "| grep -F -- '%s'" % scope
+    return psCmd + " | awk '{print $2}'"
 
 
 class TDSimClient:
@@ -58,6 +69,12 @@ class TDSimClient:
     def setTestCluster(self, value):
         self.testCluster = value
 
+    def setServerPort(self, port):
+        self.cfgDict.update({
+            "serverPort": str(port),
+            "firstEp": "%s:%d" % (socket.gethostname(), port),
+        })
+
     def addExtraCfg(self, option, value):
         self.cfgDict.update({option: value})
 
@@ -133,6 +150,8 @@ class TDDnode:
         self.deployed = 0
         self.testCluster = False
         self.valgrind = 0
+        self.serverPort = 0
+        self.logWatcher = None
         self.cfgDict = {
             "numOfLogLines": "100000000",
             "mnodeEqualVnodeNum": "0",
@@ -176,6 +195,55 @@ class TDDnode:
     def setValgrind(self, value):
         self.valgrind = value
 
+    def setServerPort(self, port, firstPort):
+        self.serverPort = port
+        self.cfgDict.update({
+            "serverPort": str(port),
+            "firstEp": "%s:%d" % (socket.gethostname(), firstPort),
+        })
+
+    def getScope(self):
+        if self.serverPort:
+            return "%s/sim/" % (self.path)
+        return ""
+
+    def getPortRange(self):
+        if self.serverPort:
+            return range(self.serverPort, self.serverPort + 11)
+        return range(6030, 6041)
+
+    def getHost(self):
+        if self.testCluster:
+            return "192.168.0.%d" % (self.index)
+        return socket.gethostname()
+
+    def getLogFile(self):
+        # a case may move the log through updatecfgDict
+        return "%s/taosdlog.0" % self.cfgDict.get("logDir", self.logDir)
+
+    def waitReady(self, timeout=120):
+        """
+        block until the dnode serves requests, returns False on timeout;
+        the log line is the cheapest signal, the server is probed directly
+        when the log never shows up
+        """
+        deadline = time.time() + timeout
+        port = self.serverPort or 6030
+        watcher = self.logWatcher or TDLogWatcher(
+            self.getLogFile(), "from offline to online")
+        self.logWatcher = None
+
+        if not waitUntil(watcher.exists, min(timeout, 5)):
+            tdLog.notice("%s not found, probe dnode:%d by show dnodes" %
+                         (watcher.logFile, self.index))
+            return waitUntil(
+                lambda: probeDnodes(self.getHost(), port, self.cfgDir),
+                deadline - time.time(), maxDelay=1)
+        if not waitUntil(watcher.found, deadline - time.time()):
+            return False
+        return waitUntil(lambda: probePort(self.getHost(), port),
+                         deadline - time.time())
+
     def getDataSize(self):
         totalSize = 0
 
@@ -305,50 +373,29 @@ class TDDnode:
 
             print(cmd)
 
-        if (taosadapterBinPath != ""):
+        if (taosadapterBinPath != "" and self.serverPort):
+            taosadapterCmd = "nohup %s --port=%d --taosConfigDir=%s --monitor.writeToTD=false > /dev/null 2>&1 & " % (
+                taosadapterBinPath, self.serverPort + 11, self.cfgDir)
+            tdLog.info(taosadapterCmd)
+            if os.system(taosadapterCmd) != 0:
+                tdLog.exit(taosadapterCmd)
+        elif (taosadapterBinPath != ""):
             taosadapterCmd = "nohup %s --opentsdb_telnet.enable=true --monitor.writeToTD=false > /dev/null 2>&1 & " % (
                 taosadapterBinPath)
             tdLog.info(taosadapterCmd)
             if os.system(taosadapterCmd) != 0:
                 tdLog.exit(taosadapterCmd)
 
+        self.logWatcher = TDLogWatcher(
+            self.getLogFile(), "from offline to online")
         if os.system(cmd) != 0:
             tdLog.exit(cmd)
 
         self.running = 1
         tdLog.debug("dnode:%d is running with %s " % (self.index, cmd))
-        if self.valgrind == 0:
-            time.sleep(0.1)
-            key = 'from offline to online'
-            bkey = bytes(key, encoding="utf8")
-            logFile = self.logDir + "/taosdlog.0"
-            i = 0
-            while not os.path.exists(logFile):
-                sleep(0.1)
-                i += 1
-                if i > 50:
-                    break
-            popen = subprocess.Popen(
-                'tail -f ' + logFile,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True)
-            pid = popen.pid
-            # print('Popen.pid:' + str(pid))
-            timeout = time.time() + 60 * 2
-            while True:
-                line = popen.stdout.readline().strip()
-                if bkey in line:
-                    popen.kill()
-                    break
-                if time.time() > timeout:
-                    tdLog.exit('wait too long for taosd start')
-            tdLog.debug("the dnode:%d has been started." % (self.index))
-        else:
-            tdLog.debug(
-                "wait 10 seconds for the dnode:%d to start." %
-                (self.index))
-            time.sleep(10)
+        if not self.waitReady(60 * 2 if self.valgrind == 0 else 60 * 10):
+            tdLog.exit('wait too long for taosd start')
+        tdLog.debug("the dnode:%d has been started." % (self.index))
 
         # time.sleep(5)
 
@@ -378,43 +425,16 @@ class TDDnode:
             if os.system(taosadapterCmd) != 0:
                 tdLog.exit(taosadapterCmd)
 
+        self.logWatcher = TDLogWatcher(
+            self.getLogFile(), "from offline to online")
         if os.system(cmd) != 0:
             tdLog.exit(cmd)
 
         self.running = 1
         tdLog.debug("dnode:%d is running with %s " % (self.index, cmd))
-        if self.valgrind == 0:
-            time.sleep(0.1)
-            key = 'from offline to online'
-            bkey = bytes(key, encoding="utf8")
-            logFile = self.logDir + "/taosdlog.0"
-            i = 0
-            while not os.path.exists(logFile):
-                sleep(0.1)
-                i += 1
-                if i > 50:
-                    break
-            popen = subprocess.Popen(
-                'tail -n +0 -f ' + logFile,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True)
-            pid = popen.pid
-            # print('Popen.pid:' + str(pid))
-            timeout = time.time() + 60 * 2
-            while True:
-                line = popen.stdout.readline().strip()
-                if bkey in line:
-                    popen.kill()
-                    break
-                if time.time() > timeout:
-                    tdLog.exit('wait too long for taosd start')
-            tdLog.debug("the dnode:%d has been started." % (self.index))
-        else:
-            tdLog.debug(
-                "wait 10 seconds for the dnode:%d to start." %
-                (self.index))
-            time.sleep(10)
+        if not self.waitReady(60 * 2 if self.valgrind == 0 else 60 * 10):
+            tdLog.exit('wait too long for taosd start')
+        tdLog.debug("the dnode:%d has been started." % (self.index))
 
     def startWithoutSleep(self):
         binPath = self.getPath()
@@ -449,6 +469,8 @@ class TDDnode:
             if os.system(taosadapterCmd) != 0:
                 tdLog.exit(taosadapterCmd)
 
+        self.logWatcher = TDLogWatcher(
+            self.getLogFile(), "from offline to online")
         if os.system(cmd) != 0:
             tdLog.exit(cmd)
         self.running = 1
@@ -457,7 +479,7 @@ class TDDnode:
     def stop(self):
         taosadapterToBeKilled = "taosadapter"
 
-        taosadapterPsCmd = "ps -ef|grep -w %s| grep -v grep | awk '{print $2}'" % taosadapterToBeKilled
+        taosadapterPsCmd = _psCmd(taosadapterToBeKilled, self.getScope())
         taosadapterProcessID = subprocess.check_output(
             taosadapterPsCmd, shell=True).decode("utf-8")
 
@@ -474,7 +496,7 @@ class TDDnode:
             toBeKilled = "valgrind.bin"
 
         if self.running != 0:
-            psCmd = "ps -ef|grep -w %s| grep -v grep | awk '{print $2}'" % toBeKilled
+            psCmd = _psCmd(toBeKilled, self.getScope())
             processID = subprocess.check_output(
                 psCmd, shell=True).decode("utf-8")
 
@@ -484,7 +506,7 @@ class TDDnode:
                 time.sleep(1)
                 processID = subprocess.check_output(
                     psCmd, shell=True).decode("utf-8")
-            for port in range(6030, 6041):
+            for port in self.getPortRange():
                 fuserCmd = "fuser -k -n tcp %d" % port
                 os.system(fuserCmd)
             if self.valgrind:
@@ -500,7 +522,7 @@ class TDDnode:
             toBeKilled = "valgrind.bin"
 
         if self.running != 0:
-            psCmd = "ps -ef|grep -w %s| grep -v grep | awk '{print $2}'" % toBeKilled
+            psCmd = _psCmd(toBeKilled, self.getScope())
             processID = subprocess.check_output(
                 psCmd, shell=True).decode("utf-8")
 
@@ -510,7 +532,7 @@ class TDDnode:
                 time.sleep(1)
                 processID = subprocess.check_output(
                     psCmd, shell=True).decode("utf-8")
-            for port in range(6030, 6041):
+            for port in self.getPortRange():
                 fuserCmd = "fuser -k -n tcp %d" % port
                 os.system(fuserCmd)
             if self.valgrind:
@@ -558,9 +580,14 @@ class TDDnodes:
         self.dnodes.append(TDDnode(9))
         self.dnodes.append(TDDnode(10))
         self.simDeployed = False
+        self.serverPort = 0
 
     def init(self, path):
-        psCmd = "ps -ef|grep -w taosd| grep -v grep| grep -v defunct | awk '{print $2}'"
+        scope = ""
+        if self.serverPort:
+            scope = "%s/sim/" % os.path.realpath(path)
+
+        psCmd = _psCmd("taosd", scope)
         processID = subprocess.check_output(psCmd, shell=True).decode("utf-8")
         while(processID):
             killCmd = "kill -9 %s > /dev/null 2>&1" % processID
@@ -569,7 +596,7 @@ class TDDnodes:
             processID = subprocess.check_output(
                 psCmd, shell=True).decode("utf-8")
 
-        psCmd = "ps -ef|grep -w valgrind.bin| grep -v grep | awk '{print $2}'"
+        psCmd = _psCmd("valgrind.bin", scope)
         processID = subprocess.check_output(psCmd, shell=True).decode("utf-8")
         while(processID):
             killCmd = "kill -9 %s > /dev/null 2>&1" % processID
@@ -609,12 +636,26 @@ class TDDnodes:
 
         self.sim = TDSimClient(self.path)
 
+        if self.serverPort:
+            for i in range(len(self.dnodes)):
+                self.dnodes[i].setServerPort(
+                    self.serverPort + i * 20, self.serverPort)
+            self.sim.setServerPort(self.serverPort)
+
     def setTestCluster(self, value):
         self.testCluster = value
 
     def setValgrind(self, value):
         self.valgrind = value
 
+    def setServerPort(self, port):
+        """
+        run the dnodes on ports [port, port + 200) and only touch processes
+        deployed under our own sim root; must be called before init() with
+        an explicit deploy path
+        """
+        self.serverPort = port
+
     def deploy(self, index, *updatecfgDict):
         self.sim.setTestCluster(self.testCluster)
 
@@ -643,6 +684,10 @@ class TDDnodes:
         self.check(index)
         self.dnodes[index - 1].startWithoutSleep()
 
+    def waitReady(self, index, timeout=120):
+        self.check(index)
+        return self.dnodes[index - 1].waitReady(timeout)
+
     def stop(self, index):
         self.check(index)
         self.dnodes[index - 1].stop()
@@ -676,6 +721,10 @@ class TDDnodes:
         for i in range(len(self.dnodes)):
             self.dnodes[i].stop()
 
+        if self.serverPort:
+            self.killScoped()
+            return
+
         psCmd = "ps -ef | grep -w taosd | grep 'root' | grep -v grep| grep -v defunct | awk '{print $2}'"
         processID = subprocess.check_output(psCmd, shell=True).decode("utf-8")
         if processID:
@@ -704,6 +753,19 @@ class TDDnodes:
         # if os.system(cmd) != 0 :
         # tdLog.exit(cmd)
 
+    def killScoped(self):
+        scope = "%s/sim/" % (self.path)
+        for toBeKilled in ["taosd", "valgrind.bin", "taosadapter"]:
+            psCmd = _psCmd(toBeKilled, scope)
+            processID = subprocess.check_output(
+                psCmd, shell=True).decode("utf-8")
+            while(processID):
+                killCmd = "kill -9 %s > /dev/null 2>&1" % processID
+                os.system(killCmd)
+                time.sleep(1)
+                processID = subprocess.check_output(
+                    psCmd, shell=True).decode("utf-8")
+
     def getDnodesRootDir(self):
         dnodesRootDir = "%s/sim" % (self.path)
         return dnodesRootDir
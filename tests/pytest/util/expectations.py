@@ -0,0 +1,81 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import json
+from util.columnar import TDColumnarResult
+
+
+class TDExpectation:
+    """
+    one sql with its expected result: either the full row matrix or only
+    the number of rows; None in the matrix stands for NULL
+    """
+
+    def __init__(self, sql, rows=None, rowCount=None, rtol=0):
+        self.sql = sql
+        self.rows = rows
+        self.rowCount = len(rows) if rows is not None else rowCount
+        self.rtol = rtol
+
+    @staticmethod
+    def parse(entry):
+        """
+        accept (sql, rows), (sql, rowCount) or a dict with sql/rows/rowCount/rtol
+        """
+        if isinstance(entry, TDExpectation):
+            return entry
+        if isinstance(entry, dict):
+            return TDExpectation(entry["sql"], entry.get("rows"),
+                                 entry.get("rowCount"), entry.get("rtol", 0))
+        sql, expected = entry[0], entry[1]
+        rtol = entry[2] if len(entry) > 2 else 0
+        if isinstance(expected, int):
+            return TDExpectation(sql, rowCount=expected, rtol=rtol)
+        return TDExpectation(sql, [list(row) for row in expected], rtol=rtol)
+
+    def compare(self, rows, description, atol):
+        """
+        returns the list of (row, col, actual, expected) that differ, a shape
+        mismatch is reported as a single entry with row and col set to -1
+        """
+        if self.rowCount is not None and len(rows) != self.rowCount:
+            return [(-1, -1, "%d rows" % len(rows), "%d rows" % self.rowCount)]
+        if self.rows is None:
+            return []
+        cols = len(description)
+        for row in self.rows:
+            if len(row) != cols:
+                return [(-1, -1, "%d cols" % cols, "%d cols" % len(row))]
+        result = TDColumnarResult(rows, description)
+        diffs = []
+        for col in range(cols):
+            try:
+                expectValues, expectNulls = TDColumnarResult.fromExpected(
+                    [row[col] for row in self.rows], result.values[col])
+            except ValueError as e:
+                diffs.append((-1, col, str(result.values[col].dtype), str(e)))
+                continue
+            for row in TDColumnarResult.mismatches(
+                    result.values[col], result.nulls[col],
+                    expectValues, expectNulls, self.rtol, atol):
+                diffs.append((row, col, rows[row][col], self.rows[row][col]))
+        return diffs
+
+
+def loadExpectations(fileName):
+    """
+    read an expectation table kept next to a case, a json list of
+    {"sql": ..., "rows": [[...], ...]} or {"sql": ..., "rowCount": n}
+    """
+    with open(fileName) as f:
+        return [TDExpectation.parse(entry) for entry in json.load(f)]
@@ -14,32 +14,272 @@
 import sys
 import os
 import time
+import json
+import queue
+import atexit
 import datetime
+import threading
+import collections
 from distutils.log import warn as printf
 
 
+class TDLogRecord:
+    """
+    one log event, the message is only formatted when a sink writes it so
+    records that are filtered out or never flushed cost no formatting
+    """
+
+    __slots__ = ("time", "level", "msg", "args", "case", "fields")
+
+    def __init__(self, level, msg, args, case, fields):
+        self.time = time.time()
+        self.level = level
+        self.msg = msg
+        self.args = args
+        self.case = case
+        self.fields = fields
+
+    def message(self):
+        if self.args:
+            try:
+                return self.msg % self.args
+            except (TypeError, ValueError):
+                return "%s %% %r" % (self.msg, self.args)
+        return str(self.msg)
+
+    def timestamp(self):
+        return datetime.datetime.fromtimestamp(self.time)
+
+
+class TDConsoleSink:
+    """
+    the historical terminal format, errors and notices go to stderr
+    """
+
+    FORMATS = {
+        5: "%s %s\n",
+        10: "\033[1;36m%s %s\033[0m\n",
+        20: "%s %s\n\n",
+        25: "\033[1;32m%s %s\033[0m\n",
+        30: "\033[1;33m%s %s\033[0m\n",
+        40: "\033[1;31m%s %s\033[0m\n",
+    }
+
+    def write(self, record):
+        stream = sys.stderr if record.level >= TDLog.SUCCESS else sys.stdout
+        stream.write(self.FORMATS[record.level] %
+                     (record.timestamp(), record.message()))
+
+    def flush(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    def close(self):
+        self.flush()
+
+
+class TDFileSink:
+    """
+    buffered sink written by a background thread, plain text or json lines
+    carrying the case, level and any extra fields such as sql and duration
+    """
+
+    BATCH = 1024
+
+    def __init__(self, path, jsonLines=False, level=None):
+        """
+        level is the lowest level written, None follows the console level;
+        json lines default to trace so every sql with its duration is kept
+        """
+        self.path = path
+        self.jsonLines = jsonLines
+        self.level = level if level is not None else (
+            TDLog.TRACE if jsonLines else None)
+        self.file = open(path, "a", buffering=1 << 20)
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+
+    def render(self, record):
+        if self.jsonLines:
+            line = {
+                "time": record.timestamp().isoformat(),
+                "level": TDLog.LEVELS[record.level],
+                "case": record.case,
+                "msg": record.message(),
+            }
+            line.update(record.fields)
+            return json.dumps(line, default=str) + "\n"
+        return "%s %s %s\n" % (record.timestamp(),
+                               TDLog.LEVELS[record.level].upper(),
+                               record.message())
+
+    def writer(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            closing = False
+            for item in batch:
+                if isinstance(item, TDLogRecord):
+                    lines.append(self.render(item))
+                elif item is None:
+                    closing = True
+                else:
+                    # a flush marker, everything queued before it is in lines
+                    self.file.write("".join(lines))
+                    lines = []
+                    self.file.flush()
+                    item.set()
+            self.file.write("".join(lines))
+            if closing:
+                self.file.close()
+                return
+            if self.queue.empty():
+                self.file.flush()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def flush(self):
+        if not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join()
+
+
 class TDLog:
+    TRACE = 5
+    DEBUG = 10
+    INFO = 20
+    SUCCESS = 25
+    NOTICE = 30
+    ERROR = 40
+    LEVELS = {
+        5: "trace",
+        10: "debug",
+        20: "info",
+        25: "success",
+        30: "notice",
+        40: "error",
+    }
+
     def __init__(self):
         self.path = ""
+        self.level = TDLog.DEBUG
+        self.case = ""
+        self.quiet = False
+        self.pending = collections.deque(maxlen=100000)
+        self.console = TDConsoleSink()
+        self.sinks = []
+        self.minLevel = self.level  # lowest level any sink or the console takes
+        atexit.register(self.close)
+
+    @staticmethod
+    def toLevel(level):
+        if isinstance(level, str):
+            names = {v: k for k, v in TDLog.LEVELS.items()}
+            if level.lower() not in names:
+                raise ValueError("unknown log level %s" % level)
+            level = names[level.lower()]
+        return level
+
+    def setLevel(self, level):
+        """
+        the console level, also the level of sinks that have none of their own
+        """
+        self.level = self.toLevel(level)
+        self.updateMinLevel()
+
+    def updateMinLevel(self):
+        self.minLevel = min([self.level] + [
+            sink.level for sink in self.sinks if sink.level is not None])
+
+    def sinkLevel(self, sink):
+        return self.level if sink.level is None else sink.level
+
+    def enabled(self, level):
+        return level >= self.minLevel
+
+    def setCase(self, case):
+        self.case = case
+
+    def setQuiet(self, quiet, keep=100000):
+        """
+        in quiet mode the console only shows notices and errors, the records
+        before them are kept in memory and dumped when a failure shows up
+        """
+        self.quiet = quiet
+        self.pending = collections.deque(maxlen=keep)
+
+    def addSink(self, sink):
+        if sink.level is not None:
+            sink.level = self.toLevel(sink.level)
+        self.sinks.append(sink)
+        self.updateMinLevel()
+
+    def emit(self, level, msg, args, fields):
+        if level < self.minLevel:
+            return
+        record = TDLogRecord(level, msg, args, self.case, fields)
+        for sink in self.sinks:
+            if level >= self.sinkLevel(sink):
+                sink.write(record)
+        if level < self.level:
+            return
+        if self.quiet and level < TDLog.NOTICE:
+            self.pending.append(record)
+            return
+        if self.pending:
+            for pending in self.pending:
+                self.console.write(pending)
+            self.pending.clear()
+        self.console.write(record)
+
+    def flush(self):
+        self.console.flush()
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        self.console.close()
+        for sink in self.sinks:
+            sink.close()
+
+    def trace(self, info, *args, **fields):
+        self.emit(TDLog.TRACE, info, args, fields)
 
-    def info(self, info):
-        print("%s %s\n" % (datetime.datetime.now(), info))
+    def info(self, info, *args, **fields):
+        self.emit(TDLog.INFO, info, args, fields)
 
     def sleep(self, sec):
-        print("%s sleep %d seconds" % (datetime.datetime.now(), sec))
+        self.emit(TDLog.INFO, "sleep %d seconds", (sec,), {})
         time.sleep(sec)
 
-    def debug(self, err):
-        print("\033[1;36m%s %s\033[0m" % (datetime.datetime.now(), err))
+    def debug(self, err, *args, **fields):
+        self.emit(TDLog.DEBUG, err, args, fields)
 
-    def success(self, info):
-        printf("\033[1;32m%s %s\033[0m" % (datetime.datetime.now(), info))
+    def success(self, info, *args, **fields):
+        self.emit(TDLog.SUCCESS, info, args, fields)
 
-    def notice(self, err):
-        printf("\033[1;33m%s %s\033[0m" % (datetime.datetime.now(), err))
+    def notice(self, err, *args, **fields):
+        self.emit(TDLog.NOTICE, err, args, fields)
 
-    def exit(self, err):
-        printf("\033[1;31m%s %s\033[0m" % (datetime.datetime.now(), err))
+    def exit(self, err, *args, **fields):
+        self.emit(TDLog.ERROR, err, args, fields)
+        # the sinks stay open for whoever catches SystemExit, atexit closes them
+        self.flush()
         sys.exit(1)
 
     def printNoPrefix(self, info):
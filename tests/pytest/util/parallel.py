@@ -0,0 +1,177 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import time
+import shlex
+import queue
+import threading
+import subprocess
+from util.log import *
+
+
+class TDCaseResult:
+    def __init__(self, args, worker, returnCode, duration, logFile):
+        self.args = args
+        self.worker = worker
+        self.returnCode = returnCode
+        self.duration = duration
+        self.logFile = logFile
+
+    def name(self):
+        return " ".join(self.args)
+
+
+class TDResultCollector:
+    """
+    thread safe sink shared by all workers of a parallel run
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = []
+        self.startTime = time.time()
+
+    def record(self, result):
+        with self.lock:
+            self.results.append(result)
+            done = len(self.results)
+        if result.returnCode == 0:
+            tdLog.success("[%d] worker%d %s passed in %.1fs" % (
+                done, result.worker, result.name(), result.duration))
+        else:
+            tdLog.notice("[%d] worker%d %s failed(%d) in %.1fs, log: %s" % (
+                done, result.worker, result.name(), result.returnCode,
+                result.duration, result.logFile))
+
+    def failures(self):
+        with self.lock:
+            return [r for r in self.results if r.returnCode != 0]
+
+    def summary(self):
+        elapsed = time.time() - self.startTime
+        with self.lock:
+            total = len(self.results)
+            caseTime = sum(r.duration for r in self.results)
+        failed = self.failures()
+        tdLog.printNoPrefix(
+            "total %d case(s), %d passed, %d failed, wall time %.1fs, case time %.1fs"
+            % (total, total - len(failed), len(failed), elapsed, caseTime))
+        for r in failed:
+            tdLog.printNoPrefix("failed: %s (log: %s)" % (r.name(), r.logFile))
+
+
+class TDParallelRunner:
+    """
+    run the cases of a list concurrently, each worker owning a private sim
+    root and port range so its TDDnodes never collides with the others
+    """
+
+    PORT_STRIDE = 200
+
+    def __init__(self, workers, rootPath, basePort=7030):
+        self.workers = workers
+        self.rootPath = os.path.realpath(rootPath)
+        self.basePort = basePort
+        self.collector = TDResultCollector()
+        self.testPy = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+            "test.py")
+
+    def loadCaseList(self, fileName):
+        """
+        accept either a plain list of case files or a fulltest.sh style script,
+        only "test.py -f <case>" lines can be isolated, the rest are skipped
+        """
+        cases = []
+        skipped = 0
+        with open(fileName) as f:
+            for line in f:
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                try:
+                    words = shlex.split(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if len(words) == 1 and words[0].endswith(".py"):
+                    cases.append(["-f", words[0]])
+                    continue
+                scripts = [i for i, w in enumerate(words)
+                           if os.path.basename(w) == "test.py"]
+                if not scripts or "-f" not in words:
+                    skipped += 1
+                    continue
+                cases.append(words[scripts[0] + 1:])
+        if skipped:
+            tdLog.notice("%d line(s) of %s are not test.py cases, skipped"
+                         % (skipped, fileName))
+        return cases
+
+    def workerRoot(self, worker):
+        return os.path.join(self.rootPath, "worker%d" % worker)
+
+    def workerPort(self, worker):
+        return self.basePort + worker * self.PORT_STRIDE
+
+    def runCase(self, worker, args, seq):
+        root = self.workerRoot(worker)
+        os.makedirs(root, exist_ok=True)
+        logFile = os.path.join(root, "case%d.log" % seq)
+        cmd = [sys.executable, self.testPy] + args + [
+            "-p", root, "--port", str(self.workerPort(worker))]
+        startTime = time.time()
+        with open(logFile, "w") as log:
+            log.write("%s\n" % " ".join(cmd))
+            log.flush()
+            returnCode = subprocess.call(
+                cmd,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=os.path.dirname(self.testPy))
+        return TDCaseResult(args, worker, returnCode,
+                            time.time() - startTime, logFile)
+
+    def threadMain(self, worker, caseQueue):
+        while True:
+            try:
+                seq, args = caseQueue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = self.runCase(worker, args, seq)
+            except Exception as e:
+                tdLog.notice("worker%d: %s" % (worker, repr(e)))
+                result = TDCaseResult(args, worker, -1, 0, "")
+            self.collector.record(result)
+
+    def run(self, cases):
+        caseQueue = queue.Queue()
+        for seq, args in enumerate(cases):
+            caseQueue.put((seq, args))
+
+        tdLog.info("run %d case(s) with %d worker(s) under %s" % (
+            len(cases), self.workers, self.rootPath))
+        threads = []
+        for worker in range(self.workers):
+            t = threading.Thread(
+                target=self.threadMain, args=(worker, caseQueue))
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+        self.collector.summary()
+        return len(self.collector.failures())
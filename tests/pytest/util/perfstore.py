@@ -0,0 +1,211 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import platform
+import statistics
+import subprocess
+
+DEFAULT_STORE = os.environ.get(
+    "TD_PERF_STORE", os.path.join(os.path.expanduser("~"), ".taos_perf.sqlite"))
+
+LOWER_IS_BETTER = -1
+HIGHER_IS_BETTER = 1
+
+_SCHEMA = """
+create table if not exists runs (
+    id integer primary key autoincrement,
+    benchmark text not null,
+    params text not null,
+    ts real not null,
+    commit_id text,
+    branch text,
+    build_type text,
+    env text
+);
+create index if not exists runs_benchmark on runs (benchmark, params, id);
+create table if not exists metrics (
+    run_id integer not null references runs (id),
+    name text not null,
+    value real not null,
+    direction integer not null,
+    primary key (run_id, name)
+);
+"""
+
+
+def _gitCommit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def collectEnv():
+    """
+    what the numbers depend on besides the code
+    """
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+class TDPerfRegression:
+    def __init__(self, metric, value, baseline, spread, runs, direction,
+                 change, regressed, improved=False):
+        self.metric = metric
+        self.value = value
+        self.baseline = baseline
+        self.spread = spread
+        self.runs = runs
+        self.direction = direction
+        self.change = change
+        self.regressed = regressed
+        self.improved = improved
+
+    def verdict(self):
+        if self.runs == 0:
+            return "no baseline"
+        if self.regressed:
+            return "REGRESSION"
+        if self.improved:
+            return "better"
+        return "ok"
+
+
+class TDPerfStore:
+    """
+    local sqlite store of benchmark results: one row per run keyed by
+    benchmark name and canonical json parameters, metrics as name/value
+    pairs with the direction that counts as better
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_STORE
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def paramKey(params):
+        return json.dumps(params or {}, sort_keys=True, default=str)
+
+    def record(self, benchmark, params, metrics, commitID=None, branch=None,
+               buildType=None, higherIsBetter=()):
+        """
+        store one run, metrics is {name: value}; metrics named in
+        higherIsBetter are throughputs, all others are times
+        """
+        with self.db:
+            cur = self.db.execute(
+                "insert into runs (benchmark, params, ts, commit_id, branch,"
+                " build_type, env) values (?, ?, ?, ?, ?, ?, ?)",
+                (benchmark, self.paramKey(params), time.time(),
+                 (commitID or "").strip() or _gitCommit(), branch, buildType,
+                 json.dumps(collectEnv(), sort_keys=True)))
+            runID = cur.lastrowid
+            self.db.executemany(
+                "insert into metrics (run_id, name, value, direction)"
+                " values (?, ?, ?, ?)",
+                [(runID, name, float(value),
+                  HIGHER_IS_BETTER if name in higherIsBetter else LOWER_IS_BETTER)
+                 for name, value in metrics.items()])
+        return runID
+
+    def runs(self, benchmark=None, limit=20):
+        sql = "select id, benchmark, params, ts, commit_id, branch, build_type from runs"
+        args = ()
+        if benchmark:
+            sql += " where benchmark = ?"
+            args = (benchmark,)
+        sql += " order by id desc limit ?"
+        return self.db.execute(sql, args + (limit,)).fetchall()
+
+    def latestRun(self, benchmark, params=None):
+        sql = "select id from runs where benchmark = ?"
+        args = (benchmark,)
+        if params is not None:
+            sql += " and params = ?"
+            args += (self.paramKey(params),)
+        row = self.db.execute(sql + " order by id desc limit 1", args).fetchone()
+        return row[0] if row else None
+
+    def compare(self, runID, window=10, threshold=0.05, sigmas=3.0,
+                minRuns=3):
+        """
+        compare every metric of runID with the median of the window runs
+        before it with the same benchmark, parameters, build type and host;
+        a metric regressed when it is worse by more than threshold (relative)
+        and by more than sigmas robust standard deviations (1.4826 * MAD)
+        """
+        benchmark, params, buildType, env = self.db.execute(
+            "select benchmark, params, build_type, env from runs where id = ?",
+            (runID,)).fetchone()
+        host = json.loads(env or "{}").get("host")
+        baseRuns = [
+            row[0] for row in self.db.execute(
+                "select id, env from runs where benchmark = ? and params = ?"
+                " and build_type is ? and id < ? order by id desc",
+                (benchmark, params, buildType, runID))
+            if json.loads(row[1] or "{}").get("host") == host][:window]
+        results = []
+        for name, value, direction in self.db.execute(
+                "select name, value, direction from metrics where run_id = ?"
+                " order by name", (runID,)).fetchall():
+            history = [row[0] for row in self.db.execute(
+                "select value from metrics where name = ? and run_id in (%s)" %
+                ",".join("?" * len(baseRuns)), [name] + baseRuns)] if baseRuns else []
+            if not history:
+                results.append(TDPerfRegression(
+                    name, value, None, None, 0, direction, 0, False))
+                continue
+            baseline = statistics.median(history)
+            spread = 1.4826 * statistics.median(
+                [abs(v - baseline) for v in history])
+            change = (value - baseline) / abs(baseline) if baseline else 0
+            worse = (baseline - value) * direction
+            significant = (len(history) >= minRuns and
+                           abs(change) > threshold and
+                           abs(worse) > sigmas * spread)
+            results.append(TDPerfRegression(
+                name, value, baseline, spread, len(history), direction,
+                change, significant and worse > 0, significant and worse < 0))
+        return results
+
+
+def printComparison(results, out=None):
+    out = out or sys.stdout
+    print("%-28s %14s %14s %12s %9s %5s  %s" % (
+        "metric", "value", "baseline", "spread", "change", "runs", "verdict"),
+        file=out)
+    for r in results:
+        if r.runs == 0:
+            print("%-28s %14.6g %14s %12s %9s %5d  %s" % (
+                r.metric, r.value, "-", "-", "-", 0, r.verdict()), file=out)
+            continue
+        print("%-28s %14.6g %14.6g %12.4g %+8.2f%% %5d  %s" % (
+            r.metric, r.value, r.baseline, r.spread, r.change * 100, r.runs,
+            r.verdict()), file=out)
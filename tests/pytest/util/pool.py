@@ -0,0 +1,142 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import threading
+import contextlib
+import taos
+from util.log import *
+from util.sql import TDSql
+
+
+class TDConnectionPool:
+    """
+    thread safe pool of taos connections; every thread may also ask for its
+    own TDSql handle so concurrent cases keep the usual assertion api
+    """
+
+    def __init__(self):
+        self.host = "127.0.0.1"
+        self.config = None
+        self.size = 8
+        self.lock = threading.Lock()
+        self.idle = []
+        self.generation = 0
+        self.local = threading.local()
+
+    def init(self, host, config, size=8):
+        self.host = host
+        self.config = config
+        self.size = size
+
+    def connect(self):
+        if self.config is None:
+            return taos.connect(host=self.host)
+        return taos.connect(host=self.host, config=self.config)
+
+    def healthCheck(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("select server_status()")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def closeQuietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """
+        an idle connection that still answers, or a new one
+        """
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                conn, generation = self.idle.pop()
+            if generation == self.generation and self.healthCheck(conn):
+                return conn
+            self.closeQuietly(conn)
+        return self.connect()
+
+    def release(self, conn):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((conn, self.generation))
+                return
+        self.closeQuietly(conn)
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def getSql(self, logSql=False):
+        """
+        the TDSql of the calling thread, bound to a connection the thread
+        keeps until reconnect() or closeThread()
+        """
+        handle = getattr(self.local, "handle", None)
+        if handle is not None and handle[0] != self.generation:
+            self.closeThread()
+            handle = None
+        if handle is None:
+            conn = self.acquire()
+            sql = TDSql()
+            sql.init(conn.cursor(), logSql)
+            handle = (self.generation, conn, sql)
+            self.local.handle = handle
+        return handle[2]
+
+    def closeThread(self):
+        handle = getattr(self.local, "handle", None)
+        if handle is None:
+            return
+        self.local.handle = None
+        generation, conn, sql = handle
+        try:
+            sql.close()
+        except Exception:
+            pass
+        if generation == self.generation:
+            self.release(conn)
+        else:
+            self.closeQuietly(conn)
+
+    def reconnect(self):
+        """
+        invalidate every connection after taosd restarted, idle ones are
+        closed now and thread handles reconnect on their next getSql()
+        """
+        with self.lock:
+            self.generation += 1
+            idle = self.idle
+            self.idle = []
+        for conn, generation in idle:
+            self.closeQuietly(conn)
+        tdLog.debug("connection pool reconnects, generation %d" %
+                    self.generation)
+
+    def closeAll(self):
+        self.closeThread()
+        self.reconnect()
+
+
+tdPool = TDConnectionPool()
@@ -0,0 +1,104 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import socket
+
+
+def waitUntil(predicate, timeout, minDelay=0.001, maxDelay=0.1):
+    """
+    poll predicate with exponential backoff, returns True as soon as it
+    holds or False once timeout seconds elapsed
+    """
+    deadline = time.time() + timeout
+    delay = minDelay
+    while True:
+        if predicate():
+            return True
+        remain = deadline - time.time()
+        if remain <= 0:
+            return False
+        time.sleep(min(delay, remain))
+        delay = min(delay * 2, maxDelay)
+
+
+def probePort(host, port):
+    try:
+        sock = socket.create_connection((host, port), timeout=0.5)
+    except OSError:
+        return False
+    sock.close()
+    return True
+
+
+def probeDnodes(host, port, cfgDir):
+    """
+    ask the cluster through "show dnodes" whether the dnode at port is ready
+    """
+    import taos
+    try:
+        conn = taos.connect(host=host, port=port, config=cfgDir)
+    except Exception:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("show dnodes")
+        for row in cursor.fetchall():
+            if str(row[1]).endswith(":%d" % port) and row[4] == "ready":
+                return True
+        return False
+    except Exception:
+        return False
+    finally:
+        conn.close()
+
+
+class TDLogWatcher:
+    """
+    incremental reader looking for a key in a growing log file, only bytes
+    appended after construction are scanned
+    """
+
+    def __init__(self, logFile, key):
+        self.logFile = logFile
+        self.key = bytes(key, encoding="utf8")
+        self.tail = b""
+        try:
+            self.offset = os.path.getsize(logFile)
+        except OSError:
+            self.offset = 0
+
+    def exists(self):
+        return os.path.exists(self.logFile)
+
+    def found(self):
+        try:
+            f = open(self.logFile, "rb")
+        except OSError:
+            return False
+        with f:
+            if os.fstat(f.fileno()).st_size < self.offset:
+                # truncated or recreated by a fresh deploy
+                self.offset = 0
+                self.tail = b""
+            f.seek(self.offset)
+            data = f.read()
+        if not data:
+            return False
+        self.offset += len(data)
+        buf = self.tail + data
+        if self.key in buf:
+            return True
+        self.tail = buf[-(len(self.key) - 1):]
+        return False
@@ -0,0 +1,290 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import time
+import base64
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TDRestMetrics:
+    """
+    thread safe latency record of every request sent by a client
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, latency, ok=True):
+        with self.lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+    def percentile(self, p):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return 0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def summary(self):
+        with self.lock:
+            count = len(self.latencies)
+            total = sum(self.latencies)
+            errors = self.errors
+        return {
+            "requests": count,
+            "errors": errors,
+            "avg_ms": total * 1000 / count if count else 0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+        }
+
+
+class TDRestClient:
+    """
+    keep-alive REST client for taosAdapter: one pooled session, the auth
+    header built once and latency recorded per request
+    """
+
+    DATA_KEY = re.compile(r'"data"\s*:\s*\[')
+
+    def __init__(self, host="127.0.0.1", port=6041, user="root",
+                 password="taosdata", poolSize=16):
+        self.baseUrl = "http://%s:%d" % (host, port)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+        self.session.mount("http://", adapter)
+        token = base64.b64encode(("%s:%s" % (user, password)).encode("utf-8"))
+        self.session.headers.update(
+            {"Authorization": "Basic %s" % token.decode("ascii")})
+        self.poolSize = poolSize
+        self.metrics = TDRestMetrics()
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.baseUrl + path
+
+    def post(self, path, data, stream=False):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        startTime = time.perf_counter()
+        ok = False
+        try:
+            res = self.session.post(self.url(path), data, stream=stream)
+            ok = res.status_code < 400
+            return res
+        finally:
+            self.metrics.record(time.perf_counter() - startTime, ok)
+
+    def sqlUrl(self, db=None):
+        if db:
+            return "/rest/sql/%s" % db
+        return "/rest/sql"
+
+    def sql(self, sql, db=None):
+        """
+        run one statement, returns the decoded json body
+        """
+        return self.post(self.sqlUrl(db), sql).json()
+
+    def iterRows(self, sql, db=None, chunkSize=65536):
+        """
+        decode the "data" array of a response row by row while it arrives,
+        so a large result never has to be held as one json document
+        """
+        res = self.post(self.sqlUrl(db), sql, stream=True)
+        res.encoding = res.encoding or "utf-8"
+        decoder = json.JSONDecoder()
+        buf = ""
+        chunks = res.iter_content(chunk_size=chunkSize, decode_unicode=True)
+        match = None
+        for chunk in chunks:
+            buf += chunk
+            match = self.DATA_KEY.search(buf)
+            if match:
+                break
+        if match is None:
+            body = json.loads(buf)
+            raise RuntimeError("REST error %s: %s" %
+                               (body.get("code"), body.get("desc")))
+        buf = buf[match.end():]
+        pos = 0
+        while True:
+            while True:
+                # skip separators, refilling the buffer when it runs dry
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf):
+                    break
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                buf, pos = chunk, 0
+            if buf[pos] == "]":
+                return
+            try:
+                row, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    raise
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield row
+            pos = end
+
+    def submitMany(self, sqls, db=None, concurrency=None):
+        """
+        send statements concurrently over the pooled connections, results
+        come back in the order of sqls
+        """
+        with ThreadPoolExecutor(max_workers=concurrency or self.poolSize) as pool:
+            return list(pool.map(lambda sql: self.sql(sql, db), sqls))
+
+    async def sqlAsync(self, sql, db=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sql, sql, db)
+
+    def close(self):
+        self.session.close()
+
+
+class TDAsyncRestClient:
+    """
+    asyncio REST client for taosAdapter: thousands of coroutines share a
+    bounded pool of keep-alive HTTP/1.1 connections, speaking just the
+    subset of http the adapter needs
+    """
+
+    def __init__(self, host="127.0.0.1", port=6041, user="root",
+                 password="taosdata", poolSize=64, timeout=60):
+        self.host = host
+        self.port = port
+        token = base64.b64encode(("%s:%s" % (user, password)).encode("utf-8"))
+        self.header = ("Host: %s:%d\r\nAuthorization: Basic %s\r\n"
+                       "Connection: keep-alive\r\n" %
+                       (host, port, token.decode("ascii")))
+        self.poolSize = poolSize
+        self.timeout = timeout
+        self.idle = []
+        self.opened = 0
+        self.available = None
+        self.metrics = TDRestMetrics()
+
+    async def acquire(self):
+        if self.available is None:
+            self.available = asyncio.Semaphore(self.poolSize)
+        await self.available.acquire()
+        if self.idle:
+            return self.idle.pop(), True
+        try:
+            conn = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self.available.release()
+            raise
+        self.opened += 1
+        return conn, False
+
+    def release(self, conn, reuse=True):
+        if reuse:
+            self.idle.append(conn)
+        else:
+            conn[1].close()
+        self.available.release()
+
+    async def readBody(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        return await reader.readexactly(int(headers.get("content-length", 0)))
+
+    async def exchange(self, conn, path, body):
+        reader, writer = conn
+        writer.write(("POST %s HTTP/1.1\r\n%sContent-Length: %d\r\n\r\n" %
+                      (path, self.header, len(body))).encode("ascii") + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, value = line.decode("latin-1").split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        data = await self.readBody(reader, headers)
+        return status, headers, data
+
+    async def post(self, path, data):
+        """
+        returns (status, body bytes); an idle connection the server has
+        closed meanwhile is dropped and the request retried on another one
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        startTime = time.perf_counter()
+        ok = False
+        try:
+            while True:
+                conn, reused = await self.acquire()
+                try:
+                    status, headers, body = await asyncio.wait_for(
+                        self.exchange(conn, path, data), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError,
+                        IndexError, ValueError):
+                    self.release(conn, False)
+                    if not reused:
+                        raise
+                    continue
+                except BaseException:
+                    self.release(conn, False)
+                    raise
+                self.release(conn, headers.get("connection", "").lower() != "close")
+                ok = status < 400
+                return status, body
+        finally:
+            self.metrics.record(time.perf_counter() - startTime, ok)
+
+    async def sql(self, sql, db=None):
+        """
+        run one statement with the database qualified in the url, returns
+        the decoded json body
+        """
+        path = "/rest/sql/%s" % db if db else "/rest/sql"
+        status, body = await self.post(path, sql)
+        return json.loads(body)
+
+    async def close(self):
+        idle = self.idle
+        self.idle = []
+        for reader, writer in idle:
+            writer.close()
+
+
+tdRest = TDRestClient()
@@ -0,0 +1,246 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import time
+import queue
+import string
+import threading
+import numpy as np
+from util.types import TDSmlProtocolType, TDSmlTimestampType
+
+
+class TDSmlGenerator:
+    """
+    renders schemaless rows in bulk: every column of a batch is drawn as a
+    numpy array and each row is rendered by one %-format of a template
+    built once, in influxdb line, opentsdb telnet or opentsdb json protocol
+    """
+
+    def __init__(self, protocol=TDSmlProtocolType.LINE, stbName="stb",
+                 intCount=4, doubleCount=0, binaryCount=0, binaryLen=5,
+                 seed=None):
+        self.protocol = protocol
+        self.stbName = stbName
+        self.intCount = intCount
+        self.doubleCount = doubleCount
+        self.binaryCount = binaryCount
+        self.binaryLen = binaryLen
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        letters = np.array(list(string.ascii_lowercase))
+        self.pool = np.array(
+            ["".join(w) for w in self.rng.choice(letters, (1024, binaryLen))],
+            dtype=object)
+        self.template = self.buildTemplate()
+
+    def clone(self, seed):
+        """
+        same layout with its own random stream, one per producer thread
+        """
+        return TDSmlGenerator(self.protocol, self.stbName, self.intCount,
+                              self.doubleCount, self.binaryCount,
+                              self.binaryLen, seed)
+
+    def buildTemplate(self):
+        if self.protocol == TDSmlProtocolType.TELNET:
+            return self.stbName + " %d %d %s"
+        if self.protocol == TDSmlProtocolType.JSON:
+            return ('{"metric":"' + self.stbName +
+                    '","timestamp":%d,"value":%d,"tags":{%s}}')
+        cols = ["c%d=%%di32" % i for i in range(self.intCount)]
+        cols += ["c%d=%%.2ff64" % (i + self.intCount)
+                 for i in range(self.doubleCount)]
+        cols += ['c%d="%%s"' % (i + self.intCount + self.doubleCount)
+                 for i in range(self.binaryCount)]
+        return self.stbName + ",%s " + ",".join(cols) + " %d"
+
+    def tableTags(self, tableId):
+        t0 = tableId % 65536
+        t1 = "tb%d" % tableId
+        if self.protocol == TDSmlProtocolType.TELNET:
+            return "id=sub_%d t0=%di32 t1=%s" % (tableId, t0, t1)
+        if self.protocol == TDSmlProtocolType.JSON:
+            return '"id":"sub_%d","t0":%d,"t1":"%s"' % (tableId, t0, t1)
+        return 'id="sub_%d",t0=%di32,t1="%s"' % (tableId, t0, t1)
+
+    def columns(self, rows, tableIds, rowsPerTable, startTs, step):
+        """
+        object matrix of rows x template fields, filled column by column
+        """
+        tags = [self.tableTags(i) for i in tableIds]
+        ts = startTs - np.arange(rowsPerTable, dtype=np.int64) * step
+        if self.protocol == TDSmlProtocolType.LINE:
+            width = 2 + self.intCount + self.doubleCount + self.binaryCount
+            matrix = np.empty((rows, width), dtype=object)
+            matrix[:, 0] = np.repeat(np.array(tags, dtype=object), rowsPerTable)
+            pos = 1
+            if self.intCount:
+                matrix[:, pos:pos + self.intCount] = self.rng.integers(
+                    0, 256, (rows, self.intCount))
+                pos += self.intCount
+            if self.doubleCount:
+                matrix[:, pos:pos + self.doubleCount] = self.rng.uniform(
+                    1, 255, (rows, self.doubleCount))
+                pos += self.doubleCount
+            if self.binaryCount:
+                matrix[:, pos:pos + self.binaryCount] = self.pool[
+                    self.rng.integers(0, len(self.pool), (rows, self.binaryCount))]
+            matrix[:, -1] = np.tile(ts, len(tableIds))
+        else:
+            matrix = np.empty((rows, 3), dtype=object)
+            matrix[:, 0] = np.tile(ts, len(tableIds))
+            matrix[:, 1] = self.rng.integers(0, 256, rows)
+            matrix[:, 2] = np.repeat(np.array(tags, dtype=object), rowsPerTable)
+        return matrix
+
+    def render(self, tableIds, rowsPerTable, startTs, step=1):
+        """
+        lines for rowsPerTable rows of each table, timestamps in ms counting
+        down from startTs; json is rendered as a single payload
+        """
+        rows = len(tableIds) * rowsPerTable
+        if rows == 0:
+            return []
+        template = self.template
+        lines = [template % tuple(r) for r in
+                 self.columns(rows, tableIds, rowsPerTable, startTs, step).tolist()]
+        if self.protocol == TDSmlProtocolType.JSON:
+            return ["[" + ",".join(lines) + "]"]
+        return lines
+
+    def precision(self):
+        if self.protocol == TDSmlProtocolType.LINE:
+            return TDSmlTimestampType.MILLI_SECOND
+        return TDSmlTimestampType.NOT_CONFIGURED
+
+
+class TDSmlBenchResult:
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.elapsedNs = 0
+        self.renderNs = 0
+        self.latencies = []
+        self.errors = []
+
+    def rowsPerSecond(self):
+        return self.rows * 10**9 / self.elapsedNs if self.elapsedNs else 0
+
+    def percentileMs(self, p):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 0
+        return latencies[min(len(latencies) - 1,
+                             int(len(latencies) * p / 100))] / 10**6
+
+    def __str__(self):
+        return ("%d rows in %d batches, %.6fs, %.0f rows/s, render %.6fs, "
+                "batch p50 %.3fms p99 %.3fms, %d errors" % (
+                    self.rows, self.batches, self.elapsedNs / 10**9,
+                    self.rowsPerSecond(), self.renderNs / 10**9,
+                    self.percentileMs(50), self.percentileMs(99),
+                    len(self.errors)))
+
+
+class TDSmlPipeline:
+    """
+    producer threads render batches into a bounded queue while consumer
+    threads, each on its own connection, hand them to schemaless_insert;
+    the insert releases the gil so rendering overlaps with the server
+    """
+
+    def __init__(self, connect, generator, producers=2, consumers=4,
+                 queueDepth=8):
+        self.connect = connect
+        self.generator = generator
+        self.producers = producers
+        self.consumers = consumers
+        self.queueDepth = queueDepth
+
+    def produce(self, gen, chunks, lock, batches, rowsPerTable, startTs,
+                result):
+        while True:
+            with lock:
+                tableIds = next(chunks, None)
+            if tableIds is None:
+                return
+            begin = time.perf_counter_ns()
+            lines = gen.render(tableIds, rowsPerTable, startTs)
+            with lock:
+                result.renderNs += time.perf_counter_ns() - begin
+            batches.put((lines, len(tableIds) * rowsPerTable))
+
+    def consume(self, batches, lock, result):
+        protocol = self.generator.protocol.value
+        precision = self.generator.precision().value
+        try:
+            conn = self.connect()
+        except Exception as e:
+            # keep draining so the producers never block on a full queue
+            conn = None
+            with lock:
+                result.errors.append(e)
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if conn is None:
+                    continue
+                lines, rows = batch
+                begin = time.perf_counter_ns()
+                try:
+                    conn.schemaless_insert(lines, protocol, precision)
+                except Exception as e:
+                    with lock:
+                        result.errors.append(e)
+                    continue
+                latency = time.perf_counter_ns() - begin
+                with lock:
+                    result.rows += rows
+                    result.batches += 1
+                    result.latencies.append(latency)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def run(self, tableIds, rowsPerTable, tablesPerBatch, startTs):
+        """
+        insert rowsPerTable rows into every table, tablesPerBatch tables per
+        schemaless_insert call, returns a TDSmlBenchResult
+        """
+        result = TDSmlBenchResult()
+        lock = threading.Lock()
+        batches = queue.Queue(self.queueDepth)
+        chunks = iter([tableIds[i:i + tablesPerBatch]
+                       for i in range(0, len(tableIds), tablesPerBatch)])
+        begin = time.perf_counter_ns()
+        consumers = [threading.Thread(target=self.consume,
+                                      args=(batches, lock, result))
+                     for i in range(self.consumers)]
+        seeds = np.random.SeedSequence(self.generator.seed).spawn(self.producers)
+        producers = [threading.Thread(target=self.produce,
+                                      args=(self.generator.clone(seed), chunks,
+                                            lock, batches, rowsPerTable,
+                                            startTs, result))
+                     for seed in seeds]
+        for t in consumers + producers:
+            t.start()
+        for t in producers:
+            t.join()
+        for t in consumers:
+            batches.put(None)
+        for t in consumers:
+            t.join()
+        result.elapsedNs = time.perf_counter_ns() - begin
+        return result
@@ -16,10 +16,27 @@ import os
 import time
 import datetime
 import inspect
+import collections
 import psutil
 import shutil
 import pandas as pd
 from util.log import *
+from util.columnar import TDColumnarResult
+from util.stream import streamQuery
+from util.expectations import *
+
+
+_CallerInfo = collections.namedtuple("_CallerInfo", ["filename", "lineno"])
+
+
+def _getCaller(depth):
+    """
+    location of the frame depth levels above the calling method, read
+    straight from the frame instead of inspect.stack() which loads the
+    source of every frame; only meant for building failure messages
+    """
+    frame = sys._getframe(depth + 1)
+    return _CallerInfo(frame.f_code.co_filename, frame.f_lineno)
 
 
 def _parse_datetime(timestr):
@@ -38,12 +55,14 @@ class TDSql:
         self.queryRows = 0
         self.queryCols = 0
         self.affectedRows = 0
+        self.queryDescription = None
+        self._columnar = None
 
     def init(self, cursor, log=False):
         self.cursor = cursor
 
         if log:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             self.cursor.log(caller.filename + ".sql")
 
     def close(self):
@@ -67,7 +86,7 @@ class TDSql:
         except BaseException:
             expectErrNotOccured = False
         if expectErrNotOccured:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             tdLog.exit(
                 "%s(%d) failed: sql:%s, expect error not occured"
                 % (caller.filename, caller.lineno, sql)
@@ -76,17 +95,23 @@ class TDSql:
             self.queryRows = 0
             self.queryCols = 0
             self.queryResult = None
-            tdLog.info("sql:%s, expect error occured" % (sql))
+            tdLog.info("sql:%s, expect error occured", sql)
 
     def query(self, sql, row_tag=None):
         self.sql = sql
         try:
+            startTime = time.time()
             self.cursor.execute(sql)
             self.queryResult = self.cursor.fetchall()
             self.queryRows = len(self.queryResult)
             self.queryCols = len(self.cursor.description)
+            self.queryDescription = self.cursor.description
+            duration = time.time() - startTime
+            tdLog.trace("sql:%s, %d rows in %.3fms", sql, self.queryRows,
+                        duration * 1000, sql=sql, rows=self.queryRows,
+                        duration=duration)
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -94,6 +119,28 @@ class TDSql:
             return self.queryResult
         return self.queryRows
 
+    def queryStream(self, sql, checksum=False):
+        """
+        run sql like query() but only count (and optionally checksum) the
+        rows block by block, queryResult stays None; returns the
+        TDStreamStats with time to first and last row
+        """
+        self.sql = sql
+        try:
+            stats = streamQuery(self.cursor, sql, checksum)
+            self.queryResult = None
+            self.queryRows = stats.rows
+            self.queryCols = len(self.cursor.description)
+            self.queryDescription = self.cursor.description
+            tdLog.trace("sql:%s, %s", sql, stats, sql=sql, rows=stats.rows,
+                        duration=stats.lastRowTime)
+        except Exception as e:
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, sql, repr(e))
+            tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
+            raise Exception(repr(e))
+        return stats
+
     def getVariable(self, search_attr):
         """
         get variable of search_attr access "show variables"
@@ -105,7 +152,7 @@ class TDSql:
                 if param[0] == search_attr:
                     return param[1], param_list
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -121,7 +168,7 @@ class TDSql:
                 col_name_list.append(query_col[0])
                 col_type_list.append(query_col[1])
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -131,8 +178,8 @@ class TDSql:
 
     def waitedQuery(self, sql, expectRows, timeout):
         tdLog.info(
-            "sql: %s, try to retrieve %d rows in %d seconds"
-            % (sql, expectRows, timeout)
+            "sql: %s, try to retrieve %d rows in %d seconds",
+            sql, expectRows, timeout,
         )
         self.sql = sql
         try:
@@ -141,15 +188,16 @@ class TDSql:
                 self.queryResult = self.cursor.fetchall()
                 self.queryRows = len(self.queryResult)
                 self.queryCols = len(self.cursor.description)
+                self.queryDescription = self.cursor.description
                 tdLog.info(
-                    "sql: %s, try to retrieve %d rows,get %d rows"
-                    % (sql, expectRows, self.queryRows)
+                    "sql: %s, try to retrieve %d rows,get %d rows",
+                    sql, expectRows, self.queryRows,
                 )
                 if self.queryRows >= expectRows:
                     return (self.queryRows, i)
                 time.sleep(1)
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -158,11 +206,11 @@ class TDSql:
     def checkRows(self, expectRows):
         if self.queryRows == expectRows:
             tdLog.info(
-                "sql:%s, queryRows:%d == expect:%d"
-                % (self.sql, self.queryRows, expectRows)
+                "sql:%s, queryRows:%d == expect:%d",
+                self.sql, self.queryRows, expectRows,
             )
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (
                 caller.filename,
                 caller.lineno,
@@ -175,11 +223,11 @@ class TDSql:
     def checkCols(self, expectCols):
         if self.queryCols == expectCols:
             tdLog.info(
-                "sql:%s, queryCols:%d == expect:%d"
-                % (self.sql, self.queryCols, expectCols)
+                "sql:%s, queryCols:%d == expect:%d",
+                self.sql, self.queryCols, expectCols,
             )
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (
                 caller.filename,
                 caller.lineno,
@@ -190,19 +238,22 @@ class TDSql:
             tdLog.exit("%s(%d) failed: sql:%s, queryCols:%d != expect:%d" % args)
 
     def checkRowCol(self, row, col):
-        caller = inspect.getframeinfo(inspect.stack()[2][0])
         if row < 0:
+            caller = _getCaller(2)
             args = (caller.filename, caller.lineno, self.sql, row)
             tdLog.exit("%s(%d) failed: sql:%s, row:%d is smaller than zero" % args)
         if col < 0:
+            caller = _getCaller(2)
             args = (caller.filename, caller.lineno, self.sql, row)
             tdLog.exit("%s(%d) failed: sql:%s, col:%d is smaller than zero" % args)
         if row > self.queryRows:
+            caller = _getCaller(2)
             args = (caller.filename, caller.lineno, self.sql, row, self.queryRows)
             tdLog.exit(
                 "%s(%d) failed: sql:%s, row:%d is larger than queryRows:%d" % args
             )
         if col > self.queryCols:
+            caller = _getCaller(2)
             args = (caller.filename, caller.lineno, self.sql, col, self.queryCols)
             tdLog.exit(
                 "%s(%d) failed: sql:%s, col:%d is larger than queryCols:%d" % args
@@ -222,35 +273,35 @@ class TDSql:
                         data
                     ):
                         tdLog.info(
-                            "sql:%s, row:%d col:%d data:%d == expect:%s"
-                            % (self.sql, row, col, self.queryResult[row][col], data)
+                            "sql:%s, row:%d col:%d data:%d == expect:%s",
+                            self.sql, row, col, self.queryResult[row][col], data,
                         )
                 elif not isinstance(data, datetime.datetime) and len(data) >= 28:
                     if pd.to_datetime(self.queryResult[row][col]) == pd.to_datetime(
                         data
                     ):
                         tdLog.info(
-                            "sql:%s, row:%d col:%d data:%d == expect:%s"
-                            % (self.sql, row, col, self.queryResult[row][col], data)
+                            "sql:%s, row:%d col:%d data:%d == expect:%s",
+                            self.sql, row, col, self.queryResult[row][col], data,
                         )
                 elif isinstance(data, datetime.datetime):
                     if self.queryResult[row][col] == data:
                         tdLog.info(
-                            "sql:%s, row:%d col:%d data:%s == expect:%s"
-                            % (self.sql, row, col, self.queryResult[row][col], data)
+                            "sql:%s, row:%d col:%d data:%s == expect:%s",
+                            self.sql, row, col, self.queryResult[row][col], data,
                         )
                 else:
                     if self.queryResult[row][col] == _parse_datetime(data):
                         tdLog.info(
-                            "sql:%s, row:%d col:%d data:%s == expect:%s"
-                            % (self.sql, row, col, self.queryResult[row][col], data)
+                            "sql:%s, row:%d col:%d data:%s == expect:%s",
+                            self.sql, row, col, self.queryResult[row][col], data,
                         )
                 return
 
             if str(self.queryResult[row][col]) == str(data):
                 tdLog.info(
-                    "sql:%s, row:%d col:%d data:%s == expect:%s"
-                    % (self.sql, row, col, self.queryResult[row][col], data)
+                    "sql:%s, row:%d col:%d data:%s == expect:%s",
+                    self.sql, row, col, self.queryResult[row][col], data,
                 )
                 return
             elif (
@@ -258,12 +309,12 @@ class TDSql:
                 and abs(self.queryResult[row][col] - data) <= 0.000001
             ):
                 tdLog.info(
-                    "sql:%s, row:%d col:%d data:%f == expect:%f"
-                    % (self.sql, row, col, self.queryResult[row][col], data)
+                    "sql:%s, row:%d col:%d data:%f == expect:%f",
+                    self.sql, row, col, self.queryResult[row][col], data,
                 )
                 return
             else:
-                caller = inspect.getframeinfo(inspect.stack()[1][0])
+                caller = _getCaller(1)
                 args = (
                     caller.filename,
                     caller.lineno,
@@ -279,28 +330,28 @@ class TDSql:
 
         if data is None:
             tdLog.info(
-                "sql:%s, row:%d col:%d data:%s == expect:%s"
-                % (self.sql, row, col, self.queryResult[row][col], data)
+                "sql:%s, row:%d col:%d data:%s == expect:%s",
+                self.sql, row, col, self.queryResult[row][col], data,
             )
         elif isinstance(data, str):
             tdLog.info(
-                "sql:%s, row:%d col:%d data:%s == expect:%s"
-                % (self.sql, row, col, self.queryResult[row][col], data)
+                "sql:%s, row:%d col:%d data:%s == expect:%s",
+                self.sql, row, col, self.queryResult[row][col], data,
             )
         elif isinstance(data, datetime.date):
             tdLog.info(
-                "sql:%s, row:%d col:%d data:%s == expect:%s"
-                % (self.sql, row, col, self.queryResult[row][col], data)
+                "sql:%s, row:%d col:%d data:%s == expect:%s",
+                self.sql, row, col, self.queryResult[row][col], data,
             )
         elif isinstance(data, float):
             tdLog.info(
-                "sql:%s, row:%d col:%d data:%s == expect:%s"
-                % (self.sql, row, col, self.queryResult[row][col], data)
+                "sql:%s, row:%d col:%d data:%s == expect:%s",
+                self.sql, row, col, self.queryResult[row][col], data,
             )
         else:
             tdLog.info(
-                "sql:%s, row:%d col:%d data:%s == expect:%d"
-                % (self.sql, row, col, self.queryResult[row][col], data)
+                "sql:%s, row:%d col:%d data:%s == expect:%d",
+                self.sql, row, col, self.queryResult[row][col], data,
             )
 
     def checkDeviaRation(self, row, col, data, deviation=0.001):
@@ -308,7 +359,7 @@ class TDSql:
         if data is None:
             self.checkData(row, col, None)
             return
-        caller = inspect.getframeinfo(inspect.stack()[1][0])
+        caller = _getCaller(1)
         if data is not None and len(self.queryResult) == 0:
             tdLog.exit(
                 f"{caller.filename}({caller.lineno}) failed: sql:{self.sql}, data:{data}, "
@@ -368,13 +419,131 @@ class TDSql:
         self.checkRowCol(row, col)
         return self.queryResult[row][col]
 
+    def getColumnar(self):
+        """
+        columnar view of the last query, built on first use
+        """
+        if self._columnar is None or self._columnar[0] is not self.queryResult:
+            self._columnar = (self.queryResult, TDColumnarResult(
+                self.queryResult, self.queryDescription))
+        return self._columnar[1]
+
+    def checkColumn(self, col, expected, rtol=0):
+        """
+        check a whole column at once, None in expected stands for NULL and
+        floats are equal within rtol or the checkData tolerance
+        """
+        result = self.getColumnar()
+        if col < 0 or col >= self.queryCols or len(expected) != self.queryRows:
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, self.sql, col,
+                    len(expected), self.queryCols, self.queryRows)
+            tdLog.exit("%s(%d) failed: sql:%s, col:%d with %d expected rows "
+                       "out of result shape cols:%d rows:%d" % args)
+        try:
+            expectValues, expectNulls = TDColumnarResult.fromExpected(
+                expected, result.values[col])
+        except ValueError as e:
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, self.sql, col, e)
+            tdLog.exit("%s(%d) failed: sql:%s col:%d %s" % args)
+        bad = TDColumnarResult.mismatches(
+            result.values[col], result.nulls[col], expectValues, expectNulls,
+            rtol, 0.000001)
+        if len(bad) > 0:
+            caller = _getCaller(1)
+            diffs = ", ".join("row:%d data:%s != expect:%s" % (
+                row, self.queryResult[row][col], expected[row]) for row in bad[:10])
+            args = (caller.filename, caller.lineno, self.sql, col, len(bad), diffs)
+            tdLog.exit("%s(%d) failed: sql:%s col:%d %d mismatch(es): %s" % args)
+        tdLog.info(
+            "sql:%s, col:%d all %d rows == expect",
+            self.sql, col, self.queryRows,
+        )
+
+    def checkResultEquals(self, other_sql, rtol=0):
+        """
+        check the result of the last query equals the one of other_sql,
+        cell by cell with NULLs only matching NULLs
+        """
+        result = self.getColumnar()
+        try:
+            self.cursor.execute(other_sql)
+            other = TDColumnarResult(self.cursor.fetchall(), self.cursor.description)
+        except Exception as e:
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, other_sql, repr(e))
+            tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
+            raise Exception(repr(e))
+        if (result.rows, len(result.values)) != (other.rows, len(other.values)):
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, self.sql, result.rows,
+                    len(result.values), other_sql, other.rows, len(other.values))
+            tdLog.exit("%s(%d) failed: sql:%s rows:%d cols:%d != "
+                       "sql:%s rows:%d cols:%d" % args)
+        diffs = []
+        for col in range(len(result.values)):
+            bad = TDColumnarResult.mismatches(
+                result.values[col], result.nulls[col],
+                other.values[col], other.nulls[col], rtol, 0.000001)
+            diffs.extend((row, col) for row in bad)
+        if diffs:
+            caller = _getCaller(1)
+            detail = ", ".join("row:%d col:%d data:%s != %s" % (
+                row, col, self.queryResult[row][col],
+                other.values[col][row] if not other.nulls[col][row] else None)
+                for row, col in diffs[:10])
+            args = (caller.filename, caller.lineno, self.sql, other_sql,
+                    len(diffs), detail)
+            tdLog.exit("%s(%d) failed: sql:%s != sql:%s, %d mismatch(es): %s" % args)
+        tdLog.info("sql:%s, %d rows == sql:%s", self.sql, result.rows, other_sql)
+
+    def runExpectations(self, table):
+        """
+        run every sql of an expectation table back to back without per cell
+        logging, then compare each result in bulk and report all mismatches
+        of the table at once
+        """
+        expectations = [TDExpectation.parse(entry) for entry in table]
+        results = []
+        for expectation in expectations:
+            self.sql = expectation.sql
+            try:
+                self.cursor.execute(expectation.sql)
+                results.append((self.cursor.fetchall(), self.cursor.description))
+            except Exception as e:
+                caller = _getCaller(1)
+                args = (caller.filename, caller.lineno, expectation.sql, repr(e))
+                tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
+                raise Exception(repr(e))
+
+        failed = 0
+        for expectation, (rows, description) in zip(expectations, results):
+            diffs = expectation.compare(rows, description, 0.000001)
+            if not diffs:
+                continue
+            failed += 1
+            for row, col, data, expect in diffs[:10]:
+                tdLog.notice(
+                    "sql:%s row:%d col:%d data:%s != expect:%s",
+                    expectation.sql, row, col, data, expect,
+                )
+            if len(diffs) > 10:
+                tdLog.notice("sql:%s %d more mismatch(es)",
+                             expectation.sql, len(diffs) - 10)
+        if failed:
+            caller = _getCaller(1)
+            args = (caller.filename, caller.lineno, failed, len(expectations))
+            tdLog.exit("%s(%d) failed: %d of %d expectation(s) mismatched" % args)
+        tdLog.info("%d expectation(s) passed", len(expectations))
+
     def getResult(self, sql):
         self.sql = sql
         try:
             self.cursor.execute(sql)
             self.queryResult = self.cursor.fetchall()
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -391,9 +560,13 @@ class TDSql:
     def execute(self, sql):
         self.sql = sql
         try:
+            startTime = time.time()
             self.affectedRows = self.cursor.execute(sql)
+            duration = time.time() - startTime
+            tdLog.trace("sql:%s, executed in %.3fms", sql, duration * 1000,
+                        sql=sql, duration=duration)
         except Exception as e:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, sql, repr(e))
             tdLog.notice("%s(%d) failed: sql:%s, %s" % args)
             raise Exception(repr(e))
@@ -401,7 +574,7 @@ class TDSql:
 
     def checkAffectedRows(self, expectAffectedRows):
         if self.affectedRows != expectAffectedRows:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (
                 caller.filename,
                 caller.lineno,
@@ -412,18 +585,18 @@ class TDSql:
             tdLog.exit("%s(%d) failed: sql:%s, affectedRows:%d != expect:%d" % args)
 
         tdLog.info(
-            "sql:%s, affectedRows:%d == expect:%d"
-            % (self.sql, self.affectedRows, expectAffectedRows)
+            "sql:%s, affectedRows:%d == expect:%d",
+            self.sql, self.affectedRows, expectAffectedRows,
         )
 
     def checkColNameList(self, col_name_list, expect_col_name_list):
         if col_name_list == expect_col_name_list:
             tdLog.info(
-                "sql:%s, col_name_list:%s == expect_col_name_list:%s"
-                % (self.sql, col_name_list, expect_col_name_list)
+                "sql:%s, col_name_list:%s == expect_col_name_list:%s",
+                self.sql, col_name_list, expect_col_name_list,
             )
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (
                 caller.filename,
                 caller.lineno,
@@ -438,25 +611,25 @@ class TDSql:
 
     def checkEqual(self, elm, expect_elm):
         if elm == expect_elm:
-            tdLog.info("sql:%s, elm:%s == expect_elm:%s" % (self.sql, elm, expect_elm))
+            tdLog.info("sql:%s, elm:%s == expect_elm:%s", self.sql, elm, expect_elm)
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, self.sql, elm, expect_elm)
             tdLog.exit("%s(%d) failed: sql:%s, elm:%s != expect_elm:%s" % args)
 
     def checkNotEqual(self, elm, expect_elm):
         if elm != expect_elm:
-            tdLog.info("sql:%s, elm:%s != expect_elm:%s" % (self.sql, elm, expect_elm))
+            tdLog.info("sql:%s, elm:%s != expect_elm:%s", self.sql, elm, expect_elm)
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, self.sql, elm, expect_elm)
             tdLog.exit("%s(%d) failed: sql:%s, elm:%s == expect_elm:%s" % args)
 
     def checkIn(self, sub, res):
         if sub in res:
-            tdLog.info("sql:%s, sub:%s in result:%s" % (self.sql, sub, res))
+            tdLog.info("sql:%s, sub:%s in result:%s", self.sql, sub, res)
         else:
-            caller = inspect.getframeinfo(inspect.stack()[1][0])
+            caller = _getCaller(1)
             args = (caller.filename, caller.lineno, self.sql, sub, res)
             tdLog.exit("%s(%d) failed: sql:%s, sub:%s not in result:%s" % args)
 
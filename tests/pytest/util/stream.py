@@ -0,0 +1,99 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import time
+import zlib
+import itertools
+
+
+class TDStreamStats:
+    """
+    what a streamed query went through: rows and blocks, seconds from the
+    start of execute to the first and to the last row, and an order
+    sensitive crc32 of the rows when it was asked for
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.blocks = 0
+        self.checksum = None
+        self.executeTime = 0
+        self.firstRowTime = None
+        self.lastRowTime = 0
+
+    def __str__(self):
+        return "%d rows in %d blocks, first row %.3fms, last row %.3fms" % (
+            self.rows, self.blocks, self.firstRowTime * 1000,
+            self.lastRowTime * 1000)
+
+
+def iterBlocks(result, blockSize=4096, onFirstRow=None):
+    """
+    the rows of a TaosResult as the blocks the client library fetched, or
+    the rows of an executed cursor (which fetches block by block underneath)
+    cut into lists of blockSize; onFirstRow is called as soon as the first
+    row has arrived, before its block is filled
+    """
+    if hasattr(result, "blocks_iter"):
+        for rows, length in result.blocks_iter():
+            if onFirstRow is not None and length:
+                onFirstRow()
+                onFirstRow = None
+            yield rows
+        return
+    rows = iter(result)
+    first = next(rows, None)
+    if first is None:
+        return
+    if onFirstRow is not None:
+        onFirstRow()
+    block = [first] + list(itertools.islice(rows, blockSize - 1))
+    while block:
+        yield block
+        block = list(itertools.islice(rows, blockSize))
+
+
+def streamQuery(target, sql, checksum=False, blockSize=4096):
+    """
+    run sql on a cursor or a connection and consume the result one block at
+    a time, so memory stays constant however large the result is
+    """
+    stats = TDStreamStats()
+    crc = 0
+    startTime = time.perf_counter()
+    if hasattr(target, "cursor"):
+        result = target.query(sql)
+    else:
+        target.execute(sql)
+        result = target
+    stats.executeTime = time.perf_counter() - startTime
+
+    def firstRow():
+        stats.firstRowTime = time.perf_counter() - startTime
+
+    for block in iterBlocks(result, blockSize, firstRow):
+        if not block:
+            continue
+        stats.blocks += 1
+        stats.rows += len(block)
+        if checksum:
+            for row in block:
+                crc = zlib.crc32(repr(row).encode("utf-8"), crc)
+    stats.lastRowTime = time.perf_counter() - startTime
+    if stats.firstRowTime is None:
+        stats.firstRowTime = stats.lastRowTime
+    if checksum:
+        stats.checksum = crc
+    if result is not target and hasattr(result, "close"):
+        result.close()
+    return stats
@@ -0,0 +1,48 @@
+###################################################################
+#           Copyright (c) 2016 by TAOS Technologies, Inc.
+#                     All rights reserved.
+#
+#  This file is proprietary and confidential to TAOS Technologies.
+#  No part of this file may be reproduced, stored, transmitted,
+#  disclosed or used in any form or by any means other than as
+#  expressly provided by the written permission from Jianhui Tao
+#
+###################################################################
+
+# -*- coding: utf-8 -*-
+
+import sys
+
+
+class TDVerbose:
+    """
+    leveled printf style output for tool scripts: the level is tested before
+    anything is formatted, and hot loops can guard a call with
+    `if __debug__ and tdVerbose.on:` so that python -O drops it entirely
+    """
+
+    QUIET = 0
+    VERBOSE = 1
+    DEBUG = 2
+
+    def __init__(self, level=QUIET, stream=None):
+        self.stream = stream
+        self.setLevel(level)
+
+    def setLevel(self, level):
+        self.level = level
+        self.on = level >= TDVerbose.VERBOSE
+
+    def emit(self, msg, args):
+        print(msg % args if args else msg, file=self.stream or sys.stdout)
+
+    def __call__(self, msg, *args):
+        if self.on:
+            self.emit(msg, args)
+
+    def debug(self, msg, *args):
+        if self.level >= TDVerbose.DEBUG:
+            self.emit(msg, args)
+
+
+tdVerbose = TDVerbose()